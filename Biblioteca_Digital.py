@@ -2,12 +2,41 @@
 # SISTEMA DE GESTIÓN DE BIBLIOTECA DIGITAL
 # ============================================================
 # Estructura de datos utilizada:
-#   - Tuplas:       atributos inmutables del libro (título, autor)
+#   - Slots:        Libro y Usuario sin diccionario por instancia;
+#                   título y autor de solo escritura única (inmutables)
 #   - Diccionarios: catálogo de libros indexado por ISBN
 #   - Conjuntos:    IDs de usuario únicos
-#   - Listas:       libros prestados por usuario
+#   - Registro:     préstamos por ISBN y, por usuario, sus ISBN en
+#                   orden de préstamo (diccionario como conjunto ordenado)
+#   - Índices:      trigramas y árbol de prefijos para buscar por
+#                   título y autor, e índice invertido BM25 para la
+#                   búsqueda general por relevancia (indice_texto.py)
+#   - Caché LRU:    resultados de las búsquedas generales más repetidas
+#   - Historial:    búfer circular de eventos con índices por usuario
+#                   e ISBN y archivo rotativo (historial_biblioteca.py)
+#   - Persistencia: base SQLite con una fila por operación
+#                   (persistencia_biblioteca.py)
+#   - Concurrencia: cerrojos por franjas de ISBN / ID de usuario y
+#                   lecturas optimistas con número de versión
+#   - Vencimientos: montículo de préstamos por fecha de vencimiento
+#                   (con borrado perezoso) para hallar los vencidos
 # ============================================================
 
+import heapq
+import math
+import sys
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from operator import attrgetter
+
+import Tarea6_clases_herencia as materiales
+from historial_biblioteca import EventoBiblioteca, HistorialBiblioteca
+from indice_texto import IndiceBM25, IndicePalabras, IndiceTrigramas, normalizar
+from persistencia_biblioteca import ARCHIVO_BIBLIOTECA, AlmacenBiblioteca, leer_csv
+
 
 # ──────────────────────────────────────────────
 # CLASE: Libro
@@ -16,25 +45,32 @@ class Libro:
     """
     Representa un libro de la biblioteca.
 
-    Se usa una TUPLA para (titulo, autor) porque son datos
-    inmutables: una vez publicado el libro, esos valores no cambian.
-    """
+    Título y autor son INMUTABLES: una vez publicado el libro, esos valores
+    no cambian, y asignarlos de nuevo lanza AttributeError.
 
-    def __init__(self, titulo: str, autor: str, categoria: str, isbn: str):
-        # Tupla inmutable: garantiza que título y autor no se modifiquen
-        self._info_inmutable = (titulo, autor)
-        self.categoria = categoria
-        self.isbn = isbn
-        self.disponible = True          # True = en estante, False = prestado
+    Con __slots__ cada libro guarda sus cinco atributos en un bloque fijo,
+    sin diccionario por instancia ni tupla aparte, y leer titulo o autor
+    no pasa por una propiedad. Autor y categoría se repiten entre miles de
+    libros, así que se internan (sys.intern): todos los libros de un autor
+    comparten la misma cadena aunque vengan de filas distintas de un CSV
+    o de la base.
+    """
 
-    # Propiedades para acceder cómodamente a los datos de la tupla
-    @property
-    def titulo(self) -> str:
-        return self._info_inmutable[0]
+    __slots__ = ("titulo", "autor", "categoria", "isbn", "disponible")
 
-    @property
-    def autor(self) -> str:
-        return self._info_inmutable[1]
+    def __init__(self, titulo: str, autor: str, categoria: str, isbn: str):
+        # Sin pasar por __setattr__: aquí se asignan por primera vez
+        _asignar(self, "titulo", titulo)
+        _asignar(self, "autor", sys.intern(autor))
+        _asignar(self, "categoria", sys.intern(categoria))
+        _asignar(self, "isbn", isbn)
+        _asignar(self, "disponible", True)      # True = en estante, False = prestado
+
+    def __setattr__(self, nombre: str, valor):
+        # Garantiza que título y autor no se modifiquen una vez asignados
+        if nombre in _INMUTABLES and hasattr(self, nombre):
+            raise AttributeError(f"'{nombre}' de un libro no se puede modificar.")
+        object.__setattr__(self, nombre, valor)
 
     def __str__(self) -> str:
         estado = "✅ Disponible" if self.disponible else "📤 Prestado"
@@ -42,6 +78,74 @@ class Libro:
                 f"| Categoría: {self.categoria} | {estado}")
 
 
+_INMUTABLES = frozenset(("titulo", "autor"))
+_asignar = object.__setattr__
+
+
+# ──────────────────────────────────────────────
+# CLASE: Prestamo
+# ──────────────────────────────────────────────
+DIAS_PRESTAMO = 14              # plazo por defecto de un préstamo
+SEGUNDOS_POR_DIA = 24 * 3600
+
+
+class Prestamo:
+    """
+    Registro de un préstamo activo: qué libro, a quién, desde cuándo y
+    hasta cuándo. Los préstamos se comparan por vencimiento (para el
+    montículo de vencimientos de la Biblioteca).
+    """
+
+    __slots__ = ("isbn", "id_usuario", "prestado_en", "vence_en")
+
+    def __init__(self, isbn: str, id_usuario: str, prestado_en: float, vence_en: float):
+        self.isbn = isbn
+        self.id_usuario = id_usuario
+        self.prestado_en = prestado_en      # segundos desde epoch (time.time())
+        self.vence_en = vence_en            # ídem; después de esta fecha hay multa
+
+    def __lt__(self, otro: "Prestamo") -> bool:
+        return self.vence_en < otro.vence_en
+
+    def dias_de_retraso(self, ahora: float) -> int:
+        """Días (empezados) desde el vencimiento; 0 si aún no vence."""
+        if ahora <= self.vence_en:
+            return 0
+        return math.ceil((ahora - self.vence_en) / SEGUNDOS_POR_DIA)
+
+    def __repr__(self) -> str:
+        return (f"Prestamo({self.isbn!r}, {self.id_usuario!r}, {self.prestado_en}, "
+                f"{self.vence_en})")
+
+
+class LibrosPrestados(Sequence):
+    """
+    Vista de solo lectura de los libros que tiene un usuario, en orden de
+    préstamo. Se apoya en el diccionario ISBN → Libro del registro de
+    préstamos, así que len() y `libro in vista` son O(1).
+    """
+
+    __slots__ = ("_libros",)
+
+    def __init__(self, libros: dict[str, "Libro"]):
+        self._libros = libros
+
+    def __len__(self) -> int:
+        return len(self._libros)
+
+    def __iter__(self):
+        return iter(self._libros.values())
+
+    def __contains__(self, libro) -> bool:
+        return self._libros.get(getattr(libro, "isbn", None)) is libro
+
+    def __getitem__(self, posicion):
+        return list(self._libros.values())[posicion]
+
+    def __repr__(self) -> str:
+        return f"LibrosPrestados({list(self._libros.values())!r})"
+
+
 # ──────────────────────────────────────────────
 # CLASE: Usuario
 # ──────────────────────────────────────────────
@@ -49,21 +153,138 @@ class Usuario:
     """
     Representa a un usuario registrado en la biblioteca.
 
-    Se usa una LISTA para libros_prestados porque el conjunto
-    de libros prestados cambia con frecuencia (préstamos/devoluciones).
+    libros_prestados es una vista (LibrosPrestados) sobre sus préstamos
+    activos, que la Biblioteca lleva en un diccionario ISBN → Libro: prestar
+    y devolver son O(1) aunque el usuario tenga miles de libros.
     """
 
+    __slots__ = ("nombre", "id_usuario", "_prestados")
+
     def __init__(self, nombre: str, id_usuario: str):
         self.nombre = nombre
         self.id_usuario = id_usuario
-        # Lista mutable: refleja los cambios en los préstamos activos
-        self.libros_prestados: list[Libro] = []
+        # Diccionario ordenado ISBN → Libro; lo mantiene el registro de préstamos
+        self._prestados: dict[str, Libro] = {}
+
+    @property
+    def libros_prestados(self) -> LibrosPrestados:
+        return LibrosPrestados(self._prestados)
 
     def __str__(self) -> str:
-        n = len(self.libros_prestados)
+        n = len(self._prestados)
         return f"Usuario [{self.id_usuario}]: {self.nombre} | Libros en préstamo: {n}"
 
 
+# ──────────────────────────────────────────────
+# CLASE: InformeLote
+# ──────────────────────────────────────────────
+class InformeLote:
+    """
+    Resultado de prestar_muchos / devolver_muchos:
+      - aplicadas:  pares (isbn, id_usuario) prestados o devueltos
+      - rechazadas: ternas (isbn, id_usuario, motivo) de los pares no válidos
+    Con todo_o_nada, un solo par rechazado deja aplicadas vacía.
+    """
+
+    __slots__ = ("operacion", "todo_o_nada", "aplicadas", "rechazadas")
+
+    def __init__(self, operacion: str, todo_o_nada: bool):
+        self.operacion = operacion
+        self.todo_o_nada = todo_o_nada
+        self.aplicadas: list[tuple[str, str]] = []
+        self.rechazadas: list[tuple[str, str, str]] = []
+
+    @property
+    def completo(self) -> bool:
+        """True si se aplicaron todos los pares del lote."""
+        return not self.rechazadas
+
+    def __str__(self) -> str:
+        texto = (f"{self.operacion}: {len(self.aplicadas)} aplicados, "
+                 f"{len(self.rechazadas)} rechazados")
+        if self.rechazadas and self.todo_o_nada:
+            texto += " (lote descartado)"
+        return texto
+
+
+# ──────────────────────────────────────────────
+# Índices secundarios: valor → conjunto de ISBN
+# ──────────────────────────────────────────────
+def _agregar_a_grupo(grupos: dict[str, set[str]], valor: str, isbn: str):
+    isbns = grupos.get(valor)
+    if isbns is None:
+        grupos[valor] = {isbn}
+    else:
+        isbns.add(isbn)
+
+
+def _quitar_de_grupo(grupos: dict[str, set[str]], valor: str, isbn: str):
+    isbns = grupos[valor]
+    isbns.discard(isbn)
+    if not isbns:
+        del grupos[valor]       # sin conjuntos vacíos: las categorías son las del catálogo
+
+
+# ──────────────────────────────────────────────
+# Multas (materiales de Tarea6_clases_herencia)
+# ──────────────────────────────────────────────
+# Categoría normalizada → clase de material que cobra su multa; el resto son libros
+MATERIAL_POR_CATEGORIA = {"revista": materiales.Revista, "revistas": materiales.Revista}
+
+
+def material_de(libro: Libro) -> materiales.MaterialBiblioteca:
+    """El libro como material de Tarea6_clases_herencia, que sabe calcular su multa."""
+    clase = MATERIAL_POR_CATEGORIA.get(normalizar(libro.categoria), materiales.Libro)
+    if clase is materiales.Revista:
+        return materiales.Revista(libro.titulo, libro.isbn, None)    # sin número de edición
+    return clase(libro.titulo, libro.isbn, libro.autor)
+
+
+# ──────────────────────────────────────────────
+# Cerrojos por franjas (modo concurrente)
+# ──────────────────────────────────────────────
+FRANJAS = 256               # cerrojos para repartir ISBN e IDs de usuario
+REINTENTOS_LECTURA = 8      # lecturas optimistas antes de tomar el cerrojo
+CACHE_BUSQUEDAS = 256       # resultados de buscar() que se conservan
+
+
+class CerrojosPorClave:
+    """
+    Un número fijo de cerrojos (franjas) para un número ilimitado de claves:
+    cada clave usa el de la franja hash(clave) % franjas. Dos operaciones
+    solo se esperan si sus claves caen en alguna franja común.
+
+    de(*claves) toma los cerrojos de varias claves siempre en orden
+    creciente de franja, y todos() los toma todos en ese mismo orden; como
+    cualquier hilo los pide en el mismo orden, no hay interbloqueos.
+    """
+
+    def __init__(self, franjas: int = FRANJAS):
+        self._cerrojos = [threading.Lock() for _ in range(franjas)]
+
+    @contextmanager
+    def de(self, *claves: str):
+        franjas = sorted({hash(clave) % len(self._cerrojos) for clave in claves})
+        cerrojos = [self._cerrojos[f] for f in franjas]
+        for cerrojo in cerrojos:
+            cerrojo.acquire()
+        try:
+            yield
+        finally:
+            for cerrojo in reversed(cerrojos):
+                cerrojo.release()
+
+    @contextmanager
+    def todos(self):
+        for cerrojo in self._cerrojos:
+            cerrojo.acquire()
+        try:
+            yield
+        finally:
+            for cerrojo in reversed(self._cerrojos):
+                cerrojo.release()
+
+
 # ──────────────────────────────────────────────
 # CLASE: Biblioteca
 # ──────────────────────────────────────────────
@@ -73,27 +294,288 @@ class Biblioteca:
 
     Estructuras internas:
       - catalogo (dict):    {isbn: Libro}  → búsqueda O(1) por ISBN
+                            (con almacén, se lee de la base la primera vez
+                            que se usa; ver "Persistencia" más abajo)
       - usuarios (dict):    {id: Usuario}  → acceso directo por ID
       - ids_registrados (set): IDs únicos → evita duplicados
-      - historial (list):   registro de todas las operaciones
+      - historial (HistorialBiblioteca): últimas operaciones como eventos,
+                            consultables por fecha, usuario e ISBN
+      - prestamos (dict):   {isbn: Prestamo} → quién tiene cada libro, O(1)
+      - _prestamos_por_usuario (dict): {id: {isbn: Libro}} → los préstamos
+                            de cada usuario en orden (el mismo diccionario
+                            que ve Usuario.libros_prestados)
+      - _vencimientos (list): montículo de Prestamo por vence_en. Devolver
+                            no lo saca del montículo (borrado perezoso):
+                            se salta al consultarlo y, cuando los préstamos
+                            ya terminados son mayoría, se rehace el montículo
+
+    Índices secundarios (conjuntos de ISBN), al día con cada alta, baja,
+    préstamo y devolución:
+      - _libros_por_categoria (dict): categoría normalizada → ISBN
+      - _libros_por_autor (dict):     autor normalizado → ISBN
+      - _disponibles (set):           ISBN de los libros en estante
+    Las consultas combinadas (disponibles de una categoría, libros de un
+    autor en una categoría) son intersecciones de esos conjuntos.
+
+    Las búsquedas por título y autor usan, por cada campo, un índice de
+    trigramas (subcadenas) y un índice de palabras con árbol de prefijos
+    (autocompletar y errores de escritura). Se crean en la primera búsqueda
+    y después se mantienen en agregar_libro / quitar_libro. Un autor suele
+    tener muchos libros, así que en estos se indexa cada autor distinto una
+    vez y _libros_por_autor da sus ISBN.
+
+    buscar() es la búsqueda general: ordena por relevancia (BM25) los libros
+    cuyo título, autor o categoría contienen las palabras o frases pedidas,
+    con un índice invertido (IndiceBM25) que también se crea en la primera
+    búsqueda. Los resultados de las últimas CACHE_BUSQUEDAS consultas
+    distintas se guardan en una caché LRU con la _version del catálogo en
+    la clave, así que cualquier alta, baja o carga deja de usarlos.
+
+    Persistencia: con un AlmacenBiblioteca, cada operación guarda su fila y
+    su evento del historial en una transacción, y solo si se confirma cambia
+    la memoria y añade el evento al historial. Al abrir solo se leen los
+    usuarios, los préstamos activos (con sus libros) y los últimos eventos;
+    el catálogo y sus índices se leen la primera vez que hacen falta. Hasta
+    entonces, las operaciones por ISBN consultan la base libro a libro
+    (obtener_libro) y guardan esos libros en _sueltos.
+
+    Modo concurrente (concurrente=True), para usarla desde varios hilos:
+      - cada operación toma los cerrojos (CerrojosPorClave) de su ISBN y/o
+        de su usuario, así que comprobar y prestar es atómico y dos hilos
+        nunca prestan el mismo libro; operaciones sobre libros y usuarios
+        distintos no se esperan entre sí
+      - las altas y bajas del catálogo se excluyen con _cerrojo_catalogo e
+        incrementan _version antes y después del cambio (impar = cambio en
+        curso); cargar o reemplazar el catálogo toma todas las franjas
+      - el historial y la base se escriben bajo _cerrojo_registro, y el
+        montículo de vencimientos cambia bajo _cerrojo_vencimientos
+      - las búsquedas y mostrar_catalogo no toman cerrojos: se ejecutan y,
+        si la versión cambió mientras tanto (o una estructura cambió a
+        mitad de recorrerla), se repiten (_leer)
+    Los cerrojos se piden siempre en este orden: franjas, catálogo, registro,
+    vencimientos.
     """
 
-    def __init__(self, nombre: str):
+    CAMPOS_BUSQUEDA = ("titulo", "autor")
+
+    def __init__(self, nombre: str, historial: HistorialBiblioteca | None = None,
+                 almacen: AlmacenBiblioteca | None = None, concurrente: bool = False):
         self.nombre = nombre
-        # DICCIONARIO: clave=ISBN, valor=objeto Libro
-        self.catalogo: dict[str, Libro] = {}
+        self.almacen = almacen
+        # Cerrojos del modo concurrente (sin él, contextos vacíos)
+        self.concurrente = concurrente
+        self._cerrojos = CerrojosPorClave() if concurrente else None
+        self._cerrojo_catalogo = threading.RLock() if concurrente else nullcontext()
+        self._cerrojo_registro = threading.RLock() if concurrente else nullcontext()
+        self._cerrojo_vencimientos = threading.Lock() if concurrente else nullcontext()
+        # Versión del catálogo: cambia con cada alta, baja o carga
+        # (en modo concurrente, impar mientras hay un cambio en curso)
+        self._version = 0
+        # DICCIONARIO: clave=ISBN, valor=objeto Libro; None hasta leerlo de la base
+        self._catalogo: dict[str, Libro] | None = {} if almacen is None else None
+        # Libros leídos uno a uno mientras el catálogo no está cargado
+        self._sueltos: dict[str, Libro] = {}
         # DICCIONARIO: clave=id_usuario, valor=objeto Usuario
         self.usuarios: dict[str, Usuario] = {}
         # CONJUNTO: garantiza IDs únicos, O(1) para comprobación
         self.ids_registrados: set[str] = set()
-        # Historial de operaciones
-        self.historial: list[str] = []
+        # Historial de operaciones (por defecto solo en memoria, con eco por consola)
+        self.historial = historial if historial is not None else HistorialBiblioteca(eco=True)
+        # Registro de préstamos activos
+        self.prestamos: dict[str, Prestamo] = {}
+        self._prestamos_por_usuario: dict[str, dict[str, Libro]] = {}
+        # MONTÍCULO de préstamos por vencimiento; _obsoletos = cuántos ya terminaron
+        self._vencimientos: list[Prestamo] = []
+        self._obsoletos = 0
+        # Índices secundarios: valor normalizado → conjunto de ISBN
+        self._por_categoria: dict[str, set[str]] = {}
+        self._por_autor: dict[str, set[str]] = {}
+        # CONJUNTO: ISBN de los libros disponibles
+        self._en_estante: set[str] = set()
+        # Índices de búsqueda: campo → (trigramas, palabras); None hasta la primera búsqueda.
+        # Los de autor indexan cada autor (normalizado) una sola vez
+        self._indices_busqueda: dict[str, tuple[IndiceTrigramas, IndicePalabras]] | None = None
+        # Índice de relevancia de buscar() y caché LRU de sus resultados
+        self._relevancia: IndiceBM25 | None = None
+        self._buscar_en_cache = lru_cache(maxsize=CACHE_BUSQUEDAS)(self._buscar_sin_cache)
+        if almacen is not None:
+            self._cargar_usuarios()
+            self.historial.reanudar(EventoBiblioteca(*fila) for fila in
+                                    almacen.ultimos_eventos(self.historial.capacidad))
+
+    # ── Cerrojos ─────────────────────────────────
+    def _bloquear(self, *claves: str):
+        """Cerrojos de las claves (ISBN / ID de usuario) en modo concurrente."""
+        return self._cerrojos.de(*claves) if self._cerrojos is not None else nullcontext()
+
+    @contextmanager
+    def _cambiando_catalogo(self):
+        """Alta o baja en el catálogo: excluye otros cambios y avisa a los lectores."""
+        if self._cerrojos is None:
+            try:
+                yield
+            finally:
+                self._version += 2          # sin otros hilos nunca queda a medias
+            return
+        with self._cerrojo_catalogo:
+            self._version += 1              # impar: cambio en curso
+            try:
+                yield
+            finally:
+                self._version += 1
+
+    @contextmanager
+    def _todo_bloqueado(self):
+        """Todas las franjas y el catálogo: para cargarlo o reemplazarlo entero."""
+        if self._cerrojos is None:
+            with self._cambiando_catalogo():
+                yield
+            return
+        with self._cerrojos.todos(), self._cambiando_catalogo():
+            yield
+
+    def _leer(self, consulta):
+        """
+        Ejecuta consulta() sin cerrojos. En modo concurrente, si un cambio
+        del catálogo coincidió con ella, la repite; tras REINTENTOS_LECTURA
+        intentos la hace con el cerrojo del catálogo.
+        """
+        if self._cerrojos is None:
+            return consulta()
+        for _ in range(REINTENTOS_LECTURA):
+            version = self._version
+            if version % 2:
+                time.sleep(0)               # cambio en curso: se cede el turno
+                continue
+            try:
+                resultado = consulta()
+            except (RuntimeError, KeyError):
+                continue                    # un dict o set cambió a mitad de recorrerlo
+            if self._version == version:
+                return resultado
+        with self._cerrojo_catalogo:
+            return consulta()
+
+    # ── Catálogo e índices secundarios ───────────
+    # Con almacén, el primer uso de cualquiera de ellos lee el catálogo entero
+    @property
+    def catalogo(self) -> dict[str, Libro]:
+        if self._catalogo is None:
+            self._cargar_catalogo()
+        return self._catalogo
+
+    @property
+    def _libros_por_categoria(self) -> dict[str, set[str]]:
+        if self._catalogo is None:
+            self._cargar_catalogo()
+        return self._por_categoria
+
+    @property
+    def _libros_por_autor(self) -> dict[str, set[str]]:
+        if self._catalogo is None:
+            self._cargar_catalogo()
+        return self._por_autor
+
+    @property
+    def _disponibles(self) -> set[str]:
+        if self._catalogo is None:
+            self._cargar_catalogo()
+        return self._en_estante
+
+    def _agrupar(self, libro: Libro):
+        """Añade el libro a los índices secundarios."""
+        _agregar_a_grupo(self._por_categoria, normalizar(libro.categoria), libro.isbn)
+        _agregar_a_grupo(self._por_autor, normalizar(libro.autor), libro.isbn)
+        if libro.disponible:
+            self._en_estante.add(libro.isbn)
+
+    def _cargar_catalogo(self):
+        """
+        Lee el catálogo de la base y arma sus índices secundarios. En modo
+        concurrente detiene las demás operaciones mientras tanto.
+        """
+        with self._todo_bloqueado():
+            if self._catalogo is not None:
+                return                      # otro hilo lo cargó mientras se esperaba
+            catalogo = {}
+            sueltos = self._sueltos
+            with self._cerrojo_registro:
+                for isbn, titulo, autor, categoria, disponible in self.almacen.libros():
+                    # Los libros ya leídos se conservan: los préstamos apuntan a ellos
+                    libro = sueltos.get(isbn)
+                    if libro is None:
+                        libro = Libro(titulo, autor, categoria, isbn)
+                        libro.disponible = disponible
+                    catalogo[isbn] = libro
+            for libro in catalogo.values():
+                self._agrupar(libro)
+            self._sueltos = {}
+            self._catalogo = catalogo
+
+    def _cargar_usuarios(self):
+        """Lee de la base los usuarios y sus préstamos activos, con los libros prestados."""
+        for id_usuario, nombre in self.almacen.usuarios():
+            usuario = Usuario(nombre, id_usuario)
+            self.ids_registrados.add(id_usuario)
+            self.usuarios[id_usuario] = usuario
+            self._prestamos_por_usuario[id_usuario] = usuario._prestados
+        for (isbn, id_usuario, prestado_en, vence_en,
+             titulo, autor, categoria) in self.almacen.prestamos():
+            libro = Libro(titulo, autor, categoria, isbn)
+            libro.disponible = False
+            self._sueltos[isbn] = libro
+            self.prestamos[isbn] = Prestamo(isbn, id_usuario, prestado_en, vence_en)
+            self._prestamos_por_usuario[id_usuario][isbn] = libro
+        self._vencimientos = list(self.prestamos.values())
+        heapq.heapify(self._vencimientos)
+
+    def obtener_libro(self, isbn: str) -> Libro | None:
+        """
+        Libro con ese ISBN, o None. Si el catálogo aún no se leyó de la
+        base, lee solo ese libro.
+        """
+        if self._catalogo is not None:
+            return self._catalogo.get(isbn)
+        libro = self._sueltos.get(isbn)
+        if libro is None:
+            with self._cerrojo_registro:
+                if self._catalogo is not None:      # otro hilo acaba de cargarlo
+                    return self._catalogo.get(isbn)
+                fila = self.almacen.obtener_libro(isbn)
+            if fila is None:
+                return None
+            titulo, autor, categoria, disponible = fila
+            libro = Libro(titulo, autor, categoria, isbn)
+            libro.disponible = disponible
+            libro = self._sueltos.setdefault(isbn, libro)
+        return libro
 
     # ── Registro de operaciones ──────────────────
-    def _registrar(self, mensaje: str):
-        """Guarda un evento en el historial interno."""
-        self.historial.append(mensaje)
-        print(f"  ✔ {mensaje}")
+    def _registrar(self, tipo: str, mensaje: str, isbn: str | None = None,
+                   id_usuario: str | None = None, fila: tuple | None = None,
+                   filas: list[tuple] | None = None):
+        """
+        Guarda un evento en el historial (que lo imprime si tiene eco) y,
+        con almacén, antes la fila del cambio (o las filas, en un lote) junto
+        con el evento. Si la base falla, la excepción sale de aquí sin tocar
+        el historial: por eso se llama antes de cambiar nada en memoria.
+        """
+        with self._cerrojo_registro:
+            if self.almacen is None:
+                self.historial.registrar(tipo, mensaje, isbn, id_usuario)
+                return
+            evento = self.historial.preparar(tipo, mensaje, isbn, id_usuario)
+            if filas is None:
+                self.almacen.guardar(evento, fila)
+            else:
+                self.almacen.guardar_lote(evento, filas)
+            self.historial.confirmar(evento)
+
+    def cerrar(self):
+        """Termina de guardar el historial y cierra la base."""
+        self.historial.cerrar()
+        if self.almacen is not None:
+            self.almacen.cerrar()
 
     # ════════════════════════════════════════════
     # GESTIÓN DE LIBROS
@@ -101,25 +583,99 @@ class Biblioteca:
 
     def agregar_libro(self, libro: Libro) -> bool:
         """Añade un libro al catálogo usando su ISBN como clave."""
-        if libro.isbn in self.catalogo:
-            print(f"  ⚠ El ISBN {libro.isbn} ya existe en el catálogo.")
-            return False
-        self.catalogo[libro.isbn] = libro
-        self._registrar(f"Libro agregado: '{libro.titulo}' (ISBN: {libro.isbn})")
-        return True
+        with self._bloquear(libro.isbn), self._cambiando_catalogo():
+            if self.obtener_libro(libro.isbn) is not None:
+                print(f"  ⚠ El ISBN {libro.isbn} ya existe en el catálogo.")
+                return False
+            self._registrar("libro_agregado", f"Libro agregado: '{libro.titulo}' (ISBN: {libro.isbn})",
+                            isbn=libro.isbn,
+                            fila=(libro.isbn, libro.titulo, libro.autor, libro.categoria))
+            if self._catalogo is None:
+                self._sueltos[libro.isbn] = libro
+            else:
+                self._catalogo[libro.isbn] = libro
+                self._agrupar(libro)
+                if self._indices_busqueda is not None:
+                    self._indexar(libro)
+                if self._relevancia is not None:
+                    self._relevancia.agregar(libro.isbn, libro.titulo, libro.autor, libro.categoria)
+            return True
 
     def quitar_libro(self, isbn: str) -> bool:
         """Elimina un libro del catálogo solo si no está prestado."""
-        if isbn not in self.catalogo:
-            print(f"  ⚠ ISBN {isbn} no encontrado.")
-            return False
-        libro = self.catalogo[isbn]
-        if not libro.disponible:
-            print(f"  ⚠ '{libro.titulo}' está prestado y no puede eliminarse.")
-            return False
-        del self.catalogo[isbn]
-        self._registrar(f"Libro eliminado: '{libro.titulo}' (ISBN: {isbn})")
-        return True
+        with self._bloquear(isbn), self._cambiando_catalogo():
+            libro = self.obtener_libro(isbn)
+            if libro is None:
+                print(f"  ⚠ ISBN {isbn} no encontrado.")
+                return False
+            if not libro.disponible:
+                print(f"  ⚠ '{libro.titulo}' está prestado y no puede eliminarse.")
+                return False
+            self._registrar("libro_eliminado", f"Libro eliminado: '{libro.titulo}' (ISBN: {isbn})",
+                            isbn=isbn, fila=(isbn,))
+            if self._catalogo is None:
+                del self._sueltos[isbn]
+            else:
+                del self._catalogo[isbn]
+                _quitar_de_grupo(self._por_categoria, normalizar(libro.categoria), isbn)
+                _quitar_de_grupo(self._por_autor, normalizar(libro.autor), isbn)
+                self._en_estante.discard(isbn)
+                if self._indices_busqueda is not None:
+                    self._desindexar(libro)
+                if self._relevancia is not None:
+                    self._relevancia.quitar(isbn)
+            return True
+
+    def importar_csv(self, ruta: str) -> tuple[int, int]:
+        """
+        Añade los libros de un CSV (isbn,titulo,autor,categoria; ver
+        persistencia_biblioteca.py) con un solo evento en el historial. Con
+        almacén se insertan en una transacción y el catálogo en memoria se
+        vuelve a leer de la base cuando haga falta. Las filas incompletas y
+        los ISBN repetidos se descartan. Devuelve (añadidos, descartados).
+        """
+        leidas = incompletas = 0
+
+        def descartar(ubicacion, mensaje):
+            nonlocal incompletas
+            incompletas += 1
+            print(f"  ⚠ {ubicacion} ignorada: {mensaje}")
+
+        def contar(filas):
+            nonlocal leidas
+            for leidas, fila in enumerate(filas, start=1):
+                yield fila
+
+        filas = contar(leer_csv(ruta, descartar))
+        with self._todo_bloqueado():
+            if self.almacen is None:
+                agregados = 0
+                for isbn, titulo, autor, categoria in filas:
+                    if isbn not in self._catalogo:
+                        libro = self._catalogo[isbn] = Libro(titulo, autor, categoria, isbn)
+                        self._agrupar(libro)
+                        if self._indices_busqueda is not None:
+                            self._indexar(libro)
+                        if self._relevancia is not None:
+                            self._relevancia.agregar(isbn, titulo, autor, categoria)
+                        agregados += 1
+                self._registrar("carga_masiva", f"Carga masiva: {agregados} libros desde '{ruta}'")
+            else:
+                with self._cerrojo_registro:
+                    with self.almacen.transaccion():
+                        agregados = self.almacen.cargar_libros(filas)
+                        evento = self.historial.preparar(
+                            "carga_masiva", f"Carga masiva: {agregados} libros desde '{ruta}'")
+                        self.almacen.guardar(evento)
+                    self.historial.confirmar(evento)
+                if self._catalogo is not None:
+                    # Se releerá de la base; los libros ya leídos se conservan
+                    self._sueltos = self._catalogo
+                    self._catalogo = None
+                    self._por_categoria, self._por_autor, self._en_estante = {}, {}, set()
+                    self._indices_busqueda = None
+                    self._relevancia = None
+        return agregados, incompletas + leidas - agregados
 
     # ════════════════════════════════════════════
     # GESTIÓN DE USUARIOS
@@ -130,107 +686,507 @@ class Biblioteca:
         Registra un usuario nuevo.
         El CONJUNTO ids_registrados asegura que no haya IDs duplicados.
         """
-        if usuario.id_usuario in self.ids_registrados:
-            print(f"  ⚠ ID '{usuario.id_usuario}' ya está en uso.")
-            return False
-        self.ids_registrados.add(usuario.id_usuario)    # O(1) en conjunto
-        self.usuarios[usuario.id_usuario] = usuario
-        self._registrar(f"Usuario registrado: {usuario.nombre} (ID: {usuario.id_usuario})")
-        return True
+        with self._bloquear(usuario.id_usuario):
+            if usuario.id_usuario in self.ids_registrados:
+                print(f"  ⚠ ID '{usuario.id_usuario}' ya está en uso.")
+                return False
+            self._registrar("usuario_registrado",
+                            f"Usuario registrado: {usuario.nombre} (ID: {usuario.id_usuario})",
+                            id_usuario=usuario.id_usuario,
+                            fila=(usuario.id_usuario, usuario.nombre))
+            self.ids_registrados.add(usuario.id_usuario)    # O(1) en conjunto
+            self.usuarios[usuario.id_usuario] = usuario
+            self._prestamos_por_usuario[usuario.id_usuario] = usuario._prestados
+            return True
 
     def dar_de_baja_usuario(self, id_usuario: str) -> bool:
         """Da de baja a un usuario solo si no tiene libros pendientes."""
-        if id_usuario not in self.ids_registrados:
-            print(f"  ⚠ Usuario '{id_usuario}' no encontrado.")
-            return False
-        usuario = self.usuarios[id_usuario]
-        if usuario.libros_prestados:
-            titulos = ", ".join(f"'{l.titulo}'" for l in usuario.libros_prestados)
-            print(f"  ⚠ {usuario.nombre} tiene libros pendientes: {titulos}")
-            return False
-        self.ids_registrados.discard(id_usuario)        # O(1) en conjunto
-        del self.usuarios[id_usuario]
-        self._registrar(f"Usuario dado de baja: {usuario.nombre} (ID: {id_usuario})")
-        return True
+        with self._bloquear(id_usuario):
+            if id_usuario not in self.ids_registrados:
+                print(f"  ⚠ Usuario '{id_usuario}' no encontrado.")
+                return False
+            usuario = self.usuarios[id_usuario]
+            pendientes = self._prestamos_por_usuario[id_usuario]
+            if pendientes:
+                titulos = ", ".join(f"'{l.titulo}'" for l in pendientes.values())
+                print(f"  ⚠ {usuario.nombre} tiene libros pendientes: {titulos}")
+                return False
+            self._registrar("usuario_baja", f"Usuario dado de baja: {usuario.nombre} (ID: {id_usuario})",
+                            id_usuario=id_usuario, fila=(id_usuario,))
+            self.ids_registrados.discard(id_usuario)        # O(1) en conjunto
+            del self.usuarios[id_usuario]
+            del self._prestamos_por_usuario[id_usuario]
+            return True
 
     # ════════════════════════════════════════════
     # PRÉSTAMOS Y DEVOLUCIONES
     # ════════════════════════════════════════════
 
-    def prestar_libro(self, isbn: str, id_usuario: str) -> bool:
+    def prestar_libro(self, isbn: str, id_usuario: str, dias: int = DIAS_PRESTAMO) -> bool:
         """
-        Presta un libro disponible a un usuario registrado.
-        Actualiza tanto el estado del libro como la lista del usuario.
+        Presta un libro disponible a un usuario registrado por `dias` días.
+        Anota el préstamo en el registro y actualiza el estado del libro.
         """
-        # Validaciones
-        if isbn not in self.catalogo:
-            print(f"  ⚠ Libro con ISBN {isbn} no existe.")
-            return False
-        if id_usuario not in self.ids_registrados:
-            print(f"  ⚠ Usuario '{id_usuario}' no registrado.")
-            return False
-
-        libro = self.catalogo[isbn]
-        usuario = self.usuarios[id_usuario]
-
-        if not libro.disponible:
-            print(f"  ⚠ '{libro.titulo}' no está disponible actualmente.")
-            return False
-
-        # Actualizar estado
-        libro.disponible = False
-        usuario.libros_prestados.append(libro)          # append O(1) en lista
-        self._registrar(f"Préstamo: '{libro.titulo}' → {usuario.nombre}")
-        return True
+        with self._bloquear(isbn, id_usuario):
+            # Validaciones
+            libro = self.obtener_libro(isbn)
+            if libro is None:
+                print(f"  ⚠ Libro con ISBN {isbn} no existe.")
+                return False
+            if id_usuario not in self.ids_registrados:
+                print(f"  ⚠ Usuario '{id_usuario}' no registrado.")
+                return False
+
+            usuario = self.usuarios[id_usuario]
+
+            if not libro.disponible:
+                print(f"  ⚠ '{libro.titulo}' no está disponible actualmente.")
+                return False
+
+            ahora = time.time()
+            prestamo = Prestamo(isbn, id_usuario, ahora, ahora + dias * SEGUNDOS_POR_DIA)
+            self._registrar("prestamo", f"Préstamo: '{libro.titulo}' → {usuario.nombre}",
+                            isbn, id_usuario,
+                            fila=(isbn, id_usuario, prestamo.prestado_en, prestamo.vence_en))
+
+            # Actualizar estado
+            libro.disponible = False
+            self._en_estante.discard(isbn)
+            self.prestamos[isbn] = prestamo
+            self._prestamos_por_usuario[id_usuario][isbn] = libro      # O(1)
+            self._anotar_vencimientos([prestamo])
+            return True
 
     def devolver_libro(self, isbn: str, id_usuario: str) -> bool:
         """
         Registra la devolución de un libro por parte de un usuario.
-        Busca y elimina el libro de la lista del usuario.
+        El registro de préstamos dice en O(1) si ese usuario lo tiene.
         """
-        if isbn not in self.catalogo:
-            print(f"  ⚠ Libro con ISBN {isbn} no existe.")
-            return False
-        if id_usuario not in self.ids_registrados:
-            print(f"  ⚠ Usuario '{id_usuario}' no registrado.")
-            return False
-
-        libro = self.catalogo[isbn]
-        usuario = self.usuarios[id_usuario]
+        with self._bloquear(isbn, id_usuario):
+            libro = self.obtener_libro(isbn)
+            if libro is None:
+                print(f"  ⚠ Libro con ISBN {isbn} no existe.")
+                return False
+            if id_usuario not in self.ids_registrados:
+                print(f"  ⚠ Usuario '{id_usuario}' no registrado.")
+                return False
+
+            usuario = self.usuarios[id_usuario]
+
+            prestamo = self.prestamos.get(isbn)
+            if prestamo is None or prestamo.id_usuario != id_usuario:
+                print(f"  ⚠ {usuario.nombre} no tiene '{libro.titulo}' en préstamo.")
+                return False
+
+            self._registrar("devolucion", f"Devolución: '{libro.titulo}' ← {usuario.nombre}",
+                            isbn, id_usuario, fila=(isbn,))
+            del self.prestamos[isbn]
+            del self._prestamos_por_usuario[id_usuario][isbn]         # O(1)
+            self._olvidar_vencimientos(1)
+            libro.disponible = True
+            if self._catalogo is not None:
+                self._en_estante.add(isbn)
+            return True
+
+    # ── Operaciones en lote ──────────────────────
+    def _aplicar_lote(self, operacion: str, pares, todo_o_nada: bool,
+                      rechazo, aplicar) -> InformeLote:
+        """
+        Común a prestar_muchos y devolver_muchos: valida todos los pares de
+        una pasada (rechazo(libro, id_usuario) da el motivo propio de la
+        operación, o None) y solo entonces pasa los válidos a
+        aplicar(validos, marca_tiempo). Un ISBN repetido en el lote solo
+        vale la primera vez.
+        """
+        pares = list(pares)
+        informe = InformeLote(operacion, todo_o_nada)
+        claves = {clave for par in pares for clave in par} if self.concurrente else ()
+        with self._bloquear(*claves):
+            # Con el catálogo ya cargado se consulta el diccionario directamente
+            obtener = self.obtener_libro if self._catalogo is None else self._catalogo.get
+            validos: list[tuple[Libro, str]] = []
+            vistos: set[str] = set()
+            for isbn, id_usuario in pares:
+                libro = obtener(isbn)
+                if libro is None:
+                    motivo = "el libro no existe"
+                elif id_usuario not in self.ids_registrados:
+                    motivo = "usuario no registrado"
+                elif isbn in vistos:
+                    motivo = "ISBN repetido en el lote"
+                else:
+                    motivo = rechazo(libro, id_usuario)
+                if motivo is None:
+                    vistos.add(isbn)
+                    validos.append((libro, id_usuario))
+                else:
+                    informe.rechazadas.append((isbn, id_usuario, motivo))
+
+            if informe.rechazadas:
+                aviso = f"  ⚠ {operacion}: {len(informe.rechazadas)} de {len(pares)} rechazados"
+                print(aviso + ("; no se aplicó ninguno." if todo_o_nada else "."))
+                if todo_o_nada:
+                    return informe
+            if validos:
+                aplicar(validos, time.time())
+                informe.aplicadas = [(libro.isbn, id_usuario) for libro, id_usuario in validos]
+        return informe
+
+    def prestar_muchos(self, pares, todo_o_nada: bool = False,
+                       dias: int = DIAS_PRESTAMO) -> InformeLote:
+        """
+        Presta cada par (isbn, id_usuario) de `pares` por `dias` días con las
+        mismas reglas que prestar_libro, pero valida el lote entero antes de prestar nada,
+        no imprime una línea por libro y registra un solo evento
+        ("prestamos_lote", sin ISBN ni usuario) para todo el lote; con
+        almacén, todos los préstamos se guardan en una transacción.
+        Con todo_o_nada=True, si algún par no es válido no se presta ninguno.
+        """
+        def rechazo(libro, id_usuario):
+            return None if libro.disponible else "no está disponible"
+
+        def aplicar(validos, marca):
+            vence_en = marca + dias * SEGUNDOS_POR_DIA
+            filas = [(libro.isbn, id_usuario, marca, vence_en) for libro, id_usuario in validos]
+            usuarios = len({id_usuario for _, id_usuario in validos})
+            # Primero la base: si falla, los préstamos en memoria quedan como estaban
+            self._registrar("prestamos_lote",
+                            f"Préstamo en lote: {len(validos)} libros a {usuarios} usuarios",
+                            filas=filas)
+            nuevos = []
+            for libro, id_usuario in validos:
+                isbn = libro.isbn
+                libro.disponible = False
+                self._en_estante.discard(isbn)
+                prestamo = self.prestamos[isbn] = Prestamo(isbn, id_usuario, marca, vence_en)
+                self._prestamos_por_usuario[id_usuario][isbn] = libro
+                nuevos.append(prestamo)
+            self._anotar_vencimientos(nuevos)
+
+        return self._aplicar_lote("Préstamo en lote", pares, todo_o_nada, rechazo, aplicar)
+
+    def devolver_muchos(self, pares, todo_o_nada: bool = False) -> InformeLote:
+        """
+        Devuelve cada par (isbn, id_usuario) de `pares`; es a devolver_libro
+        lo que prestar_muchos a prestar_libro (un evento "devoluciones_lote"
+        y una transacción para todo el lote).
+        """
+        def rechazo(libro, id_usuario):
+            prestamo = self.prestamos.get(libro.isbn)
+            if prestamo is None or prestamo.id_usuario != id_usuario:
+                return "el usuario no lo tiene en préstamo"
+            return None
+
+        def aplicar(validos, marca):
+            usuarios = len({id_usuario for _, id_usuario in validos})
+            self._registrar("devoluciones_lote",
+                            f"Devolución en lote: {len(validos)} libros de {usuarios} usuarios",
+                            filas=[(libro.isbn,) for libro, _ in validos])
+            catalogo_cargado = self._catalogo is not None
+            for libro, id_usuario in validos:
+                isbn = libro.isbn
+                del self.prestamos[isbn]
+                del self._prestamos_por_usuario[id_usuario][isbn]
+                libro.disponible = True
+                if catalogo_cargado:
+                    self._en_estante.add(isbn)
+            self._olvidar_vencimientos(len(validos))
+
+        return self._aplicar_lote("Devolución en lote", pares, todo_o_nada, rechazo, aplicar)
 
-        # Buscar el libro en la lista de préstamos del usuario
-        if libro not in usuario.libros_prestados:
-            print(f"  ⚠ {usuario.nombre} no tiene '{libro.titulo}' en préstamo.")
-            return False
+    # ════════════════════════════════════════════
+    # VENCIMIENTOS Y MULTAS
+    # ════════════════════════════════════════════
 
-        usuario.libros_prestados.remove(libro)          # eliminar de la lista
-        libro.disponible = True
-        self._registrar(f"Devolución: '{libro.titulo}' ← {usuario.nombre}")
-        return True
+    def _vigente(self, prestamo: Prestamo) -> bool:
+        """False si el préstamo del montículo ya terminó (borrado perezoso)."""
+        return self.prestamos.get(prestamo.isbn) is prestamo
+
+    def _anotar_vencimientos(self, nuevos: list[Prestamo]):
+        with self._cerrojo_vencimientos:
+            monticulo = self._vencimientos
+            if len(nuevos) > len(monticulo) // 16:
+                # Lote grande frente al montículo: rehacerlo (O(n)) sale más barato
+                monticulo.extend(nuevos)
+                heapq.heapify(monticulo)
+            else:
+                for prestamo in nuevos:
+                    heapq.heappush(monticulo, prestamo)
+
+    def _olvidar_vencimientos(self, terminados: int):
+        """
+        Cuenta los préstamos que terminaron sin sacarlos del montículo; si
+        ya son mayoría, lo rehace solo con los vigentes.
+        """
+        with self._cerrojo_vencimientos:
+            self._obsoletos += terminados
+            if self._obsoletos * 2 > len(self._vencimientos):
+                self._vencimientos = [p for p in self._vencimientos if self._vigente(p)]
+                heapq.heapify(self._vencimientos)
+                self._obsoletos = 0
+
+    def vencidos(self, ahora: float | None = None) -> list[Prestamo]:
+        """
+        Préstamos activos ya vencidos (a la hora `ahora`; por defecto, la
+        actual), del más atrasado al menos. Solo recorre la parte del
+        montículo que vence hasta `ahora` (ningún nodo vence antes que su
+        padre), así que cuesta O(k log k) para k vencidos, sin revisar el
+        resto de los préstamos.
+        """
+        if ahora is None:
+            ahora = time.time()
+        resultado = []
+        with self._cerrojo_vencimientos:
+            monticulo = self._vencimientos
+            while monticulo and not self._vigente(monticulo[0]):
+                heapq.heappop(monticulo)
+                self._obsoletos -= 1
+            n = len(monticulo)
+            prestamos = self.prestamos
+            pendientes = [0] if n and monticulo[0].vence_en <= ahora else []
+            while pendientes:
+                i = pendientes.pop()
+                prestamo = monticulo[i]
+                if prestamos.get(prestamo.isbn) is prestamo:       # _vigente, en línea
+                    resultado.append(prestamo)
+                hijo = 2 * i + 1
+                if hijo < n and monticulo[hijo].vence_en <= ahora:
+                    pendientes.append(hijo)
+                hijo += 1
+                if hijo < n and monticulo[hijo].vence_en <= ahora:
+                    pendientes.append(hijo)
+        resultado.sort(key=attrgetter("vence_en"))     # comparar floats es más rápido que __lt__
+        return resultado
+
+    def calcular_multas(self, ahora: float | None = None,
+                        vencidos: list[Prestamo] | None = None) -> dict[str, float]:
+        """
+        Multa de cada usuario con préstamos vencidos: {id_usuario: $}. Cada
+        préstamo cobra material_de(libro).calcular_multa(días de retraso)
+        (Libro $0.50/día, Revista $0.30/día). Dos préstamos de la misma
+        categoría con los mismos días de retraso deben lo mismo, así que se
+        llama a calcular_multa una vez por combinación y no por préstamo.
+        `vencidos` permite reutilizar el resultado de vencidos(ahora).
+        """
+        if ahora is None:
+            ahora = time.time()
+        if vencidos is None:
+            vencidos = self.vencidos(ahora)
+        tarifas: dict[tuple[str, int], float] = {}      # (categoría, días) → multa
+        multas: dict[str, float] = {}
+        por_usuario = self._prestamos_por_usuario
+        for prestamo in vencidos:
+            libro = por_usuario.get(prestamo.id_usuario, {}).get(prestamo.isbn)
+            if libro is None:
+                continue                    # devuelto mientras tanto
+            dias = prestamo.dias_de_retraso(ahora)
+            clave = (libro.categoria, dias)
+            multa = tarifas.get(clave)
+            if multa is None:
+                multa = tarifas[clave] = material_de(libro).calcular_multa(dias)
+            multas[prestamo.id_usuario] = multas.get(prestamo.id_usuario, 0.0) + multa
+        return {id_usuario: round(total, 2) for id_usuario, total in multas.items()}
+
+    def mostrar_vencidos(self):
+        """Imprime los préstamos vencidos y la multa acumulada de cada usuario."""
+        ahora = time.time()
+        vencidos = self.vencidos(ahora)
+        print(f"\n⏰ Préstamos vencidos ({len(vencidos)}):")
+        if not vencidos:
+            print("   (ninguno)")
+            return
+        for prestamo in vencidos:
+            usuario = self.usuarios.get(prestamo.id_usuario)
+            libro = self.obtener_libro(prestamo.isbn)
+            if usuario is None or libro is None:
+                continue
+            print(f"   • '{libro.titulo}' — {usuario.nombre} "
+                  f"({prestamo.dias_de_retraso(ahora)} días de retraso)")
+        print("\n💲 Multas:")
+        for id_usuario, multa in self.calcular_multas(ahora, vencidos).items():
+            print(f"   • {self.usuarios[id_usuario].nombre} (ID: {id_usuario}): ${multa:.2f}")
 
     # ════════════════════════════════════════════
     # BÚSQUEDAS
     # ════════════════════════════════════════════
 
+    def _indexar(self, libro: Libro, indices=None):
+        # Normalizado una vez: los índices lo reciben ya en minúsculas y sin tildes
+        if indices is None:
+            indices = self._indices_busqueda
+        titulo = normalizar(libro.titulo)
+        trigramas, palabras = indices["titulo"]
+        trigramas.agregar(libro.isbn, titulo)
+        palabras.agregar(libro.isbn, titulo)
+        autor = normalizar(libro.autor)
+        trigramas, palabras = indices["autor"]
+        if autor not in trigramas.textos:
+            trigramas.agregar(autor, autor)
+            palabras.agregar(autor, autor)
+
+    def _desindexar(self, libro: Libro):
+        # Se llama después de quitar el libro de _libros_por_autor
+        for indice in self._indices_busqueda["titulo"]:
+            indice.quitar(libro.isbn)
+        autor = normalizar(libro.autor)
+        if autor not in self._libros_por_autor:
+            for indice in self._indices_busqueda["autor"]:
+                indice.quitar(autor)
+
+    def _indices(self, campo: str) -> tuple[IndiceTrigramas, IndicePalabras]:
+        """Índices del campo, creándolos con todo el catálogo la primera vez."""
+        if campo not in self.CAMPOS_BUSQUEDA:
+            raise ValueError(f"Campo de búsqueda desconocido: '{campo}'")
+        if self._indices_busqueda is None:
+            catalogo = self.catalogo        # antes del cerrojo: cargarlo toma las franjas
+            with self._cerrojo_catalogo:
+                if self._indices_busqueda is None:
+                    # Se publican completos: un lector nunca ve índices a medio armar
+                    indices = {c: (IndiceTrigramas(), IndicePalabras())
+                               for c in self.CAMPOS_BUSQUEDA}
+                    for libro in catalogo.values():
+                        self._indexar(libro, indices)
+                    self._indices_busqueda = indices
+        return self._indices_busqueda[campo]
+
+    def _libros(self, campo: str, claves) -> list[Libro]:
+        """Libros de las claves de un índice: ISBN en el de títulos, autor en el de autores."""
+        if campo == "titulo":
+            return [self.catalogo[isbn] for isbn in claves]
+        return [self.catalogo[isbn] for autor in claves
+                for isbn in sorted(self._libros_por_autor[autor])]
+
+    def _buscar_subcadena(self, campo: str, texto: str) -> list[Libro]:
+        trigramas, _ = self._indices(campo)
+        consulta = normalizar(texto)
+        textos = trigramas.textos
+
+        def relevancia(clave):
+            # Primero el texto idéntico, luego los que empiezan por la consulta;
+            # a igualdad, el más corto
+            t = textos[clave]
+            return t != consulta, not t.startswith(consulta), len(t), t
+
+        return self._libros(campo, sorted(trigramas.buscar(consulta), key=relevancia))
+
     def buscar_por_titulo(self, texto: str) -> list[Libro]:
-        """Busca libros cuyo título contenga el texto (sin distinción de mayúsculas)."""
-        texto = texto.lower()
-        return [l for l in self.catalogo.values() if texto in l.titulo.lower()]
+        """
+        Busca libros cuyo título contenga el texto (sin distinguir mayúsculas
+        ni tildes), los más parecidos al texto primero.
+        """
+        return self._leer(lambda: self._buscar_subcadena("titulo", texto))
 
     def buscar_por_autor(self, texto: str) -> list[Libro]:
-        """Busca libros por nombre de autor (parcial, sin distinción de mayúsculas)."""
-        texto = texto.lower()
-        return [l for l in self.catalogo.values() if texto in l.autor.lower()]
+        """Busca libros por nombre de autor (parcial, sin distinguir mayúsculas ni tildes)."""
+        return self._leer(lambda: self._buscar_subcadena("autor", texto))
+
+    def autocompletar(self, texto: str, campo: str = "titulo", limite: int = 10) -> list[Libro]:
+        """
+        Sugerencias mientras se escribe: libros cuyo título (o autor) tiene
+        todas las palabras del texto, la última como prefijo.
+        """
+        _, palabras = self._indices(campo)
+        return self._leer(lambda: self._libros(campo, palabras.completar(texto, limite))[:limite])
+
+    def buscar_aproximado(self, texto: str, campo: str = "titulo",
+                          max_errores: int | None = None, limite: int = 20) -> list[Libro]:
+        """
+        Busca tolerando errores de escritura ('garcia marques' → 'García
+        Márquez'): cada palabra puede diferir en hasta `max_errores` letras
+        (por defecto 0, 1 o 2 según su largo). Los libros con menos errores
+        aparecen primero.
+        """
+        _, palabras = self._indices(campo)
+
+        def consulta():
+            resultados = palabras.buscar_aproximado(texto, max_errores, limite)
+            return self._libros(campo, [clave for clave, _ in resultados])[:limite]
+
+        return self._leer(consulta)
+
+    def _isbns_de_categoria(self, texto: str) -> set[str]:
+        """ISBN de las categorías cuyo nombre contiene el texto (hay pocas categorías)."""
+        texto = normalizar(texto)
+        grupos = [isbns for categoria, isbns in self._libros_por_categoria.items()
+                  if texto in categoria]
+        if len(grupos) == 1:
+            return grupos[0]
+        return set().union(*grupos)
+
+    def _ordenados(self, isbns) -> list[Libro]:
+        return [self.catalogo[isbn] for isbn in sorted(isbns)]
 
     def buscar_por_categoria(self, categoria: str) -> list[Libro]:
-        """Busca libros que pertenezcan a una categoría específica."""
-        categoria = categoria.lower()
-        return [l for l in self.catalogo.values() if categoria in l.categoria.lower()]
+        """
+        Busca libros que pertenezcan a una categoría específica (basta parte
+        del nombre, sin distinguir mayúsculas ni tildes). Ordenados por ISBN.
+        """
+        return self._leer(lambda: self._ordenados(self._isbns_de_categoria(categoria)))
+
+    def buscar_disponibles(self, categoria: str | None = None) -> list[Libro]:
+        """Libros en estante, de todo el catálogo o de una categoría. Ordenados por ISBN."""
+        if categoria is None:
+            return self._leer(lambda: self._ordenados(self._disponibles))
+        return self._leer(lambda: self._ordenados(self._isbns_de_categoria(categoria)
+                                                  & self._disponibles))
+
+    def buscar_por_autor_y_categoria(self, autor: str, categoria: str,
+                                     solo_disponibles: bool = False) -> list[Libro]:
+        """
+        Libros de un autor (nombre completo, sin distinguir mayúsculas ni
+        tildes) dentro de una categoría. Ordenados por ISBN.
+        """
+        def consulta():
+            isbns = self._libros_por_autor.get(normalizar(autor), set())
+            isbns = isbns & self._isbns_de_categoria(categoria)
+            if solo_disponibles:
+                isbns &= self._disponibles
+            return self._ordenados(isbns)
+
+        return self._leer(consulta)
+
+    # ── Búsqueda general por relevancia ──────────
+    def _indice_relevancia(self) -> IndiceBM25:
+        """Índice BM25 de título, autor y categoría, creándolo la primera vez."""
+        if self._relevancia is None:
+            catalogo = self.catalogo        # antes del cerrojo: cargarlo toma las franjas
+            with self._cerrojo_catalogo:
+                if self._relevancia is None:
+                    indice = IndiceBM25()
+                    for libro in catalogo.values():
+                        indice.agregar(libro.isbn, libro.titulo, libro.autor, libro.categoria)
+                    self._relevancia = indice
+        return self._relevancia
+
+    def _buscar_sin_cache(self, consulta: str, limite: int, version: int) -> tuple[Libro, ...]:
+        # `version` solo forma parte de la clave de la caché
+        catalogo = self.catalogo
+        return tuple(catalogo[isbn] for isbn, _ in self._indice_relevancia().buscar(consulta, limite))
+
+    def buscar(self, consulta: str, limite: int = 20) -> list[Libro]:
+        """
+        Búsqueda general: hasta `limite` libros cuyo título, autor o
+        categoría contiene alguna palabra de la consulta, del más al menos
+        relevante (BM25: cuentan más las palabras raras y los textos
+        cortos). Las palabras entre comillas son una frase que el libro debe
+        contener tal cual: '"cien años" márquez'. Sin distinguir mayúsculas
+        ni tildes. Las consultas repetidas salen de la caché LRU.
+        """
+        consulta = " ".join(normalizar(consulta).split())
+        if not consulta:
+            return []
+        # La versión se lee en cada intento: si el catálogo cambia, se repite con la nueva
+        return self._leer(lambda: list(self._buscar_en_cache(consulta, limite, self._version)))
 
     # ════════════════════════════════════════════
     # REPORTES
     # ════════════════════════════════════════════
 
+    def quien_tiene(self, isbn: str) -> Usuario | None:
+        """Usuario que tiene prestado el libro, o None si está en estante."""
+        prestamo = self.prestamos.get(isbn)
+        return None if prestamo is None else self.usuarios[prestamo.id_usuario]
+
     def listar_prestamos_usuario(self, id_usuario: str):
         """Muestra todos los libros actualmente prestados a un usuario."""
         if id_usuario not in self.ids_registrados:
@@ -246,15 +1202,22 @@ class Biblioteca:
 
     def mostrar_catalogo(self):
         """Imprime el catálogo completo de la biblioteca."""
-        print(f"\n📖 Catálogo de '{self.nombre}' ({len(self.catalogo)} libros):")
-        for libro in self.catalogo.values():
+        libros = self._leer(lambda: list(self.catalogo.values()))
+        print(f"\n📖 Catálogo de '{self.nombre}' ({len(libros)} libros):")
+        for libro in libros:
             print(f"   • {libro}")
 
-    def mostrar_historial(self):
-        """Imprime el historial de operaciones."""
-        print(f"\n🗂 Historial de operaciones ({len(self.historial)} eventos):")
-        for i, evento in enumerate(self.historial, 1):
-            print(f"   {i:02d}. {evento}")
+    def mostrar_historial(self, id_usuario: str | None = None, isbn: str | None = None):
+        """Imprime el historial de operaciones, o solo las de un usuario y/o libro."""
+        with self._cerrojo_registro:
+            if id_usuario is None and isbn is None:
+                eventos = list(self.historial)
+            else:
+                eventos = self.historial.consultar(id_usuario=id_usuario, isbn=isbn)
+        print(f"\n🗂 Historial de operaciones ({len(eventos)} eventos):")
+        for evento in eventos:
+            hora = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(evento.marca_tiempo))
+            print(f"   {evento.seq:02d}. [{hora}] {evento}")
 
 
 # ============================================================
@@ -273,6 +1236,7 @@ def mostrar_menu():
     print("   2. Eliminar libro")
     print("   3. Ver catálogo completo")
     print("   4. Buscar libro")
+    print("  13. Importar libros desde CSV")
     print()
     print("  USUARIOS")
     print("   5. Registrar usuario")
@@ -283,6 +1247,8 @@ def mostrar_menu():
     print("   8. Prestar libro")
     print("   9. Devolver libro")
     print("  10. Ver libros prestados a un usuario")
+    print("  12. ¿Quién tiene un libro?")
+    print("  14. Préstamos vencidos y multas")
     print()
     print("  OTROS")
     print("  11. Ver historial de operaciones")
@@ -295,6 +1261,10 @@ def menu_buscar(bib: "Biblioteca"):
     print("   1. Título")
     print("   2. Autor")
     print("   3. Categoría")
+    print("   4. Título o autor con errores de escritura")
+    print("   5. Autocompletar título")
+    print("   6. Disponibles en una categoría")
+    print("   7. Búsqueda general (título, autor y categoría; frases entre comillas)")
     opcion = input("  Opción: ").strip()
     texto = input("  Ingresa el texto a buscar: ").strip()
 
@@ -304,6 +1274,16 @@ def menu_buscar(bib: "Biblioteca"):
         resultados = bib.buscar_por_autor(texto)
     elif opcion == "3":
         resultados = bib.buscar_por_categoria(texto)
+    elif opcion == "4":
+        resultados = bib.buscar_aproximado(texto, "titulo")
+        isbns = {l.isbn for l in resultados}
+        resultados += [l for l in bib.buscar_aproximado(texto, "autor") if l.isbn not in isbns]
+    elif opcion == "5":
+        resultados = bib.autocompletar(texto)
+    elif opcion == "6":
+        resultados = bib.buscar_disponibles(texto)
+    elif opcion == "7":
+        resultados = bib.buscar(texto)
     else:
         print("  ⚠ Opción inválida.")
         return
@@ -317,27 +1297,31 @@ def menu_buscar(bib: "Biblioteca"):
 
 if __name__ == "__main__":
 
-    # Crear biblioteca con datos de ejemplo precargados
-    bib = Biblioteca("Biblioteca Nacional Digital")
-
-    # Libros iniciales
-    for libro in [
-        Libro("Cien años de soledad",     "Gabriel García Márquez",  "Ficción",  "ISBN-001"),
-        Libro("1984",                     "George Orwell",           "Distopía", "ISBN-002"),
-        Libro("El principito",            "Antoine de Saint-Exupéry","Infantil", "ISBN-003"),
-        Libro("Sapiens",                  "Yuval Noah Harari",       "Historia", "ISBN-004"),
-        Libro("Don Quijote de la Mancha", "Miguel de Cervantes",     "Ficción",  "ISBN-005"),
-    ]:
-        bib.agregar_libro(libro)
-
-    # Usuarios iniciales
-    for u in [
-        Usuario("Ana García",   "U001"),
-        Usuario("Carlos López", "U002"),
-    ]:
-        bib.registrar_usuario(u)
-
-    print("\n  ✅ Sistema iniciado con datos de ejemplo.")
+    # Abrir la biblioteca guardada (el catálogo se lee cuando haga falta)
+    bib = Biblioteca("Biblioteca Nacional Digital", HistorialBiblioteca(eco=True),
+                     AlmacenBiblioteca(ARCHIVO_BIBLIOTECA))
+
+    if not bib.usuarios and bib.almacen.contar_libros() == 0:
+        # Primera ejecución: datos de ejemplo
+        for libro in [
+            Libro("Cien años de soledad",     "Gabriel García Márquez",  "Ficción",  "ISBN-001"),
+            Libro("1984",                     "George Orwell",           "Distopía", "ISBN-002"),
+            Libro("El principito",            "Antoine de Saint-Exupéry","Infantil", "ISBN-003"),
+            Libro("Sapiens",                  "Yuval Noah Harari",       "Historia", "ISBN-004"),
+            Libro("Don Quijote de la Mancha", "Miguel de Cervantes",     "Ficción",  "ISBN-005"),
+        ]:
+            bib.agregar_libro(libro)
+
+        for u in [
+            Usuario("Ana García",   "U001"),
+            Usuario("Carlos López", "U002"),
+        ]:
+            bib.registrar_usuario(u)
+
+        print("\n  ✅ Sistema iniciado con datos de ejemplo.")
+    else:
+        print(f"\n  ✅ Biblioteca cargada de '{ARCHIVO_BIBLIOTECA}': "
+              f"{len(bib.usuarios)} usuarios, {len(bib.prestamos)} préstamos activos.")
 
     # ── Bucle principal del menú ─────────────────
     while True:
@@ -414,12 +1398,47 @@ if __name__ == "__main__":
             bib.listar_prestamos_usuario(id_u)
             pausar()
 
+        elif opcion == "12":
+            print("\n  ── ¿Quién tiene un libro? ──")
+            isbn = input("  ISBN del libro: ").strip()
+            if bib.obtener_libro(isbn) is None:
+                print(f"  ⚠ Libro con ISBN {isbn} no existe.")
+            else:
+                usuario = bib.quien_tiene(isbn)
+                prestamo = bib.prestamos.get(isbn)
+                if usuario is None:
+                    print("  ✅ El libro está disponible en estante.")
+                else:
+                    desde = time.strftime("%Y-%m-%d %H:%M", time.localtime(prestamo.prestado_en))
+                    vence = time.strftime("%Y-%m-%d", time.localtime(prestamo.vence_en))
+                    print(f"  📤 Lo tiene {usuario.nombre} (ID: {usuario.id_usuario}) desde {desde}; "
+                          f"vence el {vence}.")
+            pausar()
+
+        elif opcion == "14":
+            bib.mostrar_vencidos()
+            pausar()
+
         # ── OTROS ───────────────────────────────
         elif opcion == "11":
-            bib.mostrar_historial()
+            id_u = input("  Filtrar por ID de usuario (Enter = todos): ").strip()
+            isbn = input("  Filtrar por ISBN (Enter = todos):          ").strip()
+            bib.mostrar_historial(id_u or None, isbn or None)
+            pausar()
+
+        elif opcion == "13":
+            print("\n  ── Importar libros desde CSV ──")
+            print("  Columnas: isbn,titulo,autor,categoria")
+            ruta = input("  Ruta del archivo: ").strip()
+            try:
+                agregados, descartados = bib.importar_csv(ruta)
+                print(f"  ✅ {agregados} libros importados, {descartados} filas descartadas.")
+            except (OSError, ValueError) as e:
+                print(f"  ⚠ No se pudo importar: {e}")
             pausar()
 
         elif opcion == "0":
+            bib.cerrar()
             print("\n  👋 ¡Hasta luego!\n")
             break
 
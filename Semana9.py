@@ -9,8 +9,24 @@ buscar y mostrar productos.
 
 
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from almacen_columnar import MAX_ENTERO, MIN_ENTERO, AlmacenColumnar, entero_64
+from escritura_atomica import escribir_atomico
+from indice_ordenado import ORDENES, IndiceOrdenado
+from indice_texto import IndiceTrigramas
 
 ARCHIVO_INVENTARIO = "inventario.txt"
+SUFIJO_DIARIO = ".log"                      # diario de operaciones: inventario.txt.log
+UMBRAL_COMPACTACION = 4 * 1024 * 1024       # bytes de diario antes de compactar
+TAMANO_BLOQUE = 8 * 1024 * 1024             # bytes leídos por bloque al cargar
+TAMANO_PAGINA = 20                          # productos por página al listar
+
+
+def _linea(id, nombre, cantidad, precio):
+    """Formato de una línea de inventario.txt."""
+    return f"{id},{nombre},{cantidad},{precio}\n"
 
 
 class Producto:
@@ -19,6 +35,8 @@ class Producto:
     Representa un producto dentro del inventario.
     """
 
+    __slots__ = ("id", "nombre", "cantidad", "precio")
+
     def __init__(self, id, nombre, cantidad, precio):
         self.id = id
         self.nombre = nombre
@@ -34,11 +52,16 @@ class Producto:
 
     def a_linea(self):
         """Serializa el producto a una línea de texto para guardar en archivo."""
-        return f"{self.id},{self.nombre},{self.cantidad},{self.precio}\n"
+        return _linea(self.id, self.nombre, self.cantidad, self.precio)
 
     @staticmethod
     def desde_linea(linea):
         """Crea un Producto a partir de una línea de texto del archivo."""
+        return Producto(*Producto.campos_desde_linea(linea))
+
+    @staticmethod
+    def campos_desde_linea(linea):
+        """Valida una línea del archivo y devuelve (id, nombre, cantidad, precio)."""
         partes = linea.strip().split(",")
         if len(partes) != 4:
             raise ValueError(f"Línea con formato inválido: '{linea.strip()}'")
@@ -46,47 +69,178 @@ class Producto:
         nombre = partes[1]
         cantidad = int(partes[2])
         precio = float(partes[3])
-        return Producto(id_, nombre, cantidad, precio)
+        if not (MIN_ENTERO <= id_ <= MAX_ENTERO and MIN_ENTERO <= cantidad <= MAX_ENTERO):
+            # Las columnas de AlmacenColumnar son array('q')
+            entero_64(id_, "ID")
+            entero_64(cantidad, "Cantidad")
+        return id_, nombre, cantidad, precio
+
+
+# ------------------------------------------------------------------ #
+#  Carga por bloques                                                   #
+# ------------------------------------------------------------------ #
+
+def _leer_bloques(f, tamano):
+    """
+    Lee un archivo binario en bloques de unos `tamano` bytes cortados siempre
+    en un salto de línea. Genera (bloque, número de su primera línea).
+    """
+    resto = b""
+    linea = 1
+    while True:
+        datos = f.read(tamano)
+        if not datos:
+            break
+        datos = resto + datos
+        corte = datos.rfind(b"\n") + 1
+        if corte == 0:
+            # Línea más larga que el bloque: se sigue acumulando
+            resto = datos
+            continue
+        bloque, resto = datos[:corte], datos[corte:]
+        yield bloque, linea
+        linea += bloque.count(b"\n")
+    if resto:
+        yield resto, linea
+
+
+def _parsear_bloque(bloque, primera_linea):
+    """
+    Convierte un bloque de líneas con las mismas reglas que Producto.desde_linea
+    (Producto.campos_desde_linea).
+    Devuelve (productos, errores): tuplas (línea, id, nombre, cantidad, precio)
+    y pares (línea, mensaje). Es una función de módulo para poder ejecutarse
+    en los procesos de trabajo.
+    """
+    try:
+        lineas = bloque.decode("utf-8").split("\n")
+    except UnicodeDecodeError:
+        # Se decodifica línea a línea para señalar solo las líneas dañadas
+        lineas = bloque.split(b"\n")
+
+    productos = []
+    errores = []
+    for i, linea in enumerate(lineas, start=primera_linea):
+        try:
+            if isinstance(linea, bytes):
+                linea = linea.decode("utf-8")
+            if linea.strip() == "":
+                continue
+            productos.append((i, *Producto.campos_desde_linea(linea)))
+        except ValueError as e:
+            errores.append((i, str(e)))
+    return productos, errores
+
+
+def _parsear_en_paralelo(bloques, procesos):
+    """
+    Reparte los bloques entre `procesos` procesos y devuelve los resultados en
+    orden. Solo hay unos pocos bloques en vuelo a la vez, así que la memoria
+    no depende del tamaño del archivo.
+    """
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for bloque, linea in bloques:
+            pendientes.append(pool.submit(_parsear_bloque, bloque, linea))
+            if len(pendientes) >= procesos * 2:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
 
 
 class Inventario:
     """
     Clase Inventario
     Gestiona la lista de productos y su persistencia en archivo.
+
+    Con diario=True cada cambio se añade como un registro corto al diario
+    (inventario.txt.log) en lugar de reescribir todo el archivo; el diario se
+    vuelca a una instantánea nueva cuando supera umbral_compactacion bytes
+    o al llamar a compactar().
+
+    Los productos se guardan por columnas en un AlmacenColumnar, en el mismo
+    orden que en el archivo, con un índice de ID a fila: buscar, eliminar o
+    actualizar por ID no recorre nada. Al eliminar, la fila queda como hueco
+    en lugar de desplazar las siguientes; los huecos se recogen cuando superan
+    la mitad de las filas. Los objetos Producto solo se crean al devolverlos
+    (productos, búsquedas) y son copias: los cambios se hacen con
+    actualizar_producto.
+
+    Las búsquedas por nombre usan un índice de trigramas (sin distinguir
+    mayúsculas ni tildes) que se construye en la primera búsqueda y después
+    se mantiene con cada alta y baja. listar() pagina con un IndiceOrdenado
+    que se crea igual, en el primer listado, y se mantiene con cada cambio.
+
+    El archivo se lee por bloques de TAMANO_BLOQUE bytes; si ocupa más de un
+    bloque, los bloques se analizan en paralelo con `procesos` procesos
+    (por defecto, uno por núcleo).
+
+    agregar_observador(funcion) registra una función a la que se llama tras
+    cada cambio ya guardado con (operacion, antes, despues): operacion es
+    "agregar", "eliminar" o "actualizar" y antes/despues son tuplas
+    (id, nombre, cantidad, precio), o None si el producto no existía / ya no
+    existe.
     """
 
-    def __init__(self, archivo=ARCHIVO_INVENTARIO):
+    def __init__(self, archivo=ARCHIVO_INVENTARIO, diario=False,
+                 umbral_compactacion=UMBRAL_COMPACTACION, procesos=None):
         self.archivo = archivo
-        self.productos = []
+        self.archivo_diario = archivo + SUFIJO_DIARIO
+        self.diario = diario
+        self.umbral_compactacion = umbral_compactacion
+        self.procesos = procesos or os.cpu_count() or 1
+        self._tamano_diario = 0
+        self._almacen = AlmacenColumnar()
+        self._indice_nombres = None     # IndiceTrigramas, creado al buscar
+        self._indice_orden = None       # IndiceOrdenado, creado al listar
+        self._observadores = []
         self._cargar_desde_archivo()
 
+    def __len__(self):
+        return len(self._almacen)
+
+    @property
+    def productos(self):
+        """Lista de productos vigentes, en el orden del archivo."""
+        almacen = self._almacen
+        return [Producto(*almacen.campos(f)) for f in almacen.filas()]
+
     # ------------------------------------------------------------------ #
     #  Persistencia                                                        #
     # ------------------------------------------------------------------ #
 
     def _cargar_desde_archivo(self):
-        """Carga los productos desde el archivo al iniciar el programa."""
+        """Carga los productos desde el archivo y reproduce el diario pendiente."""
         if not os.path.exists(self.archivo):
             # El archivo no existe: se creará vacío la primera vez que se guarde
             print(f"[INFO] Archivo '{self.archivo}' no encontrado. Se creará uno nuevo.")
-            return
+        else:
+            self._cargar_instantanea()
+        self._reproducir_diario()
 
+    def _cargar_instantanea(self):
+        """Lee el archivo principal (una línea por producto) por bloques."""
         try:
-            with open(self.archivo, "r", encoding="utf-8") as f:
-                lineas = f.readlines()
-
-            errores = 0
-            for i, linea in enumerate(lineas, start=1):
-                if linea.strip() == "":
-                    continue
-                try:
-                    producto = Producto.desde_linea(linea)
-                    self.productos.append(producto)
-                except ValueError as e:
-                    print(f"[ADVERTENCIA] Línea {i} ignorada: {e}")
-                    errores += 1
-
-            print(f"[INFO] Inventario cargado: {len(self.productos)} producto(s)"
+            with open(self.archivo, "rb") as f:
+                bloques = _leer_bloques(f, TAMANO_BLOQUE)
+                if self.procesos > 1 and os.path.getsize(self.archivo) > TAMANO_BLOQUE:
+                    resultados = _parsear_en_paralelo(bloques, self.procesos)
+                else:
+                    resultados = (_parsear_bloque(b, linea) for b, linea in bloques)
+
+                errores = 0
+                for productos, errores_bloque in resultados:
+                    for i, e in errores_bloque:
+                        print(f"[ADVERTENCIA] Línea {i} ignorada: {e}")
+                    errores += len(errores_bloque)
+                    for i, id_, nombre, cantidad, precio in productos:
+                        if id_ in self._almacen:
+                            print(f"[ADVERTENCIA] Línea {i} ignorada: ID duplicado: {id_}")
+                            errores += 1
+                            continue
+                        self._almacen.agregar(id_, nombre, cantidad, precio)
+
+            print(f"[INFO] Inventario cargado: {len(self._almacen)} producto(s)"
                   + (f", {errores} línea(s) con error ignorada(s)." if errores else "."))
 
         except PermissionError:
@@ -94,13 +248,78 @@ class Inventario:
         except OSError as e:
             print(f"[ERROR] No se pudo leer '{self.archivo}': {e}. El inventario comenzará vacío.")
 
+    def _reproducir_diario(self):
+        """Aplica sobre la instantánea las operaciones registradas en el diario."""
+        if not os.path.exists(self.archivo_diario):
+            return
+
+        aplicadas = 0
+        incompleto = False
+        try:
+            with open(self.archivo_diario, "r", encoding="utf-8") as f:
+                for i, linea in enumerate(f, start=1):
+                    if not linea.endswith("\n"):
+                        # La última escritura se interrumpió a mitad de registro
+                        print(f"[ADVERTENCIA] Registro {i} del diario incompleto, se descarta.")
+                        incompleto = True
+                        break
+                    try:
+                        self._aplicar_registro(linea)
+                        aplicadas += 1
+                    except ValueError as e:
+                        print(f"[ADVERTENCIA] Registro {i} del diario ignorado: {e}")
+            self._tamano_diario = os.path.getsize(self.archivo_diario)
+        except OSError as e:
+            print(f"[ERROR] No se pudo leer el diario '{self.archivo_diario}': {e}")
+            return
+
+        if aplicadas:
+            print(f"[INFO] Diario reproducido: {aplicadas} operación(es) pendiente(s).")
+        if incompleto:
+            # Se consolida para que los próximos registros no queden pegados al trozo roto
+            self.compactar()
+
+    def _aplicar_registro(self, registro):
+        """
+        Aplica un registro del diario. Los registros dejan el producto en un
+        estado concreto, así que reproducirlos dos veces no altera el resultado.
+        """
+        tipo, _, resto = registro.rstrip("\n").partition(",")
+        almacen = self._almacen
+        if tipo == "A":
+            id_, nombre, cantidad, precio = Producto.campos_desde_linea(resto)
+            fila = almacen.fila_de(id_)
+            if fila is None:
+                almacen.agregar(id_, nombre, cantidad, precio)
+            else:
+                almacen.reemplazar(fila, nombre, cantidad, precio)
+            if self._indice_nombres is not None:
+                self._indice_nombres.agregar(id_, nombre)
+        elif tipo == "E":
+            id_ = int(resto)
+            if id_ in almacen:
+                almacen.quitar(id_)
+                almacen.recoger_huecos()
+                if self._indice_nombres is not None:
+                    self._indice_nombres.quitar(id_)
+        elif tipo == "U":
+            partes = resto.split(",")
+            if len(partes) != 3:
+                raise ValueError(f"Registro con formato inválido: '{registro.strip()}'")
+            fila = almacen.fila_de(int(partes[0]))
+            if fila is not None:
+                almacen.actualizar(fila, entero_64(int(partes[1]), "Cantidad"), float(partes[2]))
+        else:
+            raise ValueError(f"Tipo de registro desconocido: '{registro.strip()}'")
+
     def _guardar_en_archivo(self):
-        """Escribe todos los productos en el archivo (sobreescritura completa)."""
+        """
+        Escribe todos los productos en el archivo (sobreescritura completa).
+        Se escribe en un temporal que luego reemplaza al archivo, así que un
+        fallo a mitad de escritura no deja el inventario truncado.
+        """
         try:
-            with open(self.archivo, "w", encoding="utf-8") as f:
-                for p in self.productos:
-                    f.write(p.a_linea())
-            return True
+            escribir_atomico(self.archivo, (_linea(*c) for c in self._almacen.recorrer()))
         except PermissionError:
             print(f"[ERROR] Sin permiso para escribir en '{self.archivo}'.")
             return False
@@ -108,68 +327,186 @@ class Inventario:
             print(f"[ERROR] No se pudo guardar en '{self.archivo}': {e}")
             return False
 
+        # La instantánea ya contiene todo lo que había en el diario
+        self._vaciar_diario()
+        return True
+
+    def _vaciar_diario(self):
+        """Elimina el diario una vez que su contenido está en la instantánea."""
+        if not os.path.exists(self.archivo_diario):
+            self._tamano_diario = 0
+            return
+        try:
+            os.remove(self.archivo_diario)
+            self._tamano_diario = 0
+        except OSError as e:
+            # No es grave: reproducir el diario sobre la instantánea nueva es inocuo
+            print(f"[ADVERTENCIA] No se pudo vaciar el diario '{self.archivo_diario}': {e}")
+
+    def _anotar_en_diario(self, registro):
+        """Añade un registro al final del diario."""
+        try:
+            with open(self.archivo_diario, "a", encoding="utf-8") as f:
+                f.write(registro)
+                self._tamano_diario = f.tell()
+            return True
+        except PermissionError:
+            print(f"[ERROR] Sin permiso para escribir en '{self.archivo_diario}'.")
+            return False
+        except OSError as e:
+            print(f"[ERROR] No se pudo escribir en el diario '{self.archivo_diario}': {e}")
+            return False
+
+    def _persistir(self, registro):
+        """
+        Guarda una mutación. En modo diario solo se añade el registro (y se
+        compacta al superar el umbral); si no, se reescribe el archivo completo.
+        """
+        if not self.diario:
+            return self._guardar_en_archivo()
+        if not self._anotar_en_diario(registro):
+            return False
+        if self._tamano_diario >= self.umbral_compactacion:
+            # Si la compactación falla el cambio ya está a salvo en el diario
+            self.compactar()
+        return True
+
+    def compactar(self):
+        """Vuelca el inventario a una instantánea nueva y vacía el diario."""
+        return self._guardar_en_archivo()
+
+    # ------------------------------------------------------------------ #
+    #  Observadores                                                        #
+    # ------------------------------------------------------------------ #
+
+    def agregar_observador(self, funcion):
+        """Registra funcion(operacion, antes, despues) para cada cambio guardado."""
+        self._observadores.append(funcion)
+
+    def quitar_observador(self, funcion):
+        self._observadores.remove(funcion)
+
+    def _notificar(self, operacion, antes, despues):
+        for funcion in self._observadores:
+            funcion(operacion, antes, despues)
+
     # ------------------------------------------------------------------ #
     #  Operaciones CRUD                                                    #
     # ------------------------------------------------------------------ #
 
     def agregar_producto(self, producto):
         """Agrega un producto al inventario validando que el ID sea único."""
-        for p in self.productos:
-            if p.id == producto.id:
-                return False, "ID duplicado."
-
-        self.productos.append(producto)
-
-        if self._guardar_en_archivo():
+        if not (MIN_ENTERO <= producto.id <= MAX_ENTERO
+                and MIN_ENTERO <= producto.cantidad <= MAX_ENTERO):
+            return False, "ID o cantidad fuera del rango de 64 bits."
+        if producto.id in self._almacen:
+            return False, "ID duplicado."
+
+        self._almacen.agregar(producto.id, producto.nombre, producto.cantidad, producto.precio)
+
+        if self._persistir("A," + producto.a_linea()):
+            if self._indice_nombres is not None:
+                self._indice_nombres.agregar(producto.id, producto.nombre)
+            fila = (producto.id, producto.nombre, producto.cantidad, producto.precio)
+            if self._indice_orden is not None:
+                self._indice_orden.agregar(fila)
+            if self._observadores:
+                self._notificar("agregar", None, fila)
             return True, "Producto agregado y guardado en archivo correctamente."
         else:
             # Se revierte la adición en memoria para mantener consistencia
-            self.productos.remove(producto)
+            self._almacen.deshacer_agregar()
             return False, "No se pudo guardar el producto en el archivo."
 
     def eliminar_producto(self, id):
         """Elimina un producto del inventario por su ID."""
-        for p in self.productos:
-            if p.id == id:
-                self.productos.remove(p)
-                if self._guardar_en_archivo():
-                    return True, "Producto eliminado y archivo actualizado."
-                else:
-                    # Revertir
-                    self.productos.append(p)
-                    return False, "No se pudo actualizar el archivo tras eliminar."
-        return False, "Producto no encontrado."
+        if id not in self._almacen:
+            return False, "Producto no encontrado."
+
+        antes = self._almacen.campos(self._almacen.fila_de(id))
+        fila = self._almacen.quitar(id)
+        if self._persistir(f"E,{id}\n"):
+            self._almacen.recoger_huecos()
+            if self._indice_nombres is not None:
+                self._indice_nombres.quitar(id)
+            if self._indice_orden is not None:
+                self._indice_orden.quitar(antes)
+            if self._observadores:
+                self._notificar("eliminar", antes, None)
+            return True, "Producto eliminado y archivo actualizado."
+        else:
+            # Revertir: el producto vuelve a su posición original
+            self._almacen.restaurar(fila)
+            return False, "No se pudo actualizar el archivo tras eliminar."
 
     def actualizar_producto(self, id, cantidad, precio):
         """Actualiza la cantidad y el precio de un producto por su ID."""
-        for p in self.productos:
-            if p.id == id:
-                cantidad_anterior = p.cantidad
-                precio_anterior = p.precio
-                p.actualizar(cantidad, precio)
-                if self._guardar_en_archivo():
-                    return True, "Producto actualizado y archivo guardado."
-                else:
-                    # Revertir
-                    p.actualizar(cantidad_anterior, precio_anterior)
-                    return False, "No se pudo guardar el archivo tras actualizar."
-        return False, "Producto no encontrado."
+        if not MIN_ENTERO <= cantidad <= MAX_ENTERO:
+            return False, "Cantidad fuera del rango de 64 bits."
+        almacen = self._almacen
+        fila = almacen.fila_de(id)
+        if fila is None:
+            return False, "Producto no encontrado."
+
+        cantidad_anterior = almacen.cantidades[fila]
+        precio_anterior = almacen.precios[fila]
+        almacen.actualizar(fila, cantidad, precio)
+        if self._persistir(f"U,{id},{cantidad},{precio}\n"):
+            if self._observadores or self._indice_orden is not None:
+                nombre = almacen.nombre(fila)
+                antes = (id, nombre, cantidad_anterior, precio_anterior)
+                despues = (id, nombre, cantidad, precio)
+                if self._indice_orden is not None:
+                    self._indice_orden.cambiar(antes, despues)
+                self._notificar("actualizar", antes, despues)
+            return True, "Producto actualizado y archivo guardado."
+        else:
+            # Revertir
+            almacen.actualizar(fila, cantidad_anterior, precio_anterior)
+            return False, "No se pudo guardar el archivo tras actualizar."
+
+    def buscar(self, nombre):
+        """Devuelve los productos cuyo nombre contiene el texto, en el orden del archivo."""
+        almacen = self._almacen
+        if self._indice_nombres is None:
+            self._indice_nombres = IndiceTrigramas()
+            for fila in almacen.filas():
+                self._indice_nombres.agregar(almacen.ids[fila], almacen.nombre(fila))
+        filas = sorted(almacen.fila_de(id) for id in self._indice_nombres.buscar(nombre))
+        return [Producto(*almacen.campos(f)) for f in filas]
 
     def buscar_por_nombre(self, nombre):
         """Busca productos cuyo nombre coincida total o parcialmente."""
-        encontrados = [p for p in self.productos if nombre.lower() in p.nombre.lower()]
+        encontrados = self.buscar(nombre)
         if encontrados:
             for p in encontrados:
                 print(p)
         else:
             print("No se encontraron productos con ese nombre.")
 
+    def listar(self, offset=0, limite=TAMANO_PAGINA, orden="id", descendente=False,
+               despues=None):
+        """
+        Devuelve una página de productos ordenados por `orden` (una clave de
+        ORDENES: id, nombre, cantidad o precio): hasta `limite` productos
+        (todos si es None) a partir de la posición `offset`, o del producto
+        siguiente a `despues` (el último de la página anterior).
+        """
+        almacen = self._almacen
+        if self._indice_orden is None:
+            self._indice_orden = IndiceOrdenado(almacen.recorrer)
+        if despues is not None:
+            despues = (despues.id, despues.nombre, despues.cantidad, despues.precio)
+        ids = self._indice_orden.ids(orden, offset, limite, descendente, despues)
+        return [Producto(*almacen.campos(almacen.fila_de(id))) for id in ids]
+
     def mostrar_todos(self):
         """Muestra todos los productos del inventario."""
-        if not self.productos:
+        productos = self.productos
+        if not productos:
             print("Inventario vacío.")
         else:
-            for p in self.productos:
+            for p in productos:
                 print(p)
 
 
@@ -220,9 +557,9 @@ class Menu:
     def _leer_entero(prompt):
         while True:
             try:
-                return int(input(prompt))
+                return entero_64(int(input(prompt)), "El número")
             except ValueError:
-                print("[ERROR] Debe ingresar un número entero válido.")
+                print("[ERROR] Debe ingresar un número entero válido (de 64 bits).")
 
     @staticmethod
     def _leer_flotante(prompt):
@@ -275,7 +612,27 @@ class Menu:
 
     def mostrar_inventario(self):
         print("\n--- Inventario Completo ---")
-        self.inventario.mostrar_todos()
+        orden = input(f"Ordenar por ({'/'.join(ORDENES)}) [id]: ").strip().lower() or "id"
+        if orden not in ORDENES:
+            print("[ERROR] Orden no válido.")
+            return
+        total = len(self.inventario)
+        if total == 0:
+            print("Inventario vacío.")
+            return
+        offset = 0
+        ultimo = None
+        while offset < total:
+            pagina = self.inventario.listar(0, TAMANO_PAGINA, orden, despues=ultimo)
+            for p in pagina:
+                print(p)
+            offset += len(pagina)
+            if not pagina or offset >= total:
+                break
+            ultimo = pagina[-1]
+            seguir = input(f"-- {offset} de {total}. Enter para continuar, 'q' para salir: ")
+            if seguir.strip().lower() == "q":
+                break
 
 
 # Punto de entrada del programa
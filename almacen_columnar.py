@@ -0,0 +1,225 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Almacén columnar de productos para inventarios grandes. En lugar de un
+objeto por producto, cada campo se guarda en su propia columna compacta
+(array) y los nombres en una tabla de cadenas UTF-8 contigua.
+"""
+
+from array import array
+
+_VACIA = -1          # ranura del índice sin usar
+_BORRADA = -2        # ranura de un producto eliminado
+_MEZCLA = 0x9E3779B97F4A7C15   # hash multiplicativo: ranura = bits altos de id * _MEZCLA
+MIN_ENTERO = -(1 << 63)         # rango de una columna array('q') (ids y cantidades)
+MAX_ENTERO = (1 << 63) - 1
+
+
+def entero_64(valor, campo):
+    """Devuelve `valor` si cabe en una columna array('q'); si no, lanza ValueError."""
+    if not MIN_ENTERO <= valor <= MAX_ENTERO:
+        raise ValueError(f"{campo} fuera del rango de 64 bits: {valor}")
+    return valor
+
+
+class AlmacenColumnar:
+    """
+    Clase AlmacenColumnar
+    Guarda los productos por columnas, una fila por producto:
+
+      - ids, cantidades (array 'q'):  enteros de 64 bits
+      - precios (array 'd'):          números reales
+      - nombre_inicio, nombre_largo:  posición del nombre en la tabla de
+                                      cadenas (un bytearray UTF-8)
+      - vivos (bytearray):            1 = fila vigente, 0 = producto eliminado
+
+    El índice ID → fila es una tabla hash de direccionamiento abierto guardada
+    también en un array('q'), para no pagar un objeto int por clave y valor
+    como en un dict. Eliminar solo marca la fila como hueco, así que las demás
+    conservan su posición (y su orden); los huecos se recogen con
+    recoger_huecos().
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.cantidades = array("q")
+        self.precios = array("d")
+        self.nombre_inicio = array("q")
+        self.nombre_largo = array("I")
+        self.vivos = bytearray()
+        self.huecos = 0
+        self._nombres = bytearray()
+        self._vigentes = 0
+        self._crear_indice(8)
+
+    def __len__(self):
+        return self._vigentes
+
+    def __contains__(self, id):
+        return self.fila_de(id) is not None
+
+    # ─────────────────────────────
+    # Índice ID → fila
+    # ─────────────────────────────
+
+    def _crear_indice(self, capacidad):
+        bits = max(3, (capacidad * 2 - 1).bit_length())
+        self._bits = bits
+        self._mascara = (1 << bits) - 1
+        self._indice = array("q", [_VACIA]) * (1 << bits)
+        self._ocupadas = 0          # ranuras no vacías (incluye borradas)
+
+    def _buscar_ranura(self, id):
+        """Ranura que apunta a la fila vigente de ese ID, o -1."""
+        indice, ids, mascara = self._indice, self.ids, self._mascara
+        ranura = ((id * _MEZCLA) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._bits)
+        while True:
+            fila = indice[ranura]
+            if fila == _VACIA:
+                return -1
+            if fila >= 0 and ids[fila] == id:
+                return ranura
+            ranura = (ranura + 1) & mascara
+
+    def _indexar(self, fila):
+        """Añade al índice una fila ya marcada como vigente."""
+        # Se mantiene al menos un 40 % de ranuras vacías para sondeos cortos
+        if (self._ocupadas + 1) * 5 > len(self._indice) * 3:
+            self._reconstruir_indice()      # ya incluye esta fila
+        else:
+            self._colocar(fila)
+
+    def _colocar(self, fila):
+        indice, mascara = self._indice, self._mascara
+        ranura = ((self.ids[fila] * _MEZCLA) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._bits)
+        while indice[ranura] >= 0:
+            ranura = (ranura + 1) & mascara
+        if indice[ranura] == _VACIA:
+            self._ocupadas += 1
+        indice[ranura] = fila
+
+    def _reconstruir_indice(self):
+        self._crear_indice(max(8, self._vigentes))
+        for fila in self.filas():
+            self._colocar(fila)
+
+    # ─────────────────────────────
+    # Lectura
+    # ─────────────────────────────
+
+    def fila_de(self, id):
+        """Fila del producto con ese ID, o None si no existe."""
+        ranura = self._buscar_ranura(id)
+        return None if ranura < 0 else self._indice[ranura]
+
+    def nombre(self, fila):
+        inicio = self.nombre_inicio[fila]
+        return self._nombres[inicio:inicio + self.nombre_largo[fila]].decode("utf-8")
+
+    def campos(self, fila):
+        """Devuelve (id, nombre, cantidad, precio) de una fila."""
+        return self.ids[fila], self.nombre(fila), self.cantidades[fila], self.precios[fila]
+
+    def filas(self):
+        """Recorre las filas vigentes en orden de inserción."""
+        vivos = self.vivos
+        return (i for i in range(len(vivos)) if vivos[i])
+
+    def recorrer(self):
+        """Genera (id, nombre, cantidad, precio) de las filas vigentes, en orden."""
+        nombres = self._nombres
+        for vivo, id, inicio, largo, cantidad, precio in zip(
+                self.vivos, self.ids, self.nombre_inicio,
+                self.nombre_largo, self.cantidades, self.precios):
+            if vivo:
+                yield id, nombres[inicio:inicio + largo].decode("utf-8"), cantidad, precio
+
+    # ─────────────────────────────
+    # Escritura
+    # ─────────────────────────────
+
+    def _guardar_nombre(self, nombre):
+        datos = nombre.encode("utf-8")
+        inicio = len(self._nombres)
+        self._nombres += datos
+        return inicio, len(datos)
+
+    def agregar(self, id, nombre, cantidad, precio):
+        """Añade una fila al final y devuelve su número."""
+        # Antes de tocar ninguna columna, para no dejar la fila a medias
+        if not (MIN_ENTERO <= id <= MAX_ENTERO and MIN_ENTERO <= cantidad <= MAX_ENTERO):
+            entero_64(id, "ID")
+            entero_64(cantidad, "Cantidad")
+        fila = len(self.ids)
+        inicio, largo = self._guardar_nombre(nombre)
+        self.ids.append(id)
+        self.cantidades.append(cantidad)
+        self.precios.append(precio)
+        self.nombre_inicio.append(inicio)
+        self.nombre_largo.append(largo)
+        self.vivos.append(1)
+        self._vigentes += 1
+        self._indexar(fila)
+        return fila
+
+    def deshacer_agregar(self):
+        """Quita la última fila añadida (para revertir un agregar)."""
+        self._indice[self._buscar_ranura(self.ids[-1])] = _BORRADA
+        del self._nombres[self.nombre_inicio.pop():]
+        self.nombre_largo.pop()
+        self.ids.pop()
+        self.cantidades.pop()
+        self.precios.pop()
+        self.vivos.pop()
+        self._vigentes -= 1
+
+    def quitar(self, id):
+        """Marca como hueco la fila del producto y devuelve su número."""
+        ranura = self._buscar_ranura(id)
+        fila = self._indice[ranura]
+        self._indice[ranura] = _BORRADA
+        self.vivos[fila] = 0
+        self.huecos += 1
+        self._vigentes -= 1
+        return fila
+
+    def restaurar(self, fila):
+        """Deshace quitar: la fila vuelve a estar vigente en su posición."""
+        self.vivos[fila] = 1
+        self.huecos -= 1
+        self._vigentes += 1
+        self._indexar(fila)
+
+    def actualizar(self, fila, cantidad, precio):
+        self.cantidades[fila] = entero_64(cantidad, "Cantidad")
+        self.precios[fila] = precio
+
+    def reemplazar(self, fila, nombre, cantidad, precio):
+        # El nombre anterior queda sin uso en la tabla hasta recoger_huecos()
+        self.nombre_inicio[fila], self.nombre_largo[fila] = self._guardar_nombre(nombre)
+        self.actualizar(fila, cantidad, precio)
+
+    def recoger_huecos(self):
+        """
+        Compacta las columnas cuando los huecos superan la mitad de las filas.
+        La tabla de nombres se reescribe sin los nombres que ya no se usan.
+        """
+        if self.huecos * 2 <= len(self.vivos):
+            return
+        vigentes = list(self.filas())
+        nombres = [self.nombre(f) for f in vigentes]
+
+        self._nombres = bytearray()
+        self.ids = array("q", (self.ids[f] for f in vigentes))
+        self.cantidades = array("q", (self.cantidades[f] for f in vigentes))
+        self.precios = array("d", (self.precios[f] for f in vigentes))
+        self.nombre_inicio = array("q")
+        self.nombre_largo = array("I")
+        for nombre in nombres:
+            inicio, largo = self._guardar_nombre(nombre)
+            self.nombre_inicio.append(inicio)
+            self.nombre_largo.append(largo)
+        self.vivos = bytearray(b"\x01") * len(vigentes)
+        self.huecos = 0
+        self._reconstruir_indice()
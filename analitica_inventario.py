@@ -0,0 +1,217 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Indicadores del inventario: valor total del stock, productos por debajo del
+punto de pedido y los N productos de mayor valor. Se calculan sobre las
+columnas de cantidad y precio (AlmacenColumnar) con NumPy si está instalado,
+o con array + math/statistics si no. Los resultados se guardan y se corrigen
+con cada cambio que avisa el inventario, sin volver a recorrerlo.
+"""
+
+import heapq
+import math
+import statistics
+from bisect import insort
+
+from almacen_columnar import AlmacenColumnar
+
+try:
+    import numpy as np
+except ImportError:          # NumPy es opcional
+    np = None
+
+MAX_EN_CACHE = 8             # umbrales / tamaños de ranking guardados a la vez
+
+
+class AnaliticaInventario:
+    """
+    Clase AnaliticaInventario
+    Indicadores de un Semana9.Inventario o de un inventario_archivo.Inventario.
+
+    Con Semana9 se leen directamente las columnas de su AlmacenColumnar; con
+    inventario_archivo se copia el catálogo a un AlmacenColumnar propio que
+    se mantiene con los avisos del inventario (agregar_observador).
+
+    Caché:
+      - valor_total:  se corrige con la diferencia de cada cambio
+      - bajo_umbral:  umbral → [conjunto de IDs, lista ya construida]; se
+                      añade o quita el ID cambiado y la lista se rehace solo
+                      si el cambio la afecta
+      - mayores:      n → lista ordenada de (-valor, id); solo se recalcula si
+                      el producto que baja estaba entre los n primeros
+      - precios:      media y mediana, se descartan con cualquier cambio
+    """
+
+    def __init__(self, inventario, usar_numpy=True):
+        self.inventario = inventario
+        self.usar_numpy = usar_numpy and np is not None
+        almacen = getattr(inventario, "_almacen", None)
+        self._propias = not isinstance(almacen, AlmacenColumnar)
+        if self._propias:
+            almacen = AlmacenColumnar()
+            for p in inventario.almacen.todos():
+                almacen.agregar(p.id, p.nombre, p.cantidad, p.precio)
+        self.columnas = almacen
+        self._valor_total = None
+        self._bajo_umbral = {}
+        self._mayores = {}
+        self._precios = None
+        inventario.agregar_observador(self._al_cambiar)
+
+    def cerrar(self):
+        """Deja de seguir los cambios del inventario."""
+        self.inventario.quitar_observador(self._al_cambiar)
+
+    # ─────────────────────────────
+    # Cálculo completo
+    # ─────────────────────────────
+
+    def _vectores(self):
+        # Vistas sin copia; no deben salir de aquí, porque un array que
+        # exporta su memoria no puede crecer
+        c = self.columnas
+        return (np.frombuffer(c.ids, dtype=np.int64),
+                np.frombuffer(c.cantidades, dtype=np.int64),
+                np.frombuffer(c.precios, dtype=np.float64),
+                np.frombuffer(c.vivos, dtype=np.bool_))
+
+    def _calcular_valor_total(self):
+        c = self.columnas
+        if not c.ids:
+            return 0.0
+        if self.usar_numpy:
+            _, cantidades, precios, vivos = self._vectores()
+            return float(np.dot(cantidades[vivos], precios[vivos]))
+        return math.fsum(cantidad * precio for cantidad, precio, vivo
+                         in zip(c.cantidades, c.precios, c.vivos) if vivo)
+
+    def _calcular_bajo_umbral(self, umbral):
+        c = self.columnas
+        if not c.ids:
+            return set()
+        if self.usar_numpy:
+            ids, cantidades, _, vivos = self._vectores()
+            return set(ids[(cantidades < umbral) & vivos].tolist())
+        return {id for id, cantidad, vivo in zip(c.ids, c.cantidades, c.vivos)
+                if vivo and cantidad < umbral}
+
+    def _calcular_mayores(self, n):
+        c = self.columnas
+        n = min(n, len(c))
+        if n == 0:
+            return []
+        if self.usar_numpy:
+            ids, cantidades, precios, vivos = self._vectores()
+            valores = np.where(vivos, cantidades * precios, -np.inf)
+            corte = valores[np.argpartition(-valores, n - 1)[n - 1]]
+            # Todas las filas que empatan con el corte, para desempatar por ID
+            filas = np.flatnonzero(valores >= corte)
+            filas = filas[np.lexsort((ids[filas], -valores[filas]))[:n]]
+            return list(zip((-valores[filas]).tolist(), ids[filas].tolist()))
+        return heapq.nsmallest(n, ((-cantidad * precio, id) for id, cantidad, precio, vivo
+                                   in zip(c.ids, c.cantidades, c.precios, c.vivos) if vivo))
+
+    def _calcular_precios(self):
+        c = self.columnas
+        if not len(c):
+            return 0.0, 0.0
+        if self.usar_numpy:
+            _, _, precios, vivos = self._vectores()
+            vigentes = precios[vivos]
+            return float(vigentes.mean()), float(np.median(vigentes))
+        vigentes = [precio for precio, vivo in zip(c.precios, c.vivos) if vivo]
+        return statistics.fmean(vigentes), statistics.median(vigentes)
+
+    # ─────────────────────────────
+    # Indicadores
+    # ─────────────────────────────
+
+    def valor_total(self):
+        """Suma de cantidad × precio de todos los productos."""
+        if self._valor_total is None:
+            self._valor_total = self._calcular_valor_total()
+        return self._valor_total
+
+    def bajo_umbral(self, umbral):
+        """Productos con cantidad menor que `umbral`, como (id, nombre, cantidad), por ID."""
+        entrada = self._bajo_umbral.get(umbral)
+        if entrada is None:
+            if len(self._bajo_umbral) >= MAX_EN_CACHE:
+                del self._bajo_umbral[next(iter(self._bajo_umbral))]
+            entrada = self._bajo_umbral[umbral] = [self._calcular_bajo_umbral(umbral), None]
+        if entrada[1] is None:
+            c = self.columnas
+            filas = (c.fila_de(id) for id in sorted(entrada[0]))
+            entrada[1] = [(c.ids[f], c.nombre(f), c.cantidades[f]) for f in filas]
+        return list(entrada[1])
+
+    def mayores(self, n=10):
+        """Los n productos de mayor valor, como (id, nombre, valor), de mayor a menor."""
+        ranking = self._mayores.get(n)
+        if ranking is None:
+            if len(self._mayores) >= MAX_EN_CACHE:
+                del self._mayores[next(iter(self._mayores))]
+            ranking = self._mayores[n] = self._calcular_mayores(n)
+        c = self.columnas
+        return [(id, c.nombre(c.fila_de(id)), -valor) for valor, id in ranking]
+
+    def estadisticas_precio(self):
+        """Media y mediana de los precios."""
+        if self._precios is None:
+            self._precios = self._calcular_precios()
+        return self._precios
+
+    # ─────────────────────────────
+    # Cambios del inventario
+    # ─────────────────────────────
+
+    def _al_cambiar(self, operacion, antes, despues):
+        if self._propias:
+            c = self.columnas
+            if antes is None:
+                c.agregar(*despues)
+            elif despues is None:
+                c.quitar(antes[0])
+                c.recoger_huecos()
+            else:
+                c.actualizar(c.fila_de(despues[0]), despues[2], despues[3])
+
+        id = (antes or despues)[0]
+        valor_antes = antes[2] * antes[3] if antes is not None else 0.0
+        valor_despues = despues[2] * despues[3] if despues is not None else 0.0
+        if self._valor_total is not None:
+            self._valor_total += valor_despues - valor_antes
+
+        for umbral, entrada in self._bajo_umbral.items():
+            ids = entrada[0]
+            if id in ids or (despues is not None and despues[2] < umbral):
+                entrada[1] = None
+            if despues is not None and despues[2] < umbral:
+                ids.add(id)
+            else:
+                ids.discard(id)
+
+        for n in list(self._mayores):
+            self._corregir_mayores(n, id, valor_antes, antes, despues, valor_despues)
+
+        self._precios = None
+
+    def _corregir_mayores(self, n, id, valor_antes, antes, despues, valor_despues):
+        ranking = self._mayores[n]
+        estaba = antes is not None and (-valor_antes, id) in ranking
+        if estaba:
+            if despues is None or valor_despues < valor_antes:
+                # Otro producto fuera del ranking podría ocupar su lugar
+                del self._mayores[n]
+                return
+            ranking.remove((-valor_antes, id))
+            insort(ranking, (-valor_despues, id))
+        elif despues is not None:
+            clave = (-valor_despues, id)
+            if len(ranking) < n:
+                # El ranking tenía todos los productos: el nuevo también entra
+                insort(ranking, clave)
+            elif clave < ranking[-1]:
+                insort(ranking, clave)
+                ranking.pop()
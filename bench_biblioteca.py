@@ -0,0 +1,961 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Mediciones de rendimiento de la biblioteca (Biblioteca_Digital.py).
+Cada medición es un subcomando, por ejemplo:
+
+    python bench_biblioteca.py busqueda --libros 1000000
+
+Los catálogos de prueba se generan al vuelo con una semilla fija.
+"""
+
+import argparse
+import contextlib
+import csv
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from Biblioteca_Digital import SEGUNDOS_POR_DIA, Biblioteca, Libro, Usuario, material_de
+from bench_inventario import _medir, _segundos, _tabla
+from historial_biblioteca import HistorialBiblioteca
+from persistencia_biblioteca import AlmacenBiblioteca
+from indice_texto import normalizar
+
+SEMILLA = 2024
+
+
+# ═══════════════════════════════════════════════
+# Utilidades
+# ═══════════════════════════════════════════════
+
+@contextlib.contextmanager
+def _silencio():
+    """Descarta lo que imprime la biblioteca en cada operación."""
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        yield
+
+
+_SILABAS = ("ma", "me", "mi", "lo", "la", "sa", "so", "ta", "te", "ri", "ro", "ca", "co",
+            "ne", "na", "pe", "pa", "di", "do", "ve", "ga", "ba", "ñe", "lú", "tí", "ar",
+            "el", "in", "on", "es")
+_CATEGORIAS = ("Ficción", "Historia", "Ciencia", "Infantil", "Poesía", "Ensayo",
+               "Distopía", "Biografía", "Arte", "Viajes")
+
+
+def _vocabulario(n, rng):
+    palabras = set()
+    while len(palabras) < n:
+        palabras.add("".join(rng.choice(_SILABAS) for _ in range(rng.randint(2, 4))))
+    return sorted(palabras)
+
+
+def _libros(n, semilla=SEMILLA):
+    """Genera n libros con títulos de 2 a 5 palabras y unos 20 000 autores distintos."""
+    rng = random.Random(semilla)
+    vocabulario = _vocabulario(30_000, rng)
+    nombres = [p.capitalize() for p in _vocabulario(2_000, rng)]
+    autores = [f"{rng.choice(nombres)} {rng.choice(nombres)} {rng.choice(nombres)}"
+               for _ in range(20_000)]
+    for i in range(n):
+        titulo = " ".join(rng.choice(vocabulario) for _ in range(rng.randint(2, 5)))
+        yield Libro(titulo.capitalize(), rng.choice(autores), rng.choice(_CATEGORIAS),
+                    f"ISBN-{i:08d}")
+
+
+def _biblioteca(n):
+    bib = Biblioteca("Biblioteca de prueba")
+    with _silencio():
+        for libro in _libros(n):
+            bib.agregar_libro(libro)
+    return bib
+
+
+# ═══════════════════════════════════════════════
+# Búsqueda por título y autor
+# ═══════════════════════════════════════════════
+
+def bench_busqueda(args):
+    """Búsqueda por título/autor: recorrer el catálogo vs índices de indice_texto."""
+    bib = _biblioteca(args.libros)
+    rng = random.Random(SEMILLA + 1)
+    libros = rng.sample(list(bib.catalogo.values()), args.consultas)
+    # Una palabra del título, un prefijo de 3 letras y la palabra con un error
+    palabras = [rng.choice(l.titulo.lower().split()) for l in libros]
+    prefijos = [" ".join(l.titulo.split()[:1]) + " " + l.titulo.split()[1][:3] for l in libros]
+    con_error = [p[:2] + "x" + p[3:] if len(p) > 4 else p for p in palabras]
+    autores = [l.autor.split()[-1][1:-1] for l in libros]
+
+    def recorriendo(campo, texto):
+        # Lo que hacían buscar_por_titulo / buscar_por_autor antes de los índices
+        texto = texto.lower()
+        return [l for l in bib.catalogo.values() if texto in getattr(l, campo).lower()]
+
+    construir = _segundos(lambda: bib._indices("titulo"))
+    filas = [
+        ("título (subcadena)",
+         _medir(lambda i: recorriendo("titulo", palabras[i]), args.consultas, args.presupuesto),
+         _medir(lambda i: bib.buscar_por_titulo(palabras[i]), args.consultas, args.presupuesto)),
+        ("autor (subcadena)",
+         _medir(lambda i: recorriendo("autor", autores[i]), args.consultas, args.presupuesto),
+         _medir(lambda i: bib.buscar_por_autor(autores[i]), args.consultas, args.presupuesto)),
+        ("autocompletar", None,
+         _medir(lambda i: bib.autocompletar(prefijos[i]), args.consultas, args.presupuesto)),
+        ("aproximada (1 error)", None,
+         _medir(lambda i: bib.buscar_aproximado(con_error[i]), args.consultas,
+                args.presupuesto)),
+    ]
+    print(f"{args.libros} libros; índices creados en {construir:.1f} s")
+    _tabla(("consulta", "recorrer ms", "índice ms"),
+           [(nombre, "-" if antes is None else f"{antes / 1e3:.2f}", f"{despues / 1e3:.2f}")
+            for nombre, antes, despues in filas])
+
+
+# ═══════════════════════════════════════════════
+# Búsqueda general por relevancia
+# ═══════════════════════════════════════════════
+
+def _comprobar_casos_limite():
+    """
+    Un resultado de buscar() guardado en la caché no sobrevive a importar_csv,
+    y un índice sin ninguna palabra responde con una lista vacía.
+    """
+    carpeta = tempfile.mkdtemp(prefix="bench_relevancia_")
+    try:
+        ruta_csv = os.path.join(carpeta, "libros.csv")
+        with open(ruta_csv, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows((("isbn", "titulo", "autor", "categoria"),
+                                     ("X-1", "Dragones del mar", "Ana Pérez", "Ficción")))
+        bib = Biblioteca("Biblioteca de prueba")
+        assert bib.buscar("dragones") == []
+        with _silencio():
+            bib.importar_csv(ruta_csv)
+        assert [l.isbn for l in bib.buscar("dragones")] == ["X-1"]
+        # Un catálogo cuyos textos no tienen ninguna palabra no encuentra nada
+        otra = Biblioteca("Biblioteca de prueba")
+        with _silencio():
+            otra.agregar_libro(Libro("!!!", "???", "...", "Z-1"))
+        assert otra.buscar("hola") == []
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def bench_relevancia(args):
+    """buscar(): creación del índice BM25 y latencia de consultas, en frío y desde la caché."""
+    _comprobar_casos_limite()
+    bib = _biblioteca(args.libros)
+    rng = random.Random(SEMILLA + 3)
+    libros = rng.sample(list(bib.catalogo.values()), args.consultas)
+    titulos = [l.titulo.split() for l in libros]
+    consultas = {
+        "una palabra": [rng.choice(t) for t in titulos],
+        "dos palabras": [f"{rng.choice(t)} {rng.choice(titulos[i - 1])}"
+                         for i, t in enumerate(titulos)],
+        "frase": [f'"{" ".join(t[:2])}"' for t in titulos],
+        "apellido (con tildes)": [l.autor.split()[-1].upper() for l in libros],
+        "palabra y categoría": [f"{rng.choice(t)} {l.categoria}" for t, l in zip(titulos, libros)],
+    }
+    inicio = time.perf_counter()
+    indice = bib._indice_relevancia()
+    construir = time.perf_counter() - inicio
+    print(f"{args.libros:,} libros; índice BM25 creado en {construir:.1f} s "
+          f"({args.libros / construir:,.0f} libros/s, {len(indice.listas):,} palabras)")
+
+    nuevos = list(_libros(args.altas, semilla=SEMILLA + 4))
+    for i, libro in enumerate(nuevos):
+        object.__setattr__(libro, "isbn", f"NUEVO-{i:06d}")
+    with _silencio():
+        alta = _medir(lambda i: bib.agregar_libro(nuevos[i]), len(nuevos), args.presupuesto)
+    print(f"agregar_libro con el índice al día: {alta:.1f} µs")
+
+    # La poda de buscar() no cambia los resultados: se comparan con puntuar todos los candidatos
+    for textos in consultas.values():
+        for texto in textos[:5]:
+            todos = indice.buscar(texto, limite=len(indice))[:20]
+            assert [l.isbn for l in bib.buscar(texto)] == [isbn for isbn, _ in todos], texto
+
+    filas = []
+    for nombre, textos in consultas.items():
+        frio = _medir(lambda i: bib.buscar(textos[i]), len(textos), args.presupuesto)
+        cache = _medir(lambda i: bib.buscar(textos[i % 10]), len(textos), args.presupuesto)
+        encontrados = sum(len(bib.buscar(t)) for t in textos[:10]) / 10
+        filas.append((nombre, f"{frio / 1e3:.2f}", f"{cache:.1f}", f"{encontrados:.1f}"))
+    _tabla(("consulta", "en frío ms", "desde la caché µs", "resultados (límite 20)"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Memoria de Libro
+# ═══════════════════════════════════════════════
+
+class _LibroConDiccionario:
+    """Libro como antes de __slots__: diccionario por instancia, tupla y propiedades."""
+
+    def __init__(self, titulo, autor, categoria, isbn):
+        self._info_inmutable = (titulo, autor)
+        self.categoria = categoria
+        self.isbn = isbn
+        self.disponible = True
+
+    @property
+    def titulo(self):
+        return self._info_inmutable[0]
+
+    @property
+    def autor(self):
+        return self._info_inmutable[1]
+
+
+def _filas(n):
+    """
+    (titulo, autor, categoria, isbn) de n libros, cada fila con sus propias
+    cadenas, como llegan de un CSV o de la base.
+    """
+    for libro in _libros(n):
+        yield (libro.titulo, libro.autor.encode().decode(), libro.categoria.encode().decode(),
+               libro.isbn)
+
+
+def _memoria(construir):
+    """Bytes que siguen reservados después de construir() (lo que devuelve queda vivo)."""
+    tracemalloc.start()
+    try:
+        resultado = construir()
+        return tracemalloc.get_traced_memory()[0], resultado
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memoria(args):
+    """Memoria por libro y búsquedas: Libro con diccionario y propiedades vs __slots__."""
+    n = args.libros
+    rng = random.Random(SEMILLA + 2)
+    muestra = rng.sample(list(_libros(n)), args.consultas)
+    palabras = [rng.choice(l.titulo.lower().split()) for l in muestra]
+    autores = [l.autor.split()[-1][1:-1] for l in muestra]
+    prefijos = [" ".join(l.titulo.split()[:2])[:-1] for l in muestra]
+    categorias = [l.categoria for l in muestra]
+
+    def construir_biblioteca(clase):
+        bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(capacidad=1))
+        with _silencio():
+            for fila in _filas(n):
+                bib.agregar_libro(clase(*fila))
+        return bib
+
+    memoria, busquedas = [], []
+    for nombre, clase in (("diccionario", _LibroConDiccionario), ("__slots__", Libro)):
+        solos, libros = _memoria(lambda: [clase(*fila) for fila in _filas(n)])
+        del libros
+        en_biblioteca, bib = _memoria(lambda: construir_biblioteca(clase))
+        leer = _segundos(lambda: sum(len(l.titulo) + len(l.autor) for l in bib.catalogo.values()))
+        indices = _segundos(lambda: bib._indices("titulo"))
+        with _silencio():
+            catalogo = _segundos(bib.mostrar_catalogo)
+        memoria.append((nombre, f"{solos / n:.0f}", f"{en_biblioteca / n:.0f}",
+                        f"{leer * 1e9 / n:.0f}", f"{indices:.1f}"))
+        consultas = (lambda i: bib.buscar_por_titulo(palabras[i]),
+                     lambda i: bib.buscar_por_autor(autores[i]),
+                     lambda i: bib.autocompletar(prefijos[i]),
+                     lambda i: bib.buscar_disponibles(categorias[i]))
+        busquedas.append([nombre] + [f"{_medir(c, args.consultas, args.presupuesto):.1f}"
+                                     for c in consultas] + [f"{catalogo:.2f}"])
+        del bib
+    print(f"{n:,} libros (autor y categoría leídos fila a fila, sin compartir cadenas)")
+    _tabla(("Libro", "solo libros B/libro", "biblioteca B/libro", "leer título+autor ns",
+            "índices de búsqueda s"), memoria)
+    print()
+    _tabla(("Libro", "por título µs", "por autor µs", "autocompletar µs",
+            "disponibles de categoría µs", "mostrar_catalogo s"), busquedas)
+
+
+# ═══════════════════════════════════════════════
+# Índices de categoría y disponibilidad
+# ═══════════════════════════════════════════════
+
+def _mezclar_operaciones(bib, n, rng):
+    """Préstamos, devoluciones, bajas y altas al azar sobre el catálogo."""
+    with _silencio():
+        for i in range(20):
+            bib.registrar_usuario(Usuario(f"Usuario {i}", f"U{i:03d}"))
+        isbns = list(bib.catalogo)
+        prestados = []
+        for isbn in rng.sample(isbns, n // 3):
+            id_usuario = f"U{rng.randrange(20):03d}"
+            if bib.prestar_libro(isbn, id_usuario):
+                prestados.append((isbn, id_usuario))
+        for isbn, id_usuario in rng.sample(prestados, len(prestados) // 2):
+            bib.devolver_libro(isbn, id_usuario)
+        for isbn in rng.sample(isbns, n // 20):
+            bib.quitar_libro(isbn)
+        for libro in _libros(n // 20, semilla=SEMILLA + 2):
+            libro.isbn = "N" + libro.isbn
+            bib.agregar_libro(libro)
+
+
+def _comprobar_indices(bib, rng, consultas):
+    """Compara cada consulta con índices con el mismo filtro recorriendo el catálogo."""
+    libros = list(bib.catalogo.values())
+    categorias = ["ficcion", "CIÓN", "ia", "", "no existe"] + [l.categoria for l in libros[:5]]
+    for categoria in categorias:
+        c = normalizar(categoria)
+        esperado = sorted(l.isbn for l in libros if c in normalizar(l.categoria))
+        assert [l.isbn for l in bib.buscar_por_categoria(categoria)] == esperado, categoria
+        esperado = sorted(l.isbn for l in libros
+                          if c in normalizar(l.categoria) and l.disponible)
+        assert [l.isbn for l in bib.buscar_disponibles(categoria)] == esperado, categoria
+    assert ([l.isbn for l in bib.buscar_disponibles()]
+            == sorted(l.isbn for l in libros if l.disponible))
+    for libro in rng.sample(libros, consultas):
+        autor, categoria = libro.autor.upper(), rng.choice(categorias)
+        a, c = normalizar(autor), normalizar(categoria)
+        for solo_disponibles in (False, True):
+            esperado = sorted(l.isbn for l in libros if normalizar(l.autor) == a
+                              and c in normalizar(l.categoria)
+                              and (l.disponible or not solo_disponibles))
+            obtenido = bib.buscar_por_autor_y_categoria(autor, categoria, solo_disponibles)
+            assert [l.isbn for l in obtenido] == esperado, (autor, categoria)
+
+
+def bench_categorias(args):
+    """Disponibles por categoría y autor ∩ categoría: recorrer el catálogo vs índices."""
+    filas = []
+    for n in args.tamanos:
+        rng = random.Random(SEMILLA + n)
+        bib = _biblioteca(n)
+        _mezclar_operaciones(bib, n, rng)
+        _comprobar_indices(bib, rng, args.comprobaciones)
+        libros = list(bib.catalogo.values())
+        categorias = [rng.choice(_CATEGORIAS) for _ in range(args.consultas)]
+        autores = [rng.choice(libros).autor for _ in range(args.consultas)]
+
+        def disponibles_recorriendo(i):
+            c = categorias[i].lower()
+            return [l for l in bib.catalogo.values() if c in l.categoria.lower() and l.disponible]
+
+        def autor_categoria_recorriendo(i):
+            a, c = autores[i].lower(), categorias[i].lower()
+            return [l for l in bib.catalogo.values()
+                    if l.autor.lower() == a and c in l.categoria.lower()]
+
+        medir = (lambda operacion: _medir(operacion, args.consultas, args.presupuesto) / 1e3)
+        filas.append((
+            n,
+            f"{medir(disponibles_recorriendo):.2f}",
+            f"{medir(lambda i: bib.buscar_disponibles(categorias[i])):.2f}",
+            f"{medir(autor_categoria_recorriendo):.2f}",
+            f"{medir(lambda i: bib.buscar_por_autor_y_categoria(autores[i], categorias[i])):.3f}",
+        ))
+    print("Índices comprobados contra un recorrido completo tras préstamos, "
+          "devoluciones, altas y bajas.")
+    _tabla(("libros", "disponibles recorrer ms", "disponibles índice ms",
+            "autor∩categoría recorrer ms", "autor∩categoría índice ms"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Registro de préstamos
+# ═══════════════════════════════════════════════
+
+class _PrestamosConListas:
+    """Préstamos como antes del registro: una lista de libros por usuario."""
+
+    def __init__(self, ids_usuario):
+        self.listas = {id_usuario: [] for id_usuario in ids_usuario}
+
+    def prestar(self, libro, id_usuario):
+        self.listas[id_usuario].append(libro)
+
+    def devolver(self, libro, id_usuario):
+        lista = self.listas[id_usuario]
+        if libro not in lista:
+            return False
+        lista.remove(libro)
+        return True
+
+    def quien_tiene(self, libro):
+        for id_usuario, lista in self.listas.items():
+            if libro in lista:
+                return id_usuario
+        return None
+
+
+def bench_prestamos(args):
+    """devolver_libro y quien_tiene con miles de préstamos por usuario: listas vs registro."""
+    filas = []
+    for k in args.por_usuario:
+        rng = random.Random(SEMILLA + k)
+        n = k * args.usuarios
+        bib = _biblioteca(n)
+        ids = [f"U{i:03d}" for i in range(args.usuarios)]
+        listas = _PrestamosConListas(ids)
+        libros = list(bib.catalogo.values())
+        with _silencio():
+            for id_usuario in ids:
+                bib.registrar_usuario(Usuario(f"Usuario {id_usuario}", id_usuario))
+            prestamos = []
+            for i, libro in enumerate(libros):
+                id_usuario = ids[i % args.usuarios]
+                bib.prestar_libro(libro.isbn, id_usuario)
+                listas.prestar(libro, id_usuario)
+                prestamos.append((libro, id_usuario))
+        rng.shuffle(prestamos)
+        consultas = [rng.choice(libros) for _ in range(args.operaciones)]
+
+        # Devoluciones en orden aleatorio, primero con listas y después con el registro
+        antes_devolver = _medir(lambda i: listas.devolver(*prestamos[i]),
+                                args.operaciones, args.presupuesto)
+        antes_quien = _medir(lambda i: listas.quien_tiene(consultas[i]),
+                             args.operaciones, args.presupuesto)
+        despues_quien = _medir(lambda i: bib.quien_tiene(consultas[i].isbn),
+                               args.operaciones, args.presupuesto)
+        with _silencio():
+            despues_devolver = _medir(lambda i: bib.devolver_libro(prestamos[i][0].isbn,
+                                                                   prestamos[i][1]),
+                                      args.operaciones, args.presupuesto)
+        filas.append((k, f"{antes_devolver:.1f}", f"{despues_devolver:.1f}",
+                      f"{antes_quien:.1f}", f"{despues_quien:.2f}"))
+    print(f"{args.usuarios} usuarios; devolver_libro con registro incluye su mensaje "
+          "(redirigido a /dev/null)")
+    _tabla(("préstamos por usuario", "devolver listas µs", "devolver registro µs",
+            "quién tiene listas µs", "quién tiene registro µs"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Historial de operaciones
+# ═══════════════════════════════════════════════
+
+def _prestar_y_devolver(bib, isbns, ids, operaciones):
+    """operaciones/2 préstamos y sus devoluciones, rotando libros y usuarios."""
+    for i in range(operaciones // 2):
+        isbn, id_usuario = isbns[i % len(isbns)], ids[i % len(ids)]
+        bib.prestar_libro(isbn, id_usuario)
+        bib.devolver_libro(isbn, id_usuario)
+
+
+def bench_historial(args):
+    """Operaciones por segundo con y sin eco por consola y archivo de eventos."""
+    carpeta = tempfile.mkdtemp(prefix="bench_historial_")
+    ids = [f"U{i:04d}" for i in range(args.usuarios)]
+    filas = []
+    try:
+        for eco, con_archivo in ((True, False), (False, False), (True, True), (False, True)):
+            archivo = os.path.join(carpeta, f"eco{eco:d}.jsonl") if con_archivo else None
+            # Sin límite práctico de copias rotadas, para comprobar que no se pierde ningún evento
+            historial = HistorialBiblioteca(args.capacidad, archivo, eco=eco, copias=1_000)
+            bib = Biblioteca("Biblioteca de prueba", historial)
+            with _silencio():
+                for libro in _libros(args.libros):
+                    bib.agregar_libro(libro)
+                for id_usuario in ids:
+                    bib.registrar_usuario(Usuario(f"Usuario {id_usuario}", id_usuario))
+                isbns = list(bib.catalogo)
+                # La mejor de 3 rondas (cada ronda deja los libros como estaban)
+                segundos = min(_segundos(lambda: _prestar_y_devolver(bib, isbns, ids,
+                                                                     args.operaciones))
+                               for _ in range(3))
+                historial.cerrar()
+            guardados = "-"
+            if con_archivo:
+                guardados = sum(1 for _ in historial.guardados())
+                assert guardados == historial.seq, (guardados, historial.seq)
+            filas.append(("sí (a /dev/null)" if eco else "no", "sí" if con_archivo else "no",
+                          f"{args.operaciones / segundos:,.0f}", len(historial), guardados))
+        print(f"{args.operaciones:,} operaciones (préstamo o devolución), capacidad "
+              f"{args.capacidad:,}; con una terminal real el eco cuesta bastante más")
+        _tabla(("eco", "archivo", "operaciones/s", "eventos en memoria", "eventos en archivo"),
+               filas)
+
+        # Consultas sobre el búfer lleno del último historial
+        rng = random.Random(SEMILLA)
+        ahora = historial.consultar()[-1].marca_tiempo
+        consultas = (
+            ("por usuario", lambda i: historial.consultar(id_usuario=rng.choice(ids))),
+            ("por ISBN", lambda i: historial.consultar(isbn=rng.choice(isbns))),
+            ("últimos 10 ms", lambda i: historial.consultar(desde=ahora - 0.01)),
+        )
+        filas = []
+        for nombre, consulta in consultas:
+            filas.append((nombre, len(consulta(0)),
+                          f"{_medir(consulta, args.consultas, args.presupuesto):.1f}"))
+        print()
+        _tabla(("consulta", "eventos", "µs"), filas)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+# ═══════════════════════════════════════════════
+# Persistencia en SQLite
+# ═══════════════════════════════════════════════
+
+def _escribir_csv(ruta, n):
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(("isbn", "titulo", "autor", "categoria"))
+        escritor.writerows((l.isbn, l.titulo, l.autor, l.categoria) for l in _libros(n))
+
+
+def _comprobar_base_bloqueada(ruta_db):
+    """Si la base está bloqueada, la operación falla sin cambiar la memoria ni el historial."""
+    bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(),
+                     AlmacenBiblioteca(ruta_db, espera=0.1))
+    with _silencio():
+        bib.registrar_usuario(Usuario("Ana", "U1"))
+        bib.agregar_libro(Libro("Libro", "Autor", "Ficción", "B-1"))
+    eventos = len(bib.historial)
+    otra = sqlite3.connect(ruta_db, isolation_level=None)
+    otra.execute("BEGIN IMMEDIATE")
+    try:
+        bib.prestar_libro("B-1", "U1")
+        raise AssertionError("prestar_libro no falló con la base bloqueada")
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        otra.execute("ROLLBACK")
+        otra.close()
+    assert bib.obtener_libro("B-1").disponible and "B-1" not in bib.prestamos
+    assert len(bib.historial) == eventos
+    bib.cerrar()
+
+
+def bench_persistencia(args):
+    """Carga masiva desde CSV, arranque perezoso y latencia por operación con SQLite."""
+    carpeta = tempfile.mkdtemp(prefix="bench_persistencia_")
+    try:
+        _comprobar_base_bloqueada(os.path.join(carpeta, "bloqueada.db"))
+        ruta_csv = os.path.join(carpeta, "libros.csv")
+        ruta_db = os.path.join(carpeta, "biblioteca.db")
+        _escribir_csv(ruta_csv, args.libros)
+
+        bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(), AlmacenBiblioteca(ruta_db))
+        with _silencio():
+            for i in range(args.usuarios):
+                bib.registrar_usuario(Usuario(f"Usuario {i}", f"U{i:05d}"))
+        inicio = time.perf_counter()
+        agregados, _ = bib.importar_csv(ruta_csv)
+        carga = time.perf_counter() - inicio
+        # Préstamos activos que el arranque tendrá que leer
+        rng = random.Random(SEMILLA)
+        ids = list(bib.usuarios)
+        isbns = [f"ISBN-{i:08d}" for i in rng.sample(range(args.libros), 2 * args.prestamos)]
+        with _silencio():
+            for i, isbn in enumerate(isbns[:args.prestamos]):
+                bib.prestar_libro(isbn, ids[i % len(ids)])
+        bib.cerrar()
+        print(f"Carga masiva: {agregados:,} libros en {carga:.2f} s "
+              f"({agregados / carga:,.0f} libros/s), una transacción")
+
+        inicio = time.perf_counter()
+        bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(), AlmacenBiblioteca(ruta_db))
+        apertura = time.perf_counter() - inicio
+        consulta = _medir(lambda i: bib.obtener_libro(isbns[args.prestamos + i]),
+                          args.prestamos, args.presupuesto)
+        inicio = time.perf_counter()
+        total = len(bib.catalogo)
+        catalogo = time.perf_counter() - inicio
+        print(f"Arranque perezoso ({len(bib.usuarios):,} usuarios, {len(bib.prestamos):,} "
+              f"préstamos, {len(bib.historial):,} eventos): {apertura * 1e3:.1f} ms")
+        print(f"  libro por ISBN antes de leer el catálogo: {consulta:.1f} µs")
+        print(f"  primera lectura del catálogo completo ({total:,} libros): {catalogo:.2f} s")
+        bib.cerrar()
+
+        # Latencia por operación: en memoria frente a una transacción SQLite por operación
+        filas = []
+        for nombre, almacen in (("memoria", None),
+                                ("SQLite", AlmacenBiblioteca(os.path.join(carpeta, "ops.db")))):
+            bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(), almacen)
+            n = args.operaciones
+            with _silencio():
+                usuarios = _medir(lambda i: bib.registrar_usuario(Usuario("Usuario", f"U{i:06d}")),
+                                  n, args.presupuesto)
+                libros = list(_libros(n))
+                altas = _medir(lambda i: bib.agregar_libro(libros[i]), n, args.presupuesto)
+                prestar = _medir(lambda i: bib.prestar_libro(libros[i].isbn, f"U{i:06d}"),
+                                 n, args.presupuesto)
+                devolver = _medir(lambda i: bib.devolver_libro(libros[i].isbn, f"U{i:06d}"),
+                                  n, args.presupuesto)
+            bib.cerrar()
+            filas.append((nombre, f"{usuarios:.1f}", f"{altas:.1f}", f"{prestar:.1f}",
+                          f"{devolver:.1f}"))
+        print()
+        _tabla(("almacén", "registrar_usuario µs", "agregar_libro µs", "prestar_libro µs",
+                "devolver_libro µs"), filas)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+# ═══════════════════════════════════════════════
+# Operaciones en lote
+# ═══════════════════════════════════════════════
+
+def _biblioteca_para_lotes(ruta_db, ruta_csv, ids):
+    """Biblioteca con el catálogo del CSV y los usuarios `ids`; con ruta_db, en SQLite."""
+    almacen = None if ruta_db is None else AlmacenBiblioteca(ruta_db)
+    bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(), almacen)
+    with _silencio():
+        with contextlib.nullcontext() if almacen is None else almacen.transaccion():
+            for id_usuario in ids:
+                bib.registrar_usuario(Usuario(f"Usuario {id_usuario}", id_usuario))
+        bib.importar_csv(ruta_csv)
+    len(bib.catalogo)           # se lee ya de la base, fuera de la medición
+    return bib
+
+
+def bench_lotes(args):
+    """prestar_muchos / devolver_muchos frente a prestar_libro / devolver_libro uno a uno."""
+    carpeta = tempfile.mkdtemp(prefix="bench_lotes_")
+    try:
+        ruta_csv = os.path.join(carpeta, "libros.csv")
+        _escribir_csv(ruta_csv, args.operaciones)
+        ids = [f"U{i:05d}" for i in range(args.usuarios)]
+        # Cada 100 pares, uno repite el ISBN del anterior con otro usuario: se rechaza
+        pares = [(f"ISBN-{i:08d}", ids[i % len(ids)]) for i in range(args.operaciones)]
+        for i in range(100, len(pares), 100):
+            pares[i] = (pares[i - 1][0], pares[i][1])
+
+        filas = []
+        estados = []
+        for nombre in ("memoria", "SQLite"):
+            for modo in ("uno a uno", "en lote"):
+                ruta_db = None
+                if nombre == "SQLite":
+                    ruta_db = os.path.join(carpeta, f"lote-{len(filas)}.db")
+                bib = _biblioteca_para_lotes(ruta_db, ruta_csv, ids)
+                eventos = bib.historial.seq
+                with _silencio():
+                    inicio = time.perf_counter()
+                    if modo == "en lote":
+                        prestados = len(bib.prestar_muchos(pares).aplicadas)
+                    else:
+                        prestados = sum(bib.prestar_libro(*par) for par in pares)
+                    prestar = time.perf_counter() - inicio
+                    estados.append({isbn: p.id_usuario for isbn, p in bib.prestamos.items()})
+                    eventos = bib.historial.seq - eventos
+
+                    inicio = time.perf_counter()
+                    if modo == "en lote":
+                        devueltos = len(bib.devolver_muchos(pares).aplicadas)
+                    else:
+                        devueltos = sum(bib.devolver_libro(*par) for par in pares)
+                    devolver = time.perf_counter() - inicio
+
+                    assert prestados == devueltos == len(estados[-1]), (prestados, devueltos)
+                    assert not bib.prestamos and len(bib._disponibles) == len(bib.catalogo)
+                    if modo == "en lote":
+                        # Con un par no válido, todo_o_nada no presta ninguno
+                        informe = bib.prestar_muchos(pares, todo_o_nada=True)
+                        assert not informe.aplicadas and not bib.prestamos
+                bib.cerrar()
+                filas.append((nombre, modo, f"{prestar:.2f}", f"{devolver:.2f}",
+                              f"{prestados / prestar:,.0f}", eventos))
+        assert all(estado == estados[0] for estado in estados)
+        print(f"{len(pares):,} pares (isbn, usuario), {len(pares) - prestados:,} rechazados "
+              f"(ISBN repetido), {args.usuarios:,} usuarios; mismos préstamos en los cuatro casos")
+        _tabla(("almacén", "modo", "prestar s", "devolver s", "préstamos/s", "eventos"), filas)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+# ═══════════════════════════════════════════════
+# Vencimientos y multas
+# ═══════════════════════════════════════════════
+
+def _biblioteca_con_prestamos(n, usuarios, plazo_maximo):
+    """
+    Biblioteca con n libros (uno de cada 10, revistas) prestados a
+    `usuarios` usuarios, con plazos de 1 a plazo_maximo días repartidos por
+    igual. Los títulos son cortos para que 5 millones quepan en memoria.
+    """
+    bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca())
+    ids = [f"U{i:06d}" for i in range(usuarios)]
+    autores = [f"Autor {i}" for i in range(1000)]
+    with _silencio():
+        for i in range(n):
+            categoria = "Revista" if i % 10 == 0 else _CATEGORIAS[i % len(_CATEGORIAS)]
+            bib.agregar_libro(Libro(f"Libro {i}", autores[i % 1000], categoria,
+                                    f"ISBN-{i:08d}"))
+        for id_usuario in ids:
+            bib.registrar_usuario(Usuario(f"Usuario {id_usuario}", id_usuario))
+        for dias in range(1, plazo_maximo + 1):
+            bib.prestar_muchos(((f"ISBN-{i:08d}", ids[i % usuarios])
+                                for i in range(dias - 1, n, plazo_maximo)), dias=dias)
+    return bib
+
+
+def _vencidos_recorriendo_usuarios(bib, ahora):
+    """Lo que haría falta sin el montículo: revisar los préstamos de cada usuario."""
+    prestamos = bib.prestamos
+    vencidos = [prestamos[isbn] for libros in bib._prestamos_por_usuario.values()
+                for isbn in libros if prestamos[isbn].vence_en <= ahora]
+    vencidos.sort(key=lambda prestamo: prestamo.vence_en)
+    return vencidos
+
+
+def _multas_una_a_una(bib, ahora, vencidos):
+    """Una llamada a calcular_multa (con su material) por préstamo."""
+    multas = {}
+    for prestamo in vencidos:
+        libro = bib._prestamos_por_usuario[prestamo.id_usuario][prestamo.isbn]
+        multa = material_de(libro).calcular_multa(prestamo.dias_de_retraso(ahora))
+        multas[prestamo.id_usuario] = multas.get(prestamo.id_usuario, 0.0) + multa
+    return {id_usuario: round(total, 2) for id_usuario, total in multas.items()}
+
+
+def bench_vencimientos(args):
+    """Barrido nocturno de vencidos y multas con millones de préstamos activos."""
+    inicio = time.perf_counter()
+    bib = _biblioteca_con_prestamos(args.prestamos, args.usuarios, args.plazo)
+    print(f"{len(bib.prestamos):,} préstamos activos de {args.usuarios:,} usuarios, "
+          f"plazos de 1 a {args.plazo} días (preparación: {time.perf_counter() - inicio:.0f} s)")
+    filas = []
+    for dias in args.dias:
+        ahora = time.time() + dias * SEGUNDOS_POR_DIA
+        inicio = time.perf_counter()
+        vencidos = bib.vencidos(ahora)
+        t_monticulo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        multas = bib.calcular_multas(ahora, vencidos)
+        t_multas = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        recorridos = _vencidos_recorriendo_usuarios(bib, ahora)
+        t_recorrido = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        una_a_una = _multas_una_a_una(bib, ahora, vencidos)
+        t_una_a_una = time.perf_counter() - inicio
+
+        assert {id(p) for p in vencidos} == {id(p) for p in recorridos}
+        assert multas == una_a_una
+        filas.append((dias, f"{len(vencidos):,}", f"{t_recorrido:.2f}", f"{t_monticulo:.3f}",
+                      f"{t_una_a_una:.2f}", f"{t_multas:.2f}",
+                      f"{t_monticulo + t_multas:.2f}"))
+    _tabla(("días después", "vencidos", "recorrer usuarios s", "montículo s",
+            "multa por préstamo s", "multa agrupada s", "barrido s"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Concurrencia
+# ═══════════════════════════════════════════════
+
+def _estresar(bib, isbns, ids, hilos, operaciones):
+    """
+    `hilos` hilos prestan o devuelven libros al azar de `isbns` mientras
+    otro da de alta y de baja libros y otro busca. Devuelve (segundos,
+    préstamos dobles, errores): un préstamo doble es un préstamo aceptado de
+    más, según las altas y bajas aceptadas de cada ISBN.
+    """
+    barrera = threading.Barrier(hilos + 1)
+    terminado = threading.Event()
+    resultados = []
+    errores = []
+
+    def mostrador(k):
+        rng = random.Random(SEMILLA + k)
+        prestados, devueltos = Counter(), Counter()
+        barrera.wait()
+        for _ in range(operaciones):
+            isbn = rng.choice(isbns)
+            try:
+                usuario = bib.quien_tiene(isbn)
+                if usuario is None:
+                    if bib.prestar_libro(isbn, rng.choice(ids)):
+                        prestados[isbn] += 1
+                elif bib.devolver_libro(isbn, usuario.id_usuario):
+                    devueltos[isbn] += 1
+            except Exception as e:
+                errores.append(e)
+        resultados.append((prestados, devueltos))
+
+    def altas_y_bajas():
+        i = 0
+        while not terminado.is_set():
+            isbn = f"EXTRA-{i % 100:03d}"
+            try:
+                if not bib.quitar_libro(isbn):
+                    bib.agregar_libro(Libro(f"Libro extra {i}", "Autor extra", "Arte", isbn))
+            except Exception as e:
+                errores.append(e)
+            i += 1
+
+    def lector():
+        rng = random.Random(SEMILLA)
+        while not terminado.is_set():
+            try:
+                bib.buscar_por_titulo(rng.choice(("ma", "extra", "sori")))
+                bib.buscar(rng.choice(("extra arte", '"libro extra"', "ficción")))
+                bib.buscar_disponibles(rng.choice(_CATEGORIAS))
+                bib.mostrar_catalogo()
+            except Exception as e:
+                errores.append(e)
+
+    trabajadores = [threading.Thread(target=mostrador, args=(k,)) for k in range(hilos)]
+    auxiliares = [threading.Thread(target=altas_y_bajas), threading.Thread(target=lector)]
+    for hilo in trabajadores + auxiliares:
+        hilo.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    for hilo in trabajadores:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    terminado.set()
+    for hilo in auxiliares:
+        hilo.join()
+
+    prestados, devueltos = Counter(), Counter()
+    for p, d in resultados:
+        prestados.update(p)
+        devueltos.update(d)
+    dobles = sum(max(0, prestados[isbn] - devueltos[isbn] - (isbn in bib.prestamos))
+                 for isbn in isbns)
+    return segundos, dobles, errores
+
+
+def _comprobar_prestamos(bib, isbns):
+    """Cuántos libros tienen el registro de préstamos, su estado o los índices en desacuerdo."""
+    malos = 0
+    for isbn in isbns:
+        libro = bib.catalogo[isbn]
+        prestamo = bib.prestamos.get(isbn)
+        en_usuarios = [u for u, libros in bib._prestamos_por_usuario.items() if isbn in libros]
+        esperado = [] if prestamo is None else [prestamo.id_usuario]
+        if (en_usuarios != esperado or libro.disponible != (prestamo is None)
+                or (isbn in bib._disponibles) != libro.disponible):
+            malos += 1
+    return malos
+
+
+def bench_concurrencia(args):
+    """Préstamos desde varios hilos: rendimiento y préstamos dobles, con y sin cerrojos."""
+    filas = []
+    # Cambios de hilo muy frecuentes para que las carreras aparezcan en pocas operaciones
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(args.intervalo)
+    try:
+        for concurrente in (False, True):
+            for hilos in args.hilos:
+                bib = Biblioteca("Biblioteca de prueba", HistorialBiblioteca(),
+                                 concurrente=concurrente)
+                ids = [f"U{i:04d}" for i in range(args.usuarios)]
+                with _silencio():
+                    for libro in _libros(args.libros):
+                        bib.agregar_libro(libro)
+                    for id_usuario in ids:
+                        bib.registrar_usuario(Usuario(f"Usuario {id_usuario}", id_usuario))
+                    isbns = list(bib.catalogo)
+                    segundos, dobles, errores = _estresar(bib, isbns, ids, hilos,
+                                                          args.operaciones)
+                malos = _comprobar_prestamos(bib, isbns)
+                if concurrente:
+                    assert dobles == 0 and malos == 0 and not errores, (dobles, malos, errores[:3])
+                filas.append(("sí" if concurrente else "no", hilos,
+                              f"{hilos * args.operaciones / segundos:,.0f}",
+                              dobles, malos, len(errores)))
+    finally:
+        sys.setswitchinterval(intervalo)
+    print(f"{args.libros:,} libros, {args.usuarios} usuarios, {args.operaciones:,} operaciones "
+          f"por hilo; además un hilo da de alta/baja libros y otro busca")
+    _tabla(("cerrojos", "hilos", "operaciones/s", "préstamos dobles", "libros inconsistentes",
+            "excepciones"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Main
+# ═══════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="medicion", required=True)
+
+    p = sub.add_parser("busqueda", help=bench_busqueda.__doc__)
+    p.add_argument("--libros", type=int, default=1_000_000)
+    p.add_argument("--consultas", type=int, default=200)
+    p.add_argument("--presupuesto", type=float, default=10.0,
+                   help="segundos máximos por tipo de consulta")
+    p.set_defaults(funcion=bench_busqueda)
+
+    p = sub.add_parser("relevancia", help=bench_relevancia.__doc__)
+    p.add_argument("--libros", type=int, default=1_000_000)
+    p.add_argument("--consultas", type=int, default=200)
+    p.add_argument("--altas", type=int, default=2_000)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por tipo de consulta")
+    p.set_defaults(funcion=bench_relevancia)
+
+    p = sub.add_parser("memoria", help=bench_memoria.__doc__)
+    p.add_argument("--libros", type=int, default=1_000_000)
+    p.add_argument("--consultas", type=int, default=200)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por tipo de consulta")
+    p.set_defaults(funcion=bench_memoria)
+
+    p = sub.add_parser("categorias", help=bench_categorias.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--consultas", type=int, default=100)
+    p.add_argument("--comprobaciones", type=int, default=20,
+                   help="consultas autor ∩ categoría comparadas con un recorrido")
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por tipo de consulta y tamaño")
+    p.set_defaults(funcion=bench_categorias)
+
+    p = sub.add_parser("prestamos", help=bench_prestamos.__doc__)
+    p.add_argument("--por-usuario", type=int, nargs="+", default=[100, 1_000, 5_000])
+    p.add_argument("--usuarios", type=int, default=20)
+    p.add_argument("--operaciones", type=int, default=1_000)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por operación y tamaño")
+    p.set_defaults(funcion=bench_prestamos)
+
+    p = sub.add_parser("historial", help=bench_historial.__doc__)
+    p.add_argument("--operaciones", type=int, default=200_000)
+    p.add_argument("--libros", type=int, default=10_000)
+    p.add_argument("--usuarios", type=int, default=100)
+    p.add_argument("--capacidad", type=int, default=10_000)
+    p.add_argument("--consultas", type=int, default=1_000)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por consulta")
+    p.set_defaults(funcion=bench_historial)
+
+    p = sub.add_parser("persistencia", help=bench_persistencia.__doc__)
+    p.add_argument("--libros", type=int, default=1_000_000)
+    p.add_argument("--usuarios", type=int, default=1_000)
+    p.add_argument("--prestamos", type=int, default=10_000)
+    p.add_argument("--operaciones", type=int, default=5_000)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por operación")
+    p.set_defaults(funcion=bench_persistencia)
+
+    p = sub.add_parser("lotes", help=bench_lotes.__doc__)
+    p.add_argument("--operaciones", type=int, default=100_000)
+    p.add_argument("--usuarios", type=int, default=10_000)
+    p.set_defaults(funcion=bench_lotes)
+
+    p = sub.add_parser("vencimientos", help=bench_vencimientos.__doc__)
+    p.add_argument("--prestamos", type=int, default=5_000_000)
+    p.add_argument("--usuarios", type=int, default=100_000)
+    p.add_argument("--plazo", type=int, default=60, help="plazo máximo de préstamo en días")
+    p.add_argument("--dias", type=int, nargs="+", default=[1, 6, 30],
+                   help="días después de hoy en que se hace el barrido")
+    p.set_defaults(funcion=bench_vencimientos)
+
+    p = sub.add_parser("concurrencia", help=bench_concurrencia.__doc__)
+    p.add_argument("--hilos", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--libros", type=int, default=200)
+    p.add_argument("--usuarios", type=int, default=50)
+    p.add_argument("--operaciones", type=int, default=20_000)
+    p.add_argument("--intervalo", type=float, default=1e-5,
+                   help="segundos entre cambios de hilo (sys.setswitchinterval)")
+    p.set_defaults(funcion=bench_concurrencia)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,826 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Mediciones de rendimiento del inventario (Semana9.py e inventario_archivo.py).
+Cada medición es un subcomando, por ejemplo:
+
+    python bench_inventario.py diario --tamanos 1000 100000 1000000
+
+Los archivos de prueba se generan en un directorio temporal.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+import Semana9
+import analitica_inventario
+import inventario_archivo
+import servidor_inventario
+from almacen_columnar import AlmacenColumnar
+from analitica_inventario import AnaliticaInventario
+from eventos_inventario import ConsumidorEventos, EventoCambio, PublicadorEventos
+from indice_texto import IndiceTrigramas
+from servicio_inventario import ServicioInventario
+from snapshot_binario import escribir_instantanea
+
+
+# ═══════════════════════════════════════════════
+# Utilidades
+# ═══════════════════════════════════════════════
+
+def _crear_txt(ruta, n):
+    """Genera un inventario.txt con n productos."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.writelines(f"{i},Producto {i},{i % 500},{i % 1000 + 0.99}\n"
+                     for i in range(1, n + 1))
+
+
+def _filas_ejemplo(n):
+    return ((i, f"Producto {i}", i % 500, i % 1000 + 0.99) for i in range(1, n + 1))
+
+
+def _crear_json(ruta, n):
+    """Genera un inventario.json con n productos (formato de AlmacenJSON)."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump([{"id": i, "nombre": nombre, "cantidad": c, "precio": p}
+                   for i, nombre, c, p in _filas_ejemplo(n)], f)
+
+
+def _crear_db(ruta, n):
+    """Genera un inventario.db con n productos (esquema de AlmacenSQLite)."""
+    inventario_archivo.AlmacenSQLite(ruta).cerrar()
+    with sqlite3.connect(ruta) as conexion:
+        conexion.executemany("INSERT INTO productos VALUES (?, ?, ?, ?)", _filas_ejemplo(n))
+    conexion.close()
+
+
+@contextlib.contextmanager
+def _silencio():
+    """Oculta los mensajes [INFO] que imprime el inventario al cargar."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _medir(operacion, repeticiones, presupuesto):
+    """
+    Ejecuta operacion(i) hasta completar las repeticiones o agotar el
+    presupuesto en segundos (con un mínimo de 3) y devuelve µs por operación.
+    """
+    hechas = 0
+    inicio = time.perf_counter()
+    while hechas < repeticiones:
+        operacion(hechas)
+        hechas += 1
+        if hechas >= 3 and time.perf_counter() - inicio > presupuesto:
+            break
+    return (time.perf_counter() - inicio) / hechas * 1e6
+
+
+def _tabla(encabezados, filas):
+    anchos = [max(len(str(x)) for x in columna) for columna in zip(encabezados, *filas)]
+    print("  ".join(str(h).rjust(a) for h, a in zip(encabezados, anchos)))
+    for fila in filas:
+        print("  ".join(str(x).rjust(a) for x, a in zip(fila, anchos)))
+
+
+# ═══════════════════════════════════════════════
+# Diario de operaciones (Semana9)
+# ═══════════════════════════════════════════════
+
+def bench_diario(args):
+    """Latencia de actualizar_producto: reescritura completa vs diario."""
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.txt")
+        for n in args.tamanos:
+            resultados = []
+            for diario in (False, True):
+                _crear_txt(ruta, n)
+                with _silencio():
+                    inv = Semana9.Inventario(ruta, diario=diario)
+                ids = [random.randint(1, n) for _ in range(args.operaciones)]
+                with _silencio():
+                    us = _medir(lambda i: inv.actualizar_producto(ids[i], i % 100, 1.5),
+                                args.operaciones, args.presupuesto)
+                resultados.append(us)
+                if os.path.exists(inv.archivo_diario):
+                    os.remove(inv.archivo_diario)
+            filas.append((n, f"{resultados[0]:.1f}", f"{resultados[1]:.1f}",
+                          f"x{resultados[0] / resultados[1]:.1f}"))
+    _tabla(("productos", "reescritura µs/op", "diario µs/op", "aceleración"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Índice por ID (Semana9)
+# ═══════════════════════════════════════════════
+
+class _InventarioLineal(Semana9.Inventario):
+    """Reproduce la comprobación de duplicados anterior al índice por ID."""
+
+    def agregar_producto(self, producto):
+        for p in self.productos:
+            if p.id == producto.id:
+                return False, "ID duplicado."
+        return super().agregar_producto(producto)
+
+
+def bench_carga_masiva(args):
+    """Alta de n productos uno a uno (modo diario): recorrido lineal vs índice."""
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.tamanos:
+            resultados = []
+            for clase in (_InventarioLineal, Semana9.Inventario):
+                if clase is _InventarioLineal and n > args.max_lineal:
+                    resultados.append(None)
+                    continue
+                ruta = os.path.join(tmp, f"{clase.__name__}_{n}.txt")
+                with _silencio():
+                    inv = clase(ruta, diario=True)
+                    inicio = time.perf_counter()
+                    for i in range(1, n + 1):
+                        inv.agregar_producto(Semana9.Producto(i, f"Producto {i}", i % 500, 9.99))
+                    resultados.append((time.perf_counter() - inicio) / n * 1e6)
+            filas.append((n, "—" if resultados[0] is None else f"{resultados[0]:.1f}",
+                          f"{resultados[1]:.1f}"))
+    _tabla(("productos", "lineal µs/alta", "índice µs/alta"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Carga por bloques (Semana9)
+# ═══════════════════════════════════════════════
+
+def _pico_memoria(funcion):
+    """Pico de memoria (MB) reservada por Python al ejecutar funcion()."""
+    tracemalloc.start()
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pico / 2**20
+
+
+def _segundos(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def _leer_completo(ruta):
+    """Lectura anterior: todo el archivo en memoria con readlines()."""
+    with open(ruta, "r", encoding="utf-8") as f:
+        return [Semana9.Producto.desde_linea(linea) for linea in f.readlines()]
+
+
+def bench_carga(args):
+    """
+    Arranque desde inventario.txt: readlines() vs bloques en un proceso vs
+    bloques en paralelo. El pico de memoria compara solo la lectura del
+    archivo; los productos construidos ocupan lo mismo en todos los casos.
+    """
+    filas = []
+    procesos = args.procesos or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.txt")
+        for n in args.tamanos:
+            _crear_txt(ruta, n)
+            fila = [n, f"{os.path.getsize(ruta) / 2**20:.0f}"]
+
+            def leer_bloques():
+                with open(ruta, "rb") as f:
+                    for _ in Semana9._leer_bloques(f, Semana9.TAMANO_BLOQUE):
+                        pass
+
+            def leer_lineas():
+                with open(ruta, "r", encoding="utf-8") as f:
+                    f.readlines()
+
+            fila.append(f"{_pico_memoria(leer_bloques):.1f}")
+            fila.append(f"{_pico_memoria(leer_lineas):.1f}")
+            fila.append(f"{_segundos(lambda: _leer_completo(ruta)):.2f}")
+            for p in (1, procesos):
+                with _silencio():
+                    fila.append(f"{_segundos(lambda: Semana9.Inventario(ruta, procesos=p)):.2f}")
+            filas.append(fila)
+    _tabla(("productos", "MB", "pico bloques MB", "pico readlines MB",
+            "readlines s", "bloques 1 proc s", f"bloques {procesos} proc s"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Almacén columnar (Semana9)
+# ═══════════════════════════════════════════════
+
+class _ProductoConDict:
+    """Producto como era antes: un objeto con __dict__ por producto."""
+
+    def __init__(self, id, nombre, cantidad, precio):
+        self.id = id
+        self.nombre = nombre
+        self.cantidad = cantidad
+        self.precio = precio
+
+
+def _memoria_actual(construir):
+    """MB que siguen reservados después de construir() (el resultado vive)."""
+    tracemalloc.start()
+    resultado = construir()
+    actual = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del resultado
+    return actual / 2**20
+
+
+def bench_memoria(args):
+    """Memoria de n productos: lista de objetos con __dict__, con __slots__ y columnar."""
+    def filas(n):
+        return ((i, f"Producto {i}", i % 500, i % 1000 + 0.99) for i in range(1, n + 1))
+
+    def lista(clase, n):
+        return [clase(*f) for f in filas(n)]
+
+    def columnar(n):
+        almacen = AlmacenColumnar()
+        for f in filas(n):
+            almacen.agregar(*f)
+        return almacen
+
+    resultados = []
+    for n in args.tamanos:
+        dicts = _memoria_actual(lambda: lista(_ProductoConDict, n))
+        slots = _memoria_actual(lambda: lista(Semana9.Producto, n))
+        col = _memoria_actual(lambda: columnar(n))
+        resultados.append((n, f"{dicts:.1f}", f"{slots:.1f}", f"{col:.1f}",
+                           f"{dicts * 2**20 / n:.0f}", f"{col * 2**20 / n:.0f}"))
+    _tabla(("productos", "__dict__ MB", "__slots__ MB", "columnar MB",
+            "B/prod antes", "B/prod columnar"), resultados)
+
+
+# ═══════════════════════════════════════════════
+# Almacenes JSON y SQLite (inventario_archivo)
+# ═══════════════════════════════════════════════
+
+def bench_almacenes(args):
+    """Coste por operación de inventario_archivo.Inventario según el almacén."""
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.tamanos:
+            ruta_json = os.path.join(tmp, f"inventario_{n}.json")
+            ruta_db = os.path.join(tmp, f"inventario_{n}.db")
+            _crear_json(ruta_json, n)
+            _crear_db(ruta_db, n)
+            fila = [n]
+            for almacen in (inventario_archivo.AlmacenJSON(ruta_json),
+                            inventario_archivo.AlmacenSQLite(ruta_db)):
+                inv = inventario_archivo.Inventario(almacen)
+                ids = [random.randint(1, n) for _ in range(args.operaciones)]
+                nuevos = iter(range(n + 1, n + 1 + args.operaciones))
+                fila.append(f"{_medir(lambda i: inv.actualizar(ids[i], i, 2.5), args.operaciones, args.presupuesto):.1f}")
+                fila.append(f"{_medir(lambda i: inv.agregar(inventario_archivo.Producto(next(nuevos), 'Nuevo', 1, 1.0)), args.operaciones, args.presupuesto):.1f}")
+                inv.cerrar()
+            filas.append(fila)
+    _tabla(("productos", "JSON act. µs", "JSON alta µs", "SQLite act. µs", "SQLite alta µs"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Búsqueda por nombre
+# ═══════════════════════════════════════════════
+
+_MARCAS = ("Redmi", "Motorola", "Infinix", "Samsung", "Huawei", "Xiaomi", "Nokia",
+           "Lenovo", "Acer", "Asus", "Logitech", "Sony", "Philips", "Olympia")
+_TIPOS = ("Teléfono", "Cargador", "Audífonos", "Funda", "Cable USB", "Tablet",
+          "Portátil", "Ratón", "Teclado", "Parlante", "Cámara", "Batería")
+
+
+def _nombres_ejemplo(n, semilla=1):
+    azar = random.Random(semilla)
+    return [f"{azar.choice(_TIPOS)} {azar.choice(_MARCAS)} {azar.randint(1, 99999)}"
+            for _ in range(n)]
+
+
+def _percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)]
+
+
+def bench_busqueda(args):
+    """Latencia de búsqueda por subcadena: recorrido con lower() vs índice de trigramas."""
+    nombres = _nombres_ejemplo(args.productos)
+    azar = random.Random(2)
+    consultas = []
+    for _ in range(args.consultas):
+        nombre = azar.choice(nombres)
+        largo = azar.choice((3, 4, 5, 6, 8))
+        inicio = azar.randint(0, max(0, len(nombre) - largo))
+        consultas.append(nombre[inicio:inicio + largo])
+
+    inicio = time.perf_counter()
+    indice = IndiceTrigramas()
+    for i, nombre in enumerate(nombres):
+        indice.agregar(i, nombre)
+    construccion = time.perf_counter() - inicio
+
+    def medir(buscar):
+        tiempos = []
+        for q in consultas:
+            t = time.perf_counter()
+            buscar(q)
+            tiempos.append((time.perf_counter() - t) * 1e3)
+        return _percentiles(tiempos)
+
+    lineal = medir(lambda q: [i for i, n in enumerate(nombres) if q.lower() in n.lower()])
+    indexado = medir(indice.buscar)
+    print(f"{args.productos} productos, {args.consultas} consultas; "
+          f"índice construido en {construccion:.1f} s")
+    _tabla(("método", "p50 ms", "p99 ms"),
+           [("recorrido", f"{lineal[0]:.2f}", f"{lineal[1]:.2f}"),
+            ("trigramas", f"{indexado[0]:.2f}", f"{indexado[1]:.2f}")])
+
+
+# ═══════════════════════════════════════════════
+# Importación por lotes (inventario_archivo)
+# ═══════════════════════════════════════════════
+
+def bench_importacion(args):
+    """Importar n productos en inventario.json: agregar() uno a uno vs agregar_muchos()."""
+    def productos(n):
+        return [inventario_archivo.Producto(*f) for f in _filas_ejemplo(n)]
+
+    def importar_uno_a_uno(ruta, n):
+        inv = inventario_archivo.Inventario(inventario_archivo.AlmacenJSON(ruta))
+        for p in productos(n):
+            inv.agregar(p)
+
+    def importar_lote(ruta, n):
+        inv = inventario_archivo.Inventario(inventario_archivo.AlmacenJSON(ruta))
+        inv.agregar_muchos(productos(n))
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sorted({min(args.max_uno_a_uno, args.productos), args.productos}):
+            fila = [n]
+            for importar in (importar_uno_a_uno, importar_lote):
+                if importar is importar_uno_a_uno and n > args.max_uno_a_uno:
+                    fila.append("—")
+                    continue
+                ruta = os.path.join(tmp, f"{importar.__name__}_{n}.json")
+                fila.append(f"{_segundos(lambda: importar(ruta, n)):.2f}")
+            filas.append(fila)
+    _tabla(("productos", "uno a uno s", "agregar_muchos s"), filas)
+    if args.productos > args.max_uno_a_uno:
+        # Cada alta reescribe todo el archivo: el coste total crece con n²
+        medido = float(filas[0][1])
+        estimado = medido * (args.productos / args.max_uno_a_uno) ** 2
+        print(f"Estimado uno a uno para {args.productos}: ~{estimado:.0f} s")
+
+
+# ═══════════════════════════════════════════════
+# Escritura de instantáneas
+# ═══════════════════════════════════════════════
+
+def bench_escritura(args):
+    """Volcado completo: open('w') directo (antes) vs escritura atómica (ahora)."""
+    def txt_directo(inv):
+        with open(inv.archivo, "w", encoding="utf-8") as f:
+            for c in inv._almacen.recorrer():
+                f.write(Semana9._linea(*c))
+
+    def json_directo(almacen):
+        datos = [p.to_dict() for p in almacen.productos.values()]
+        with open(almacen.archivo, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=4)
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp, _silencio():
+        for n in args.tamanos:
+            ruta_txt = os.path.join(tmp, f"inv_{n}.txt")
+            _crear_txt(ruta_txt, n)
+            inv = Semana9.Inventario(ruta_txt)
+            ruta_json = os.path.join(tmp, f"inv_{n}.json")
+            _crear_json(ruta_json, n)
+            almacen = inventario_archivo.AlmacenJSON(ruta_json)
+            filas.append([n,
+                          f"{_segundos(lambda: txt_directo(inv)):.3f}",
+                          f"{_segundos(inv._guardar_en_archivo):.3f}",
+                          f"{_segundos(lambda: json_directo(almacen)):.3f}",
+                          f"{_segundos(almacen._guardar):.3f}"])
+    _tabla(("productos", "txt antes s", "txt atómico s", "json antes s", "json atómico s"),
+           filas)
+
+
+# ═══════════════════════════════════════════════
+# Arranque desde la instantánea binaria
+# ═══════════════════════════════════════════════
+
+def _comprobar_compactacion_fallida():
+    """Si compactar() falla, los cambios ya escritos en el diario siguen en memoria y al reabrir."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.bin")
+        inventario = inventario_archivo.Inventario(
+            inventario_archivo.AlmacenBinario(ruta, umbral_compactacion=1))
+        avisos = []
+        inventario.agregar_observador(lambda *aviso: avisos.append(aviso))
+
+        def compactar():
+            raise OSError("disco lleno (simulado)")
+
+        inventario.almacen.compactar = compactar
+        with _silencio():
+            inventario.agregar(inventario_archivo.Producto(1, "Uno", 1, 1.0))
+            inventario.agregar_muchos(inventario_archivo.Producto(i, f"P{i}", i, 1.0)
+                                      for i in (2, 3))
+        assert [p.id for p in inventario.mostrar_todos()] == [1, 2, 3]
+        assert [aviso[2][0] for aviso in avisos] == [1, 2, 3]
+        inventario.cerrar()
+        reabierto = inventario_archivo.AlmacenBinario(ruta)
+        assert [p.id for p in reabierto.todos()] == [1, 2, 3]
+        reabierto.cerrar()
+
+
+def bench_arranque(args):
+    """Abrir el inventario y consultar IDs: instantánea binaria (mmap) vs texto."""
+    _comprobar_compactacion_fallida()
+    def abrir_binario(ruta):
+        almacen = inventario_archivo.AlmacenBinario(ruta)
+        for id in ids:
+            almacen.obtener(id)
+        almacen.cerrar()
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.tamanos:
+            ids = [random.randint(1, n) for _ in range(args.consultas)]
+            ruta = os.path.join(tmp, f"inv_{n}.bin")
+            escribir_instantanea(ruta, _filas_ejemplo(n))
+            fila = [n, f"{os.path.getsize(ruta) / 2**20:.0f}",
+                    f"{_segundos(lambda: abrir_binario(ruta)) * 1e3:.1f}"]
+            if n > args.max_texto:
+                fila += ["—", "—"]
+            else:
+                ruta_txt = os.path.join(tmp, f"inv_{n}.txt")
+                _crear_txt(ruta_txt, n)
+                ruta_json = os.path.join(tmp, f"inv_{n}.json")
+                _crear_json(ruta_json, n)
+                with _silencio():
+                    fila.append(f"{_segundos(lambda: Semana9.Inventario(ruta_txt)) * 1e3:.0f}")
+                fila.append(f"{_segundos(lambda: inventario_archivo.AlmacenJSON(ruta_json)) * 1e3:.0f}")
+            filas.append(fila)
+    _tabla(("productos", "bin MB", f"bin + {args.consultas} consultas ms", "txt ms", "json ms"),
+           filas)
+
+
+# ═══════════════════════════════════════════════
+# Indicadores (analitica_inventario)
+# ═══════════════════════════════════════════════
+
+def bench_analitica(args):
+    """Valor total, bajo umbral y top-N: bucles sobre productos vs AnaliticaInventario."""
+    def bucles(inv):
+        return {
+            "valor_total": lambda: sum(p.cantidad * p.precio for p in inv.productos),
+            "bajo_umbral": lambda: sorted(p.id for p in inv.productos if p.cantidad < 10),
+            "mayores": lambda: sorted(inv.productos,
+                                      key=lambda p: (-p.cantidad * p.precio, p.id))[:10],
+        }
+
+    def indicadores(analitica):
+        return {
+            "valor_total": analitica.valor_total,
+            "bajo_umbral": lambda: analitica.bajo_umbral(10),
+            "mayores": lambda: analitica.mayores(10),
+        }
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.txt")
+        _crear_txt(ruta, args.productos)
+        with _silencio():
+            inv = Semana9.Inventario(ruta, diario=True)
+        tiempos = {nombre: [_segundos(f) * 1e3] for nombre, f in bucles(inv).items()}
+        modos = (True, False) if analitica_inventario.np is not None else (False,)
+        for usar_numpy in modos:
+            for nombre, f in indicadores(AnaliticaInventario(inv, usar_numpy)).items():
+                tiempos[nombre].append(_segundos(f) * 1e3)
+
+        # Con la caché ya llena: un cambio y la consulta corregida
+        analitica = AnaliticaInventario(inv)
+        consultas = indicadores(analitica)
+        for f in consultas.values():
+            f()
+        ids = [random.randint(1, args.productos) for _ in range(args.cambios)]
+        for nombre, f in consultas.items():
+            with _silencio():
+                us = _medir(lambda i: (inv.actualizar_producto(ids[i], i % 50, 9.99), f()),
+                            args.cambios, 5.0)
+                us -= _medir(lambda i: inv.actualizar_producto(ids[i], i % 50, 9.99),
+                             args.cambios, 5.0)
+            tiempos[nombre].append(f"{max(us, 0):.1f} µs")
+        for nombre, valores in tiempos.items():
+            filas.append([nombre] + [v if isinstance(v, str) else f"{v:.1f}" for v in valores])
+    encabezados = ["indicador", "bucle ms"]
+    if analitica_inventario.np is not None:
+        encabezados.append("numpy ms")
+    _tabla(encabezados + ["sin numpy ms", "tras un cambio"], filas)
+
+
+# ═══════════════════════════════════════════════
+# Varios terminales a la vez (servicio_inventario)
+# ═══════════════════════════════════════════════
+
+def _terminal(ruta, modo, operaciones, productos, barrera, resultados):
+    """Proceso que suma 1 al stock de productos al azar `operaciones` veces."""
+    servicio = ServicioInventario(ruta)
+    conexion = servicio.conexion
+    barrera.wait()
+    inicio = time.perf_counter()
+    for _ in range(operaciones):
+        id = random.randint(1, productos)
+        if modo == "ciego":
+            # Leer, calcular y sobrescribir sin comprobar nada (como antes)
+            cantidad = conexion.execute("SELECT cantidad FROM productos WHERE id = ?",
+                                        (id,)).fetchone()[0]
+            conexion.execute("UPDATE productos SET cantidad = ? WHERE id = ?", (cantidad + 1, id))
+        else:
+            ok, mensaje = servicio.ajustar_stock(id, 1)
+            if not ok:
+                raise RuntimeError(mensaje)
+    resultados.put((time.perf_counter() - inicio, servicio.conflictos))
+    servicio.cerrar()
+
+
+def _comprobar_refresco_tras_poda(ruta):
+    """refrescar() recarga todo si los cambios que no vio se podaron, aunque la tabla quede vacía."""
+    a, b = ServicioInventario(ruta), ServicioInventario(ruta)
+    for i in (1, 2):
+        a.agregar(inventario_archivo.Producto(i, f"Producto {i}", 0, 1.0))
+    a.conexion.execute(ServicioInventario._PODAR, (2,))    # tabla de cambios vacía
+    assert b.refrescar() == 2 and 1 in b and 2 in b
+    try:
+        a.podar_cambios(conservar=0)
+        raise AssertionError("podar_cambios aceptó conservar=0")
+    except ValueError:
+        pass
+    a.cerrar()
+    b.cerrar()
+
+
+def bench_concurrencia(args):
+    """N procesos sumando stock a la vez: escritura ciega vs versión optimista."""
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        _comprobar_refresco_tras_poda(os.path.join(tmp, "poda.db"))
+        for modo in ("ciego", "optimista"):
+            ruta = os.path.join(tmp, f"{modo}.db")
+            almacen = inventario_archivo.AlmacenSQLite(ruta)
+            almacen.insertar_muchos(inventario_archivo.Producto(i, f"Producto {i}", 0, 1.0)
+                                    for i in range(1, args.productos + 1))
+            almacen.cerrar()
+            ServicioInventario(ruta).cerrar()       # migración antes de arrancar
+
+            barrera = multiprocessing.Barrier(args.procesos)
+            resultados = multiprocessing.Queue()
+            procesos = [multiprocessing.Process(
+                target=_terminal,
+                args=(ruta, modo, args.operaciones, args.productos, barrera, resultados))
+                for _ in range(args.procesos)]
+            for proceso in procesos:
+                proceso.start()
+            medidas = [resultados.get() for _ in procesos]
+            for proceso in procesos:
+                proceso.join()
+
+            with sqlite3.connect(ruta) as conexion:
+                total = conexion.execute("SELECT SUM(cantidad) FROM productos").fetchone()[0]
+            conexion.close()
+            esperado = args.procesos * args.operaciones
+            segundos = max(m[0] for m in medidas)
+            filas.append((modo, esperado, f"{esperado / segundos:.0f}",
+                          sum(m[1] for m in medidas), esperado - total))
+    _tabla(("modo", "operaciones", "ops/s", "reintentos", "perdidas"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Servidor asyncio (servidor_inventario)
+# ═══════════════════════════════════════════════
+
+def bench_servidor(args):
+    """Peticiones por socket Unix: una escritura por petición vs lotes agrupados."""
+    async def medir(ruta, almacen, max_lote):
+        servidor = servidor_inventario.ServidorInventario(
+            lambda: inventario_archivo.Inventario(almacen(ruta)), max_lote)
+        socket = os.path.join(os.path.dirname(ruta), "inventario.sock")
+        servicio = await servidor.iniciar(ruta_unix=socket)
+        try:
+            resultado = await servidor_inventario.generar_carga(
+                ruta_unix=socket, conexiones=args.conexiones, peticiones=args.peticiones,
+                profundidad=args.profundidad, lecturas=args.lecturas, productos=args.productos)
+        finally:
+            servicio.close()
+            await servidor.cerrar()
+        resultado["grupos"] = servidor.grupos
+        return resultado
+
+    filas = []
+    for nombre, almacen, extension in (("json", inventario_archivo.AlmacenJSON, ".json"),
+                                       ("sqlite", inventario_archivo.AlmacenSQLite, ".db")):
+        for max_lote in (1, servidor_inventario.MAX_LOTE):
+            with tempfile.TemporaryDirectory() as tmp:
+                r = asyncio.run(medir(os.path.join(tmp, "inventario" + extension),
+                                      almacen, max_lote))
+            filas.append((nombre, max_lote, r["grupos"], f"{r['ops_s']:.0f}",
+                          f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}", f"{r['p99_ms']:.2f}"))
+    _tabla(("almacén", "max lote", "lotes", "ops/s", "p50 ms", "p95 ms", "p99 ms"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Eventos de cambio (eventos_inventario)
+# ═══════════════════════════════════════════════
+
+def bench_eventos(args):
+    """Coste de publicar cada cambio y de reanudar un consumidor cerca del final."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.txt")
+        _crear_txt(ruta, 10_000)
+        with _silencio():
+            inv = Semana9.Inventario(ruta, diario=True)
+            ids = [random.randint(1, 10_000) for _ in range(args.operaciones)]
+            sin_eventos = _medir(lambda i: inv.actualizar_producto(ids[i], i % 100, 1.5),
+                                 args.operaciones, 5.0)
+            publicador = PublicadorEventos(os.path.join(tmp, "eventos.jsonl")).seguir(inv)
+            con_eventos = _medir(lambda i: inv.actualizar_producto(ids[i], i % 100, 1.5),
+                                 args.operaciones, 5.0)
+            publicador.cerrar()
+        _tabla(("actualizar µs/op", "con eventos µs/op"),
+               [(f"{sin_eventos:.1f}", f"{con_eventos:.1f}")])
+        print()
+
+        ruta = os.path.join(tmp, "muchos.jsonl")
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.writelines(EventoCambio(seq, "actualizar", seq % 1000, (seq % 1000, "p", 1, 1.0),
+                                      (seq % 1000, "p", 2, 1.0), 0.0).a_json() + "\n"
+                         for seq in range(1, args.eventos + 1))
+        desde = args.eventos - 10
+
+        def recorrer():
+            with open(ruta, "rb") as f:
+                return [e for e in map(EventoCambio.desde_json, f) if e.seq > desde]
+
+        filas = [(args.eventos, f"{_segundos(recorrer) * 1e3:.0f}",
+                  f"{_segundos(lambda: ConsumidorEventos(ruta, desde).leer()) * 1e3:.2f}")]
+    _tabla(("eventos", "recorrer todo ms", "reanudar ms"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Listado por páginas (indice_ordenado)
+# ═══════════════════════════════════════════════
+
+def bench_listado(args):
+    """Una página ordenada: ordenar todo el catálogo vs listar() con índice ordenado."""
+    def pagina_ordenando(productos):
+        # Lo que hacía mostrar_todos(): copia ordenada de todo y recorte
+        return sorted(productos, key=lambda p: (p.precio, p.id))[args.offset:args.offset + 20]
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_txt = os.path.join(tmp, "inventario.txt")
+        _crear_txt(ruta_txt, args.productos)
+        ruta_json = os.path.join(tmp, "inventario.json")
+        _crear_json(ruta_json, args.productos)
+        ruta_db = os.path.join(tmp, "inventario.db")
+        _crear_db(ruta_db, args.productos)
+        with _silencio():
+            semana9 = Semana9.Inventario(ruta_txt)
+        inventarios = (
+            ("Semana9", lambda: semana9.productos, semana9.listar),
+            ("json", None, inventario_archivo.Inventario(
+                inventario_archivo.AlmacenJSON(ruta_json)).listar),
+            ("sqlite", None, inventario_archivo.Inventario(
+                inventario_archivo.AlmacenSQLite(ruta_db)).listar),
+        )
+        for nombre, productos, listar in inventarios:
+            if productos is None:
+                productos = (lambda listar: lambda: listar(0, None))(listar)
+            antes = _segundos(lambda: pagina_ordenando(productos())) * 1e3
+            primera = _segundos(lambda: listar(args.offset, 20, "precio")) * 1e3
+            con_offset = _medir(lambda i: listar(args.offset + 20 * i, 20, "precio"),
+                                args.paginas, 5.0)
+            ultimo = [listar(args.offset, 20, "precio")[-1]]
+
+            def siguiente(_, listar=listar, ultimo=ultimo):
+                pagina = listar(0, 20, "precio", despues=ultimo[0])
+                if pagina:
+                    ultimo[0] = pagina[-1]
+
+            con_cursor = _medir(siguiente, args.paginas, 5.0)
+            filas.append((nombre, f"{antes:.0f}", f"{primera:.0f}", f"{con_offset:.1f}",
+                          f"{con_cursor:.1f}"))
+    _tabla(("inventario", "ordenar todo ms", "primer listar ms", "página con offset µs",
+            "página con cursor µs"), filas)
+
+
+# ═══════════════════════════════════════════════
+# Main
+# ═══════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="medicion", required=True)
+
+    p = sub.add_parser("diario", help=bench_diario.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    p.add_argument("--operaciones", type=int, default=200)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por modo y tamaño")
+    p.set_defaults(funcion=bench_diario)
+
+    p = sub.add_parser("carga_masiva", help=bench_carga_masiva.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--max-lineal", type=int, default=20_000,
+                   help="tamaño máximo medido con el recorrido lineal")
+    p.set_defaults(funcion=bench_carga_masiva)
+
+    p = sub.add_parser("carga", help="arranque desde inventario.txt por bloques")
+    p.add_argument("--tamanos", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    p.add_argument("--procesos", type=int, default=None)
+    p.set_defaults(funcion=bench_carga)
+
+    p = sub.add_parser("memoria", help=bench_memoria.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 1_000_000, 5_000_000])
+    p.set_defaults(funcion=bench_memoria)
+
+    p = sub.add_parser("almacenes", help=bench_almacenes.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    p.add_argument("--operaciones", type=int, default=500)
+    p.add_argument("--presupuesto", type=float, default=5.0,
+                   help="segundos máximos por operación, almacén y tamaño")
+    p.set_defaults(funcion=bench_almacenes)
+
+    p = sub.add_parser("busqueda", help=bench_busqueda.__doc__)
+    p.add_argument("--productos", type=int, default=1_000_000)
+    p.add_argument("--consultas", type=int, default=200)
+    p.set_defaults(funcion=bench_busqueda)
+
+    p = sub.add_parser("importacion", help=bench_importacion.__doc__)
+    p.add_argument("--productos", type=int, default=100_000)
+    p.add_argument("--max-uno-a-uno", type=int, default=2_000,
+                   help="tamaño máximo importado con agregar() uno a uno")
+    p.set_defaults(funcion=bench_importacion)
+
+    p = sub.add_parser("escritura", help=bench_escritura.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.set_defaults(funcion=bench_escritura)
+
+    p = sub.add_parser("arranque", help=bench_arranque.__doc__)
+    p.add_argument("--tamanos", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    p.add_argument("--consultas", type=int, default=1_000)
+    p.add_argument("--max-texto", type=int, default=1_000_000,
+                   help="tamaño máximo medido con los formatos de texto")
+    p.set_defaults(funcion=bench_arranque)
+
+    p = sub.add_parser("analitica", help=bench_analitica.__doc__)
+    p.add_argument("--productos", type=int, default=1_000_000)
+    p.add_argument("--cambios", type=int, default=200)
+    p.set_defaults(funcion=bench_analitica)
+
+    p = sub.add_parser("concurrencia", help=bench_concurrencia.__doc__)
+    p.add_argument("--procesos", type=int, default=4)
+    p.add_argument("--operaciones", type=int, default=500, help="por proceso")
+    p.add_argument("--productos", type=int, default=10,
+                   help="pocos productos = más choques entre procesos")
+    p.set_defaults(funcion=bench_concurrencia)
+
+    p = sub.add_parser("servidor", help=bench_servidor.__doc__)
+    p.add_argument("--conexiones", type=int, default=8)
+    p.add_argument("--peticiones", type=int, default=5_000)
+    p.add_argument("--profundidad", type=int, default=16)
+    p.add_argument("--lecturas", type=float, default=0.0)
+    p.add_argument("--productos", type=int, default=1_000)
+    p.set_defaults(funcion=bench_servidor)
+
+    p = sub.add_parser("eventos", help=bench_eventos.__doc__)
+    p.add_argument("--operaciones", type=int, default=2_000)
+    p.add_argument("--eventos", type=int, default=1_000_000)
+    p.set_defaults(funcion=bench_eventos)
+
+    p = sub.add_parser("listado", help=bench_listado.__doc__)
+    p.add_argument("--productos", type=int, default=1_000_000)
+    p.add_argument("--offset", type=int, default=500_000)
+    p.add_argument("--paginas", type=int, default=200)
+    p.set_defaults(funcion=bench_listado)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Conversión del inventario entre sus formatos de archivo, según la extensión:
+
+    .txt   inventario de Semana9.py (incluye su diario .log)
+    .json  AlmacenJSON de inventario_archivo.py
+    .db    AlmacenSQLite de inventario_archivo.py
+    .bin   instantánea binaria (snapshot_binario.py, AlmacenBinario)
+
+Los productos pasan de un archivo a otro fila a fila, sin cargar el
+inventario entero: el .txt se lee por bloques, el .json con un decodificador
+incremental y el .db con un cursor; se escriben con escribir_atomico o, en
+SQLite, con executemany dentro de una sola transacción
+(AlmacenSQLite.reemplazar_todo). Cada fila se valida
+con las reglas de Producto.desde_linea (Semana9); las que no las cumplen, y
+los IDs repetidos, se descartan con una advertencia.
+
+Uso:
+    python convertir_inventario.py inventario.txt inventario.db
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+import Semana9
+from almacen_columnar import MAX_ENTERO, MIN_ENTERO
+from escritura_atomica import escribir_atomico
+from inventario_archivo import AlmacenBinario, AlmacenSQLite, Producto, _json_por_lineas
+from snapshot_binario import escribir_instantanea
+
+FORMATOS = (".txt", ".json", ".db", ".bin")
+TAMANO_LECTURA = 1024 * 1024        # caracteres leídos por vez del .json
+MAX_ELEMENTO = 1024 * 1024          # caracteres como máximo de un producto del .json
+TAMANO_BLOQUE = 1024 * 1024         # bytes del .txt analizados por vez
+
+_ESPACIOS = re.compile(r"\s*")
+
+
+def _formato(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in FORMATOS:
+        raise ValueError(f"Formato no soportado: '{ruta}' (use {', '.join(FORMATOS)})")
+    return extension
+
+
+def _avisar(ubicacion, mensaje):
+    print(f"[ADVERTENCIA] {ubicacion} ignorada: {mensaje}")
+
+
+def _validar(id, nombre, cantidad, precio):
+    """
+    Devuelve la fila tal como la dejaría Producto.campos_desde_linea, o lanza
+    ValueError. Las filas que ya tienen los tipos correctos no se convierten
+    a texto: solo se comprueba que el nombre quepa en una línea del .txt y
+    que el ID y la cantidad sean enteros de 64 bits.
+    """
+    if (type(id) is int and type(cantidad) is int and type(precio) is float
+            and MIN_ENTERO <= id <= MAX_ENTERO and MIN_ENTERO <= cantidad <= MAX_ENTERO
+            and type(nombre) is str and "," not in nombre and "\n" not in nombre):
+        return id, nombre, cantidad, precio
+    return Semana9.Producto.campos_desde_linea(Semana9._linea(id, nombre, cantidad, precio))
+
+
+# ═══════════════════════════════════════════════
+# Lectura
+# ═══════════════════════════════════════════════
+
+def _cambios_del_diario(ruta, rechazar):
+    """
+    Estado final que deja el diario de Semana9 (ruta.log) para cada ID que
+    toca: ("A", fila), ("E",) o ("U", cantidad, precio). El diario se
+    compacta al superar un umbral, así que cabe en memoria.
+    """
+    cambios = {}
+    if not os.path.exists(ruta + Semana9.SUFIJO_DIARIO):
+        return cambios
+    with open(ruta + Semana9.SUFIJO_DIARIO, "r", encoding="utf-8") as f:
+        for i, registro in enumerate(f, start=1):
+            if not registro.endswith("\n"):
+                break                   # registro a medio escribir
+            tipo, _, resto = registro.rstrip("\n").partition(",")
+            try:
+                if tipo == "A":
+                    fila = Semana9.Producto.campos_desde_linea(resto)
+                    cambios[fila[0]] = ("A", fila)
+                elif tipo == "E":
+                    cambios[int(resto)] = ("E",)
+                elif tipo == "U":
+                    partes = resto.split(",")
+                    if len(partes) != 3:
+                        raise ValueError(f"Registro con formato inválido: '{registro.strip()}'")
+                    id, cantidad, precio = int(partes[0]), int(partes[1]), float(partes[2])
+                    anterior = cambios.get(id)
+                    if anterior is None or anterior[0] == "U":
+                        cambios[id] = ("U", cantidad, precio)
+                    elif anterior[0] == "A":
+                        cambios[id] = ("A", (id, anterior[1][1], cantidad, precio))
+                else:
+                    raise ValueError(f"Tipo de registro desconocido: '{registro.strip()}'")
+            except ValueError as e:
+                rechazar(f"Registro {i} del diario", e)
+    return cambios
+
+
+def _leer_txt(ruta, rechazar):
+    """
+    Filas del .txt por bloques, con los cambios de su diario aplicados. De
+    las filas ya leídas solo se guarda el ID, para descartar repetidos.
+    """
+    cambios = _cambios_del_diario(ruta, rechazar)
+    vistos = set()
+    if os.path.exists(ruta):
+        procesos = os.cpu_count() or 1
+        with open(ruta, "rb") as f:
+            bloques = Semana9._leer_bloques(f, TAMANO_BLOQUE)
+            # Igual que Semana9: los bloques se analizan en paralelo, con solo
+            # unos pocos en vuelo a la vez
+            if procesos > 1 and os.path.getsize(ruta) > TAMANO_BLOQUE:
+                resultados = Semana9._parsear_en_paralelo(bloques, procesos)
+            else:
+                resultados = (Semana9._parsear_bloque(b, linea) for b, linea in bloques)
+            for filas, errores in resultados:
+                for i, mensaje in errores:
+                    rechazar(f"Línea {i}", mensaje)
+                for i, id, nombre, cantidad, precio in filas:
+                    if id in vistos:
+                        rechazar(f"Línea {i}", f"ID duplicado: {id}")
+                        continue
+                    vistos.add(id)
+                    cambio = cambios.pop(id, None)
+                    if cambio is None:
+                        yield id, nombre, cantidad, precio
+                    elif cambio[0] == "A":
+                        yield cambio[1]
+                    elif cambio[0] == "U":
+                        yield id, nombre, cambio[1], cambio[2]
+    # Altas del diario que no estaban en la instantánea
+    for cambio in cambios.values():
+        if cambio[0] == "A":
+            yield cambio[1]
+
+
+def _elementos_json(f):
+    """
+    Genera los elementos de la lista JSON de `f` leyendo TAMANO_LECTURA
+    caracteres por vez; solo el elemento en curso y el trozo leído están en
+    memoria.
+    """
+    decodificador = json.JSONDecoder()
+    texto, pos = "", 0
+    fin_archivo = False
+
+    def leer_mas():
+        nonlocal texto, pos, fin_archivo
+        mas = f.read(TAMANO_LECTURA)
+        fin_archivo = not mas
+        texto, pos = texto[pos:] + mas, 0
+        return not fin_archivo
+
+    def siguiente_caracter():
+        nonlocal pos
+        while True:
+            pos = _ESPACIOS.match(texto, pos).end()
+            if pos < len(texto):
+                return texto[pos]
+            if not leer_mas():
+                raise ValueError("JSON incompleto: falta el cierre de la lista.")
+
+    if siguiente_caracter() != "[":
+        raise ValueError("El JSON no es una lista de productos.")
+    pos += 1
+    if siguiente_caracter() == "]":
+        return
+    while True:
+        siguiente_caracter()
+        try:
+            elemento, fin = decodificador.raw_decode(texto, pos)
+        except json.JSONDecodeError as e:
+            # El elemento puede seguir en el próximo trozo; pasado
+            # MAX_ELEMENTO se da por mal formado
+            if len(texto) - pos < MAX_ELEMENTO and leer_mas():
+                continue
+            raise ValueError(f"JSON inválido: {e}") from None
+        if fin == len(texto) and not fin_archivo and leer_mas():
+            continue                    # un número pudo quedar cortado: se relee entero
+        pos = fin
+        yield elemento
+        separador = siguiente_caracter()
+        pos += 1
+        if separador == "]":
+            return
+        if separador != ",":
+            raise ValueError(f"JSON inválido: se esperaba ',' o ']' y hay '{separador}'.")
+
+
+def _leer_json(ruta, rechazar):
+    vistos = set()
+    with open(ruta, "r", encoding="utf-8") as f:
+        for i, elemento in enumerate(_elementos_json(f), start=1):
+            try:
+                p = Producto.from_dict(elemento)
+                fila = _validar(p.id, p.nombre, p.cantidad, p.precio)
+            except (KeyError, TypeError, ValueError) as e:
+                rechazar(f"Producto {i}", e if isinstance(e, ValueError) else
+                         f"formato inválido: {elemento!r}")
+                continue
+            if fila[0] in vistos:
+                rechazar(f"Producto {i}", f"ID duplicado: {fila[0]}")
+                continue
+            vistos.add(fila[0])
+            yield fila
+
+
+def _leer_almacen(filas, rechazar):
+    # .db y .bin ya garantizan IDs únicos; solo falta validar los campos
+    for fila in filas:
+        try:
+            yield _validar(*fila)
+        except ValueError as e:
+            rechazar(f"Producto {fila[0]}", e)
+
+
+def leer_productos(ruta, rechazar=_avisar):
+    """
+    Genera (id, nombre, cantidad, precio) de un inventario en cualquier
+    formato, validados. Las filas descartadas se notifican con
+    rechazar(ubicación, mensaje).
+    """
+    formato = _formato(ruta)
+    if formato == ".txt":
+        yield from _leer_txt(ruta, rechazar)
+    elif formato == ".json":
+        yield from _leer_json(ruta, rechazar)
+    elif formato == ".db":
+        almacen = AlmacenSQLite(ruta)
+        try:
+            yield from _leer_almacen(almacen.conexion.execute(AlmacenSQLite._TODOS), rechazar)
+        finally:
+            almacen.cerrar()
+    else:
+        almacen = AlmacenBinario(ruta)
+        try:
+            filas = ((p.id, p.nombre, p.cantidad, p.precio) for p in almacen.todos())
+            yield from _leer_almacen(filas, rechazar)
+        finally:
+            almacen.cerrar()
+
+
+# ═══════════════════════════════════════════════
+# Escritura
+# ═══════════════════════════════════════════════
+
+def escribir_productos(ruta, filas):
+    """
+    Reemplaza el contenido de `ruta` por las filas (id, nombre, cantidad,
+    precio). Solo el .bin acumula las columnas (arrays compactos) antes de
+    escribir, porque guarda también el orden por ID.
+    """
+    formato = _formato(ruta)
+    if formato == ".txt":
+        escribir_atomico(ruta, (Semana9._linea(*f) for f in filas))
+        if os.path.exists(ruta + Semana9.SUFIJO_DIARIO):
+            os.remove(ruta + Semana9.SUFIJO_DIARIO)     # el diario era del inventario anterior
+    elif formato == ".json":
+        escribir_atomico(ruta, _json_por_lineas(Producto(*f) for f in filas))
+    elif formato == ".bin":
+        escribir_instantanea(ruta, filas)
+        if os.path.exists(ruta + ".log"):
+            os.remove(ruta + ".log")     # el diario era de la instantánea anterior
+    else:
+        almacen = AlmacenSQLite(ruta)
+        try:
+            almacen.reemplazar_todo(filas)
+        finally:
+            almacen.cerrar()
+
+
+def convertir(origen, destino, rechazar=_avisar):
+    """
+    Copia el inventario de `origen` a `destino`, cada uno en su formato.
+    Devuelve (filas escritas, filas descartadas).
+    """
+    if os.path.abspath(origen) == os.path.abspath(destino):
+        raise ValueError("El origen y el destino son el mismo archivo.")
+    if not (os.path.exists(origen) or os.path.exists(origen + Semana9.SUFIJO_DIARIO)):
+        raise ValueError(f"No existe el archivo '{origen}'.")
+    escritas = descartadas = 0
+
+    def descartar(ubicacion, mensaje):
+        nonlocal descartadas
+        descartadas += 1
+        rechazar(ubicacion, mensaje)
+
+    def contar(filas):
+        nonlocal escritas
+        for escritas, fila in enumerate(filas, start=1):
+            yield fila
+
+    escribir_productos(destino, contar(leer_productos(origen, descartar)))
+    return escritas, descartadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("origen")
+    parser.add_argument("destino")
+    args = parser.parse_args()
+    inicio = time.perf_counter()
+    try:
+        escritas, descartadas = convertir(args.origen, args.destino)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    segundos = time.perf_counter() - inicio
+    print(f"[INFO] '{args.origen}' convertido a '{args.destino}': {escritas} producto(s) "
+          f"en {segundos:.2f} s ({escritas / max(segundos, 1e-9):,.0f} filas/s).")
+    if descartadas:
+        print(f"[ADVERTENCIA] {descartadas} fila(s) descartada(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
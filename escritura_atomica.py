@@ -0,0 +1,142 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Escritura segura de instantáneas del inventario. El contenido se escribe en
+un archivo temporal del mismo directorio, se fuerza a disco y después se
+renombra sobre el original, así que un corte a mitad de escritura nunca deja
+el archivo truncado: queda la versión anterior o la nueva, completa.
+"""
+
+import os
+import threading
+import time
+
+TAMANO_BUFFER = 1024 * 1024      # 1 MB: pocas llamadas al sistema al escribir
+
+# Temporal nuevo para escritura exclusiva (O_BINARY solo existe en Windows)
+_CREAR = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
+def _crear_temporal(ruta):
+    """
+    Crea un archivo temporal vacío junto a `ruta` y devuelve (descriptor,
+    ruta). Se abre con 0666 y el sistema le aplica la umask del momento,
+    como a cualquier archivo nuevo (mkstemp, en cambio, lo crearía con 0600).
+    """
+    prefijo = os.path.join(os.path.dirname(os.path.abspath(ruta)), os.path.basename(ruta) + ".")
+    while True:
+        temporal = f"{prefijo}{os.urandom(6).hex()}.tmp"
+        try:
+            return os.open(temporal, _CREAR, 0o666), temporal
+        except FileExistsError:
+            continue
+
+
+def _sincronizar_directorio(directorio):
+    """Fuerza a disco la entrada del directorio tras el renombrado (solo POSIX)."""
+    if os.name != "posix":
+        return
+    descriptor = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def escribir_atomico(ruta, trozos, tamano_buffer=TAMANO_BUFFER, binario=False):
+    """
+    Escribe en `ruta` el texto formado por `trozos` (iterable de str, o de
+    bytes con binario=True) de forma atómica. Si algo falla, el archivo
+    original queda intacto y la excepción (OSError, PermissionError...) llega
+    al llamador.
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    descriptor, temporal = _crear_temporal(ruta)
+    try:
+        if binario:
+            f = open(descriptor, "wb", buffering=tamano_buffer)
+        else:
+            f = open(descriptor, "w", encoding="utf-8", buffering=tamano_buffer)
+        with f:
+            f.writelines(trozos)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # El reemplazo conserva los permisos del archivo que sustituye
+            os.chmod(temporal, os.stat(ruta).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    _sincronizar_directorio(directorio)
+
+
+class EscritorEnSegundoPlano:
+    """
+    Clase EscritorEnSegundoPlano
+    Hilo que ejecuta `escribir` (una función sin argumentos que vuelca el
+    estado actual) cuando se le pide con programar(). Las peticiones que
+    llegan mientras espera o escribe se juntan en una sola escritura
+    posterior, de modo que una ráfaga de cambios cuesta una o dos escrituras.
+
+    Como la escritura ocurre después, sus errores no llegan al llamador: se
+    guardan en `error` y se informan por consola.
+    """
+
+    def __init__(self, escribir, espera=0.05):
+        self._escribir = escribir
+        self.espera = espera            # segundos para juntar peticiones
+        self.error = None
+        self._condicion = threading.Condition()
+        self._pendiente = False
+        self._escribiendo = False
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._bucle, name="escritor", daemon=True)
+        self._hilo.start()
+
+    def programar(self):
+        """Pide una escritura; vuelve de inmediato."""
+        with self._condicion:
+            self._pendiente = True
+            self._condicion.notify_all()
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not self._pendiente and not self._cerrado:
+                    self._condicion.wait()
+                if not self._pendiente:
+                    return                  # cerrado y sin nada pendiente
+            if not self._cerrado:
+                time.sleep(self.espera)     # deja que se junten más peticiones
+            with self._condicion:
+                self._pendiente = False
+                self._escribiendo = True
+            try:
+                self._escribir()
+                self.error = None
+            except Exception as e:
+                self.error = e
+                print(f"[ERROR] Falló la escritura en segundo plano: {e}")
+            with self._condicion:
+                self._escribiendo = False
+                self._condicion.notify_all()
+
+    def vaciar(self):
+        """Espera a que no quede ninguna escritura pendiente ni en curso."""
+        with self._condicion:
+            while self._pendiente or self._escribiendo:
+                self._condicion.wait()
+
+    def cerrar(self):
+        """Hace la última escritura pendiente y termina el hilo."""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
+        self._hilo.join()
@@ -0,0 +1,209 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Flujo de eventos de cambio del inventario. Cada alta, baja o actualización
+confirmada en un Semana9.Inventario o un inventario_archivo.Inventario se
+publica como un EventoCambio numerado (seq) a los suscriptores del mismo
+proceso y se añade a un archivo de eventos (una línea JSON por evento), del
+que otros programas leen con ConsumidorEventos desde el seq en que se
+quedaron, sin recargar el catálogo entero.
+"""
+
+import json
+import os
+import time
+
+ARCHIVO_EVENTOS = "inventario.eventos.jsonl"
+
+
+class EventoCambio:
+    """
+    Clase EventoCambio
+    Un cambio confirmado del inventario:
+
+      - seq:           número de evento, creciente y sin repetirse
+      - tipo:          "agregar", "eliminar" o "actualizar"
+      - id:            ID del producto
+      - antes/despues: (id, nombre, cantidad, precio), o None si el producto
+                       no existía antes / ya no existe después
+      - marca_tiempo:  segundos desde epoch (time.time())
+    """
+
+    __slots__ = ("seq", "tipo", "id", "antes", "despues", "marca_tiempo")
+
+    def __init__(self, seq, tipo, id, antes, despues, marca_tiempo):
+        self.seq = seq
+        self.tipo = tipo
+        self.id = id
+        self.antes = antes
+        self.despues = despues
+        self.marca_tiempo = marca_tiempo
+
+    def __repr__(self):
+        return (f"EventoCambio(seq={self.seq}, tipo={self.tipo!r}, id={self.id}, "
+                f"antes={self.antes}, despues={self.despues})")
+
+    def a_json(self):
+        return json.dumps({"seq": self.seq, "tipo": self.tipo, "id": self.id,
+                           "antes": self.antes, "despues": self.despues,
+                           "marca_tiempo": self.marca_tiempo})
+
+    @staticmethod
+    def desde_json(linea):
+        datos = json.loads(linea)
+        return EventoCambio(datos["seq"], datos["tipo"], datos["id"],
+                            None if datos["antes"] is None else tuple(datos["antes"]),
+                            None if datos["despues"] is None else tuple(datos["despues"]),
+                            datos["marca_tiempo"])
+
+
+# ═══════════════════════════════════════════════
+# Archivo de eventos
+# ═══════════════════════════════════════════════
+
+def _ultima_linea_completa(ruta):
+    """
+    Devuelve la última línea completa del archivo (o None) y recorta un
+    final a medio escribir, que un corte pudo dejar tras la última línea.
+    """
+    with open(ruta, "r+b") as f:
+        fin = f.seek(0, os.SEEK_END)
+        bloque = 4096
+        posicion = fin
+        datos = b""
+        while posicion > 0:
+            leer = min(bloque, posicion)
+            posicion -= leer
+            f.seek(posicion)
+            datos = f.read(leer) + datos
+            # Con dos saltos de línea la última línea completa ya está entera
+            if datos.count(b"\n") >= 2:
+                break
+        if not datos.endswith(b"\n"):
+            ultimo_salto = datos.rfind(b"\n")
+            f.truncate(posicion + ultimo_salto + 1)
+            datos = datos[:ultimo_salto + 1]
+        lineas = datos.splitlines()
+        return lineas[-1] if lineas else None
+
+
+def _posicion_tras(f, seq):
+    """
+    Posición en el archivo (abierto en binario) de la primera línea con un
+    seq mayor que `seq`. Los seq crecen a lo largo del archivo, así que se
+    busca por bisección sobre los bytes, leyendo unas pocas líneas.
+    """
+    def inicio_de_linea(posicion):
+        if posicion == 0:
+            return 0
+        f.seek(posicion - 1)
+        f.readline()
+        return f.tell()
+
+    def es_posterior(posicion):
+        f.seek(inicio_de_linea(posicion))
+        linea = f.readline()
+        return not linea.endswith(b"\n") or json.loads(linea)["seq"] > seq
+
+    bajo, alto = 0, f.seek(0, os.SEEK_END)
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        if es_posterior(medio):
+            alto = medio
+        else:
+            bajo = medio + 1
+    return inicio_de_linea(bajo)
+
+
+class PublicadorEventos:
+    """
+    Clase PublicadorEventos
+    Convierte los avisos de un inventario (agregar_observador) en eventos:
+    los añade al archivo y después llama a cada suscriptor con el evento.
+    Los seq continúan desde el último evento del archivo. Solo un publicador
+    debe escribir en cada archivo.
+
+        publicador = PublicadorEventos().seguir(inventario)
+        publicador.suscribir(lambda evento: print(evento))
+    """
+
+    def __init__(self, archivo=ARCHIVO_EVENTOS):
+        self.archivo = archivo
+        self.seq = 0
+        if os.path.exists(archivo):
+            ultima = _ultima_linea_completa(archivo)
+            if ultima is not None:
+                self.seq = json.loads(ultima)["seq"]
+        self._suscriptores = []
+        self._inventarios = []
+        self._salida = open(archivo, "ab")
+
+    def seguir(self, inventario):
+        """Publica los cambios de `inventario` a partir de ahora."""
+        inventario.agregar_observador(self._al_cambiar)
+        self._inventarios.append(inventario)
+        return self
+
+    def suscribir(self, funcion):
+        """Registra funcion(evento), llamada con cada evento ya escrito en el archivo."""
+        self._suscriptores.append(funcion)
+
+    def desuscribir(self, funcion):
+        self._suscriptores.remove(funcion)
+
+    def _al_cambiar(self, operacion, antes, despues):
+        self.seq += 1
+        evento = EventoCambio(self.seq, operacion, (antes or despues)[0], antes, despues,
+                              time.time())
+        self._salida.write((evento.a_json() + "\n").encode("utf-8"))
+        self._salida.flush()
+        for funcion in self._suscriptores:
+            funcion(evento)
+
+    def cerrar(self):
+        for inventario in self._inventarios:
+            inventario.quitar_observador(self._al_cambiar)
+        self._inventarios = []
+        self._salida.close()
+
+
+class ConsumidorEventos:
+    """
+    Clase ConsumidorEventos
+    Lee el archivo de eventos a partir de un seq. La primera lectura busca
+    la posición por bisección; las siguientes continúan donde quedó la
+    anterior, así que cada llamada a leer() solo procesa lo nuevo.
+
+        consumidor = ConsumidorEventos(desde=ultimo_seq_guardado)
+        for evento in consumidor.leer():
+            ...
+        ultimo_seq_guardado = consumidor.seq
+    """
+
+    def __init__(self, archivo=ARCHIVO_EVENTOS, desde=0):
+        self.archivo = archivo
+        self.seq = desde            # último seq entregado
+        self._posicion = None       # byte donde sigue la próxima lectura
+
+    def leer(self):
+        """Devuelve la lista de eventos nuevos (seq mayor que self.seq)."""
+        if not os.path.exists(self.archivo):
+            return []
+        eventos = []
+        with open(self.archivo, "rb") as f:
+            if self._posicion is None:
+                self._posicion = _posicion_tras(f, self.seq)
+            f.seek(self._posicion)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break               # el publicador aún no terminó de escribirla
+                self._posicion += len(linea)
+                evento = EventoCambio.desde_json(linea)
+                if evento.seq > self.seq:
+                    eventos.append(evento)
+                    self.seq = evento.seq
+        return eventos
+
+    def __iter__(self):
+        return iter(self.leer())
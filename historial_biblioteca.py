@@ -0,0 +1,376 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Historial de operaciones de la Biblioteca Digital. Cada operación es un
+EventoBiblioteca (tipo, marca de tiempo, ISBN y usuario afectados) que se
+guarda en un búfer circular de tamaño fijo, con índices por usuario y por
+ISBN para consultarlo, y que un hilo en segundo plano añade a un archivo de
+eventos (una línea JSON por evento) que rota al llegar a un tamaño máximo.
+El eco por consola de cada evento es opcional.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from escritura_atomica import EscritorEnSegundoPlano
+from eventos_inventario import _ultima_linea_completa
+
+ARCHIVO_HISTORIAL = "biblioteca.historial.jsonl"
+CAPACIDAD = 10_000                  # eventos que se conservan en memoria
+TAMANO_MAXIMO = 4 * 1024 * 1024     # bytes del archivo antes de rotarlo
+COPIAS = 3                          # archivos rotados que se conservan (.1, .2, ...)
+
+# Un solo codificador para todos los eventos (json.dumps con opciones crea uno por llamada)
+_codificar = json.JSONEncoder(ensure_ascii=False).encode
+
+TIPOS = ("libro_agregado", "libro_eliminado", "usuario_registrado",
+         "usuario_baja", "prestamo", "devolucion", "carga_masiva",
+         "prestamos_lote", "devoluciones_lote")
+
+
+class EventoBiblioteca:
+    """
+    Clase EventoBiblioteca
+    Una operación confirmada de la biblioteca:
+
+      - seq:           número de evento, creciente y sin repetirse
+      - tipo:          uno de TIPOS
+      - marca_tiempo:  segundos desde epoch; nunca menor que la del evento anterior
+      - detalle:       texto para mostrar ("Préstamo: '1984' → Ana García")
+      - isbn:          ISBN del libro afectado, o None
+      - id_usuario:    ID del usuario afectado, o None
+    """
+
+    __slots__ = ("seq", "tipo", "marca_tiempo", "detalle", "isbn", "id_usuario")
+
+    def __init__(self, seq, tipo, marca_tiempo, detalle, isbn=None, id_usuario=None):
+        self.seq = seq
+        self.tipo = tipo
+        self.marca_tiempo = marca_tiempo
+        self.detalle = detalle
+        self.isbn = isbn
+        self.id_usuario = id_usuario
+
+    def __str__(self):
+        return self.detalle
+
+    def __repr__(self):
+        return (f"EventoBiblioteca(seq={self.seq}, tipo={self.tipo!r}, "
+                f"isbn={self.isbn!r}, id_usuario={self.id_usuario!r})")
+
+    def a_json(self):
+        return _codificar({"seq": self.seq, "tipo": self.tipo,
+                           "marca_tiempo": self.marca_tiempo, "detalle": self.detalle,
+                           "isbn": self.isbn, "id_usuario": self.id_usuario})
+
+    @staticmethod
+    def desde_json(linea):
+        datos = json.loads(linea)
+        return EventoBiblioteca(datos["seq"], datos["tipo"], datos["marca_tiempo"],
+                                datos["detalle"], datos["isbn"], datos["id_usuario"])
+
+
+def _marca(evento):
+    return evento.marca_tiempo
+
+
+class HistorialBiblioteca:
+    """
+    Clase HistorialBiblioteca
+    Últimos `capacidad` eventos de la biblioteca, en memoria:
+
+      - _eventos (list):      búfer circular; el evento número i que entra en
+                              el búfer va en la posición i % capacidad
+      - _por_usuario (dict):  ID de usuario → _EventosDeClave con sus eventos en el búfer
+      - _por_isbn (dict):     ISBN → _EventosDeClave con sus eventos en el búfer
+
+    Al llenarse el búfer, cada evento nuevo reemplaza al más antiguo, que
+    también es el primero de sus listas de eventos, así que la memoria no crece con el
+    uso. Los eventos están en orden de tiempo, de modo que un rango de fechas
+    se ubica por bisección.
+
+    Con `archivo`, cada evento se añade además a ese archivo desde un
+    EscritorEnSegundoPlano: registrar() solo lo deja en una lista de
+    pendientes. Cuando el archivo supera `tamano_maximo` bytes pasa a
+    archivo.1 (el .1 a .2, etc.) y se conservan `copias` archivos rotados.
+    Los seq continúan desde el último evento guardado. Con eco=True cada
+    evento se imprime al registrarse.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD, archivo=None, eco=False,
+                 tamano_maximo=TAMANO_MAXIMO, copias=COPIAS):
+        if capacidad < 1:
+            raise ValueError("La capacidad del historial debe ser al menos 1.")
+        self.capacidad = capacidad
+        self.archivo = archivo
+        self.eco = eco
+        self.tamano_maximo = tamano_maximo
+        self.copias = copias
+        self.seq = 0
+        self._eventos = [None] * capacidad
+        self._total = 0                         # eventos que han entrado en el búfer
+        self._por_usuario = {}
+        self._por_isbn = {}
+        self._ultima_marca = 0.0
+        self._pendientes = []
+        self._cerrojo = threading.Lock()
+        self._escritor = None
+        if archivo is not None:
+            self.seq = self._ultimo_seq_guardado()
+            self._salida = open(archivo, "ab")
+            self._escritor = EscritorEnSegundoPlano(self._volcar)
+
+    def __len__(self):
+        return min(self._total, self.capacidad)
+
+    def __iter__(self):
+        """Eventos en memoria, del más antiguo al más reciente."""
+        eventos, capacidad = self._eventos, self.capacidad
+        for i in range(self._total - len(self), self._total):
+            yield eventos[i % capacidad]
+
+    # ─────────────────────────────
+    # Registro
+    # ─────────────────────────────
+
+    def registrar(self, tipo, detalle, isbn=None, id_usuario=None):
+        """Añade un evento y lo devuelve."""
+        return self.confirmar(self.preparar(tipo, detalle, isbn, id_usuario))
+
+    def preparar(self, tipo, detalle, isbn=None, id_usuario=None):
+        """
+        Crea el evento siguiente sin añadirlo, para guardarlo antes en otro
+        sitio (la base de persistencia_biblioteca). Si eso falla, basta con
+        no confirmarlo: el historial no cambia.
+        """
+        marca = time.time()
+        if marca < self._ultima_marca:
+            marca = self._ultima_marca          # el reloj retrocedió: se mantiene el orden
+        return EventoBiblioteca(self.seq + 1, tipo, marca, detalle, isbn, id_usuario)
+
+    def confirmar(self, evento):
+        """Añade el último evento de preparar() y lo devuelve."""
+        self.seq = evento.seq
+        self._ultima_marca = evento.marca_tiempo
+        self._poner(evento)
+
+        if self._escritor is not None:
+            with self._cerrojo:
+                # Con pendientes ya se pidió una escritura, salvo que la última fallara
+                avisar = not self._pendientes or self._escritor.error is not None
+                self._pendientes.append(evento)
+            if avisar:
+                self._escritor.programar()
+        if self.eco:
+            print(f"  ✔ {evento.detalle}")
+        return evento
+
+    def reanudar(self, eventos):
+        """
+        Pone en el búfer, del más antiguo al más reciente, eventos guardados
+        en otro sitio (la base de persistencia_biblioteca) y sigue numerando
+        tras el último. No los imprime ni los escribe en el archivo. Solo
+        con el búfer vacío.
+        """
+        if self._total:
+            raise ValueError("Solo se puede reanudar un historial vacío.")
+        for evento in eventos:
+            if evento.seq > self.seq:
+                self.seq = evento.seq
+                self._ultima_marca = max(self._ultima_marca, evento.marca_tiempo)
+                self._poner(evento)
+
+    def _poner(self, evento):
+        posicion = self._total % self.capacidad
+        anterior = self._eventos[posicion]
+        if anterior is not None:
+            self._olvidar(anterior)
+        self._eventos[posicion] = evento
+        self._total += 1
+        if evento.id_usuario is not None:
+            _anotar(self._por_usuario, evento.id_usuario, evento)
+        if evento.isbn is not None:
+            _anotar(self._por_isbn, evento.isbn, evento)
+
+    def _olvidar(self, evento):
+        """Quita de los índices el evento que sale del búfer (el más antiguo)."""
+        if evento.id_usuario is not None:
+            _desanotar(self._por_usuario, evento.id_usuario)
+        if evento.isbn is not None:
+            _desanotar(self._por_isbn, evento.isbn)
+
+    # ─────────────────────────────
+    # Consultas
+    # ─────────────────────────────
+
+    def consultar(self, desde=None, hasta=None, id_usuario=None, isbn=None, tipo=None):
+        """
+        Eventos en memoria con marca de tiempo en [desde, hasta] (extremos
+        opcionales) y, si se dan, del usuario, del ISBN y del tipo pedidos,
+        del más antiguo al más reciente.
+        """
+        if id_usuario is not None or isbn is not None:
+            # Se parte de la lista más corta y se filtra por el resto
+            candidatos = []
+            for indice, clave in ((self._por_usuario, id_usuario), (self._por_isbn, isbn)):
+                if clave is not None:
+                    eventos = indice.get(clave)
+                    if eventos is None:
+                        return []
+                    candidatos.append(eventos)
+            eventos = min(candidatos, key=len).rango(desde, hasta)
+        else:
+            eventos = self._rango(desde, hasta)
+        return [e for e in eventos
+                if (id_usuario is None or e.id_usuario == id_usuario)
+                and (isbn is None or e.isbn == isbn)
+                and (tipo is None or e.tipo == tipo)]
+
+    def _rango(self, desde, hasta):
+        """Eventos del búfer con marca de tiempo en [desde, hasta], por bisección."""
+        eventos, capacidad = self._eventos, self.capacidad
+        primero = self._total - len(self)
+
+        def buscar(condicion):
+            # Primer evento (número i) que cumple `condicion` (monótona en el tiempo)
+            bajo, alto = primero, self._total
+            while bajo < alto:
+                medio = (bajo + alto) // 2
+                if condicion(eventos[medio % capacidad].marca_tiempo):
+                    alto = medio
+                else:
+                    bajo = medio + 1
+            return bajo
+
+        inicio = primero if desde is None else buscar(lambda t: t >= desde)
+        fin = self._total if hasta is None else buscar(lambda t: t > hasta)
+        return [eventos[i % capacidad] for i in range(inicio, fin)]
+
+    # ─────────────────────────────
+    # Archivo de eventos
+    # ─────────────────────────────
+
+    def _rotados(self):
+        """Rutas de los archivos rotados, del más reciente (.1) al más antiguo."""
+        return [f"{self.archivo}.{i}" for i in range(1, self.copias + 1)]
+
+    def _ultimo_seq_guardado(self):
+        for ruta in [self.archivo] + self._rotados():
+            if os.path.exists(ruta):
+                ultima = _ultima_linea_completa(ruta)
+                if ultima is not None:
+                    return json.loads(ultima)["seq"]
+        return 0
+
+    def _volcar(self):
+        """Escribe los eventos pendientes (en el hilo del escritor)."""
+        with self._cerrojo:
+            eventos, self._pendientes = self._pendientes, []
+        if not eventos:
+            return
+        try:
+            datos = "".join(e.a_json() + "\n" for e in eventos).encode("utf-8")
+            escritos = self._salida.tell()
+            if escritos and escritos + len(datos) > self.tamano_maximo:
+                self._rotar()
+            self._salida.write(datos)
+            self._salida.flush()
+        except OSError:
+            # Se reintentan en la próxima escritura, antes que los nuevos
+            with self._cerrojo:
+                self._pendientes[:0] = eventos
+            raise
+
+    def _rotar(self):
+        self._salida.close()
+        rotados = self._rotados()
+        if rotados:
+            for anterior, siguiente in zip(reversed(rotados[:-1]), reversed(rotados[1:])):
+                if os.path.exists(anterior):
+                    os.replace(anterior, siguiente)
+            os.replace(self.archivo, rotados[0])
+            self._salida = open(self.archivo, "ab")
+        else:
+            self._salida = open(self.archivo, "wb")
+
+    def vaciar(self):
+        """Espera a que todos los eventos registrados estén en el archivo."""
+        if self._escritor is not None:
+            self._escritor.vaciar()
+
+    def guardados(self):
+        """
+        Genera los eventos del archivo y de sus copias rotadas, del más
+        antiguo al más reciente (incluye los que ya salieron del búfer).
+        """
+        if self.archivo is None:
+            return
+        self.vaciar()
+        for ruta in list(reversed(self._rotados())) + [self.archivo]:
+            if not os.path.exists(ruta):
+                continue
+            with open(ruta, "rb") as f:
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break               # final a medio escribir
+                    yield EventoBiblioteca.desde_json(linea)
+
+    def cerrar(self):
+        """Escribe los eventos pendientes y cierra el archivo."""
+        if self._escritor is not None:
+            self._escritor.cerrar()
+            self._escritor = None
+            self._salida.close()
+
+
+class _EventosDeClave:
+    """
+    Eventos de un usuario o de un ISBN que siguen en el búfer, del más
+    antiguo al más reciente. Es una lista cuyas primeras `inicio` posiciones
+    ya salieron del búfer: quitar el más antiguo es O(1) (amortizado) y,
+    a diferencia de un deque, acceder por posición también, así que un rango
+    de fechas se ubica por bisección en O(log n).
+    """
+
+    __slots__ = ("lista", "inicio")
+
+    def __init__(self, evento):
+        self.lista = [evento]
+        self.inicio = 0
+
+    def __len__(self):
+        return len(self.lista) - self.inicio
+
+    def quitar_primero(self):
+        self.inicio += 1
+        if self.inicio * 2 >= len(self.lista):
+            # Se recortan los olvidados cuando son la mitad: cada evento se mueve O(1) veces
+            del self.lista[:self.inicio]
+            self.inicio = 0
+
+    def rango(self, desde, hasta):
+        """Eventos con marca de tiempo en [desde, hasta] (extremos opcionales)."""
+        lista = self.lista
+        inicio = self.inicio if desde is None else bisect_left(lista, desde, self.inicio,
+                                                               key=_marca)
+        fin = len(lista) if hasta is None else bisect_right(lista, hasta, inicio, key=_marca)
+        return lista[inicio:fin]
+
+
+def _anotar(indice, clave, evento):
+    eventos = indice.get(clave)
+    if eventos is None:
+        indice[clave] = _EventosDeClave(evento)
+    else:
+        eventos.lista.append(evento)
+
+
+def _desanotar(indice, clave):
+    eventos = indice[clave]
+    eventos.quitar_primero()
+    if not eventos:
+        del indice[clave]
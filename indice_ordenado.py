@@ -0,0 +1,245 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Índices ordenados para listar el inventario por páginas sin ordenar todo el
+catálogo en cada consulta: una lista ordenada por cubetas (ListaOrdenada) y
+un índice con una de ellas por cada criterio de orden (IndiceOrdenado).
+"""
+
+from bisect import bisect_left, insort
+
+from indice_texto import normalizar
+
+CARGA = 512             # elementos por cubeta; una cubeta se parte al doblarlo
+
+# Clave de ordenación de una fila (id, nombre, cantidad, precio) para cada
+# criterio. El ID desempata, así que dos filas nunca tienen la misma clave.
+ORDENES = {
+    "id": lambda id, nombre, cantidad, precio: id,
+    "nombre": lambda id, nombre, cantidad, precio: (normalizar(nombre), id),
+    "cantidad": lambda id, nombre, cantidad, precio: (cantidad, id),
+    "precio": lambda id, nombre, cantidad, precio: (precio, id),
+}
+
+
+class ListaOrdenada:
+    """
+    Clase ListaOrdenada
+    Lista siempre ordenada, repartida en cubetas de hasta 2 × CARGA elementos:
+
+      - _cubetas:  listas ordenadas y consecutivas
+      - _maximos:  último elemento de cada cubeta, para elegir cubeta con bisect
+      - _arbol:    árbol de Fenwick con el tamaño de cada cubeta, para llegar
+                   a la posición i sin recorrer las cubetas anteriores
+
+    Insertar o quitar cuesta O(log n + CARGA) y leer k elementos a partir de
+    una posición, O(log n + k).
+    """
+
+    def __init__(self, valores=()):
+        valores = sorted(valores)
+        self._cubetas = [valores[i:i + CARGA] for i in range(0, len(valores), CARGA)]
+        self._maximos = [cubeta[-1] for cubeta in self._cubetas]
+        self._largo = len(valores)
+        self._reconstruir_arbol()
+
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        for cubeta in self._cubetas:
+            yield from cubeta
+
+    def __contains__(self, valor):
+        i = bisect_left(self._maximos, valor)
+        if i == len(self._maximos):
+            return False
+        cubeta = self._cubetas[i]
+        j = bisect_left(cubeta, valor)
+        return cubeta[j] == valor
+
+    def __getitem__(self, posicion):
+        if posicion < 0:
+            posicion += self._largo
+        if not 0 <= posicion < self._largo:
+            raise IndexError("posición fuera de la lista")
+        i, j = self._ubicar(posicion)
+        return self._cubetas[i][j]
+
+    # ─────────────────────────────
+    # Árbol de Fenwick sobre los tamaños de las cubetas
+    # ─────────────────────────────
+
+    def _reconstruir_arbol(self):
+        arbol = [0] + [len(cubeta) for cubeta in self._cubetas]
+        for i in range(1, len(arbol)):
+            padre = i + (i & -i)
+            if padre < len(arbol):
+                arbol[padre] += arbol[i]
+        self._arbol = arbol
+
+    def _sumar(self, cubeta, diferencia):
+        arbol = self._arbol
+        i = cubeta + 1
+        while i < len(arbol):
+            arbol[i] += diferencia
+            i += i & -i
+
+    def _anteriores(self, cubeta):
+        """Elementos en las cubetas anteriores a `cubeta`."""
+        arbol = self._arbol
+        total = 0
+        while cubeta > 0:
+            total += arbol[cubeta]
+            cubeta -= cubeta & -cubeta
+        return total
+
+    def _ubicar(self, posicion):
+        """(cubeta, posición dentro de ella) del elemento número `posicion`."""
+        arbol = self._arbol
+        i = 0
+        paso = 1 << (len(arbol) - 1).bit_length()
+        while paso:
+            siguiente = i + paso
+            if siguiente < len(arbol) and arbol[siguiente] <= posicion:
+                i = siguiente
+                posicion -= arbol[siguiente]
+            paso >>= 1
+        return i, posicion
+
+    # ─────────────────────────────
+    # Cambios
+    # ─────────────────────────────
+
+    def agregar(self, valor):
+        if not self._cubetas:
+            self._cubetas.append([valor])
+            self._maximos.append(valor)
+            self._largo = 1
+            self._reconstruir_arbol()
+            return
+        i = bisect_left(self._maximos, valor)
+        if i == len(self._maximos):
+            i -= 1                  # mayor que todos: va al final de la última cubeta
+        cubeta = self._cubetas[i]
+        insort(cubeta, valor)
+        self._maximos[i] = cubeta[-1]
+        self._largo += 1
+        if len(cubeta) > 2 * CARGA:
+            self._cubetas[i:i + 1] = [cubeta[:CARGA], cubeta[CARGA:]]
+            self._maximos[i:i + 1] = [cubeta[CARGA - 1], cubeta[-1]]
+            self._reconstruir_arbol()
+        else:
+            self._sumar(i, 1)
+
+    def quitar(self, valor):
+        """Quita el valor; lanza ValueError si no está."""
+        i = bisect_left(self._maximos, valor)
+        if i < len(self._maximos):
+            cubeta = self._cubetas[i]
+            j = bisect_left(cubeta, valor)
+            if cubeta[j] == valor:
+                del cubeta[j]
+                self._largo -= 1
+                if cubeta:
+                    self._maximos[i] = cubeta[-1]
+                    self._sumar(i, -1)
+                else:
+                    del self._cubetas[i]
+                    del self._maximos[i]
+                    self._reconstruir_arbol()
+                return
+        raise ValueError(f"{valor!r} no está en la lista")
+
+    # ─────────────────────────────
+    # Lectura por tramos
+    # ─────────────────────────────
+
+    def posicion(self, valor):
+        """Cuántos elementos son menores que `valor` (esté o no en la lista)."""
+        i = bisect_left(self._maximos, valor)
+        if i == len(self._maximos):
+            return self._largo
+        return self._anteriores(i) + bisect_left(self._cubetas[i], valor)
+
+    def tramo(self, inicio, fin):
+        """Elementos de las posiciones [inicio, fin), como lista."""
+        inicio = max(0, inicio)
+        fin = min(fin, self._largo)
+        if inicio >= fin:
+            return []
+        i, j = self._ubicar(inicio)
+        resultado = []
+        faltan = fin - inicio
+        while faltan > 0:
+            trozo = self._cubetas[i][j:j + faltan]
+            resultado += trozo
+            faltan -= len(trozo)
+            i += 1
+            j = 0
+        return resultado
+
+
+class IndiceOrdenado:
+    """
+    Clase IndiceOrdenado
+    Una ListaOrdenada por criterio de ORDENES, creada la primera vez que se
+    lista por ese criterio a partir de recorrer() (una función que devuelve
+    las filas (id, nombre, cantidad, precio) actuales) y mantenida después
+    con agregar/quitar/cambiar.
+    """
+
+    def __init__(self, recorrer):
+        self._recorrer = recorrer
+        self._listas = {}
+
+    def _lista(self, orden):
+        lista = self._listas.get(orden)
+        if lista is None:
+            if orden not in ORDENES:
+                raise ValueError(f"Orden desconocido: '{orden}' (use {', '.join(ORDENES)})")
+            clave = ORDENES[orden]
+            lista = self._listas[orden] = ListaOrdenada(clave(*f) for f in self._recorrer())
+        return lista
+
+    def agregar(self, fila):
+        for orden, lista in self._listas.items():
+            lista.agregar(ORDENES[orden](*fila))
+
+    def quitar(self, fila):
+        for orden, lista in self._listas.items():
+            lista.quitar(ORDENES[orden](*fila))
+
+    def cambiar(self, antes, despues):
+        for orden, lista in self._listas.items():
+            clave = ORDENES[orden]
+            anterior, nueva = clave(*antes), clave(*despues)
+            if anterior != nueva:
+                lista.quitar(anterior)
+                lista.agregar(nueva)
+
+    def ids(self, orden="id", offset=0, limite=None, descendente=False, despues=None):
+        """
+        IDs de la página pedida: `limite` filas (todas si es None) tras saltar
+        `offset`. Con `despues` (la última fila de la página anterior) el
+        offset cuenta desde esa fila, que se ubica por bisección.
+        """
+        lista = self._lista(orden)
+        total = len(lista)
+        if despues is not None:
+            clave = ORDENES[orden](*despues)
+            anteriores = lista.posicion(clave)
+            if descendente:
+                offset += total - anteriores
+            else:
+                offset += anteriores + (clave in lista)
+        fin = total if limite is None else offset + limite
+        if descendente:
+            claves = lista.tramo(total - fin, total - offset)
+            claves.reverse()
+        else:
+            claves = lista.tramo(offset, fin)
+        if orden == "id":
+            return claves
+        return [clave[-1] for clave in claves]
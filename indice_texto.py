@@ -0,0 +1,489 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Índices de texto para búsquedas por nombre: normalización (minúsculas y sin
+tildes), índice invertido de trigramas para búsquedas por subcadena, índice
+de palabras (árbol de prefijos) para autocompletar y tolerar errores de
+escritura, e índice invertido con puntuación BM25 para ordenar por
+relevancia búsquedas de varias palabras y frases.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import deque
+
+_PALABRA = re.compile(r"\w+")
+# Tildes y demás marcas del bloque de diacríticos combinables (U+034F no es una marca)
+_DIACRITICOS = re.compile("[\u0300-\u034e\u0350-\u036f]")
+_FIN = ""               # clave del nodo del árbol que guarda la palabra terminada en él
+_FRASE = re.compile(r'"([^"]*)"')
+_SEPARADOR = "|"        # entre dos campos de un texto; \w+ nunca produce esta palabra
+
+
+def normalizar(texto):
+    """Pasa a minúsculas y quita tildes/diacríticos: 'Café Ñandú' → 'cafe nandu'."""
+    if texto.isascii():
+        return texto.lower()
+    descompuesto = _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto.casefold()))
+    if descompuesto.isascii():
+        return descompuesto
+    # Otras escrituras: se revisa carácter a carácter
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    """Palabras de un texto ya normalizado: 'cien anos, de soledad' → ['cien', 'anos', ...]."""
+    return _PALABRA.findall(texto)
+
+
+def trigramas(texto):
+    """Conjunto de subcadenas de 3 caracteres de un texto ya normalizado."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceTrigramas:
+    """
+    Clase IndiceTrigramas
+    Índice invertido trigrama → claves para buscar por subcadena.
+
+      - textos (dict):  clave → texto normalizado
+      - listas (dict):  trigrama → conjunto de claves que lo contienen
+
+    Una consulta de 3 o más caracteres solo revisa las claves que contienen
+    todos sus trigramas (intersección empezando por la lista más corta) y
+    después confirma la subcadena. Las consultas más cortas recorren los
+    textos ya normalizados.
+    """
+
+    def __init__(self):
+        self.textos = {}
+        self.listas = {}
+
+    def __len__(self):
+        return len(self.textos)
+
+    def agregar(self, clave, texto):
+        if clave in self.textos:
+            self.quitar(clave)
+        normalizado = normalizar(texto)
+        self.textos[clave] = normalizado
+        listas = self.listas
+        for t in trigramas(normalizado):
+            lista = listas.get(t)
+            if lista is None:
+                listas[t] = {clave}
+            else:
+                lista.add(clave)
+
+    def quitar(self, clave):
+        normalizado = self.textos.pop(clave, None)
+        if normalizado is None:
+            return
+        for t in trigramas(normalizado):
+            lista = self.listas[t]
+            lista.discard(clave)
+            if not lista:
+                del self.listas[t]
+
+    def buscar(self, consulta):
+        """Claves cuyo texto contiene la consulta (sin distinguir mayúsculas ni tildes)."""
+        consulta = normalizar(consulta)
+        if len(consulta) < 3:
+            return {c for c, texto in self.textos.items() if consulta in texto}
+
+        listas = []
+        for t in trigramas(consulta):
+            lista = self.listas.get(t)
+            if lista is None:
+                return set()
+            listas.append(lista)
+        listas.sort(key=len)
+
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            candidatos = candidatos & lista
+            if not candidatos:
+                return set()
+        if len(consulta) == 3:
+            return set(candidatos)
+        textos = self.textos
+        return {c for c in candidatos if consulta in textos[c]}
+
+
+def errores_tolerados(palabra):
+    """Errores de escritura admitidos por defecto según el largo de la palabra."""
+    if len(palabra) <= 3:
+        return 0
+    return 1 if len(palabra) <= 7 else 2
+
+
+class IndicePalabras:
+    """
+    Clase IndicePalabras
+    Índice de las palabras (normalizadas) de un texto por clave:
+
+      - textos (dict):   clave → tupla de palabras del texto
+      - listas (dict):   palabra → conjunto de claves que la contienen
+      - _raiz (dict):    árbol de prefijos del vocabulario; cada nodo es un
+                         dict letra → nodo, y el nodo donde termina una
+                         palabra la guarda además bajo la clave _FIN
+
+    El árbol solo contiene el vocabulario (cada palabra distinta una vez),
+    así que su tamaño no crece con el número de claves. Permite recorrer las
+    palabras que empiezan por un prefijo (autocompletar) y las que están a
+    pocas ediciones de una dada (distancia de Levenshtein), descartando
+    ramas enteras en cuanto superan el máximo de errores.
+    """
+
+    def __init__(self):
+        self.textos = {}
+        self.listas = {}
+        self._raiz = {}
+
+    def __len__(self):
+        return len(self.textos)
+
+    # ─────────────────────────────
+    # Altas y bajas
+    # ─────────────────────────────
+
+    def agregar(self, clave, texto):
+        if clave in self.textos:
+            self.quitar(clave)
+        lista_palabras = tuple(palabras(normalizar(texto)))
+        self.textos[clave] = lista_palabras
+        listas = self.listas
+        for palabra in set(lista_palabras):
+            lista = listas.get(palabra)
+            if lista is None:
+                listas[palabra] = {clave}
+                self._agregar_palabra(palabra)
+            else:
+                lista.add(clave)
+
+    def quitar(self, clave):
+        lista_palabras = self.textos.pop(clave, None)
+        if lista_palabras is None:
+            return
+        for palabra in set(lista_palabras):
+            lista = self.listas[palabra]
+            lista.discard(clave)
+            if not lista:
+                del self.listas[palabra]
+                self._quitar_palabra(palabra)
+
+    def _agregar_palabra(self, palabra):
+        nodo = self._raiz
+        for letra in palabra:
+            nodo = nodo.setdefault(letra, {})
+        nodo[_FIN] = palabra
+
+    def _quitar_palabra(self, palabra):
+        # Se guarda el camino para podar los nodos que queden vacíos
+        camino = [self._raiz]
+        for letra in palabra:
+            camino.append(camino[-1][letra])
+        del camino[-1][_FIN]
+        for i in range(len(palabra), 0, -1):
+            if camino[i]:
+                break
+            del camino[i - 1][palabra[i - 1]]
+
+    # ─────────────────────────────
+    # Vocabulario
+    # ─────────────────────────────
+
+    def con_prefijo(self, prefijo):
+        """
+        Genera las palabras del vocabulario que empiezan por `prefijo`
+        (ya normalizado), de la más corta a la más larga y, a igual largo,
+        en orden alfabético.
+        """
+        nodo = self._raiz
+        for letra in prefijo:
+            nodo = nodo.get(letra)
+            if nodo is None:
+                return
+        nivel = deque([nodo])
+        while nivel:
+            siguiente = deque()
+            for nodo in nivel:
+                if _FIN in nodo:
+                    yield nodo[_FIN]
+                for letra in sorted(nodo):
+                    if letra != _FIN:
+                        siguiente.append(nodo[letra])
+            nivel = siguiente
+
+    def aproximadas(self, palabra, max_errores):
+        """
+        Palabras del vocabulario a distancia de edición ≤ max_errores de
+        `palabra` (ya normalizada), como dict palabra → distancia.
+
+        Recorre el árbol calculando una fila de la tabla de Levenshtein por
+        nodo (la fila del padre más una letra); si el mínimo de la fila ya
+        supera max_errores, ninguna palabra de esa rama puede servir.
+        """
+        resultados = {}
+        largo = len(palabra)
+        pila = [(self._raiz, list(range(largo + 1)))]
+        while pila:
+            nodo, anterior = pila.pop()
+            for letra, hijo in nodo.items():
+                if letra == _FIN:
+                    continue
+                fila = [anterior[0] + 1]
+                for i in range(1, largo + 1):
+                    fila.append(min(fila[i - 1] + 1, anterior[i] + 1,
+                                    anterior[i - 1] + (palabra[i - 1] != letra)))
+                if _FIN in hijo and fila[largo] <= max_errores:
+                    resultados[hijo[_FIN]] = fila[largo]
+                if min(fila) <= max_errores:
+                    pila.append((hijo, fila))
+        return resultados
+
+    # ─────────────────────────────
+    # Consultas
+    # ─────────────────────────────
+
+    def _con_todas(self, lista_palabras):
+        """Claves que contienen todas las palabras dadas (None si la lista está vacía)."""
+        candidatos = None
+        for lista in sorted((self.listas.get(p, ()) for p in lista_palabras), key=len):
+            candidatos = set(lista) if candidatos is None else candidatos & lista
+            if not candidatos:
+                return set()
+        return candidatos
+
+    def completar(self, consulta, limite=10):
+        """
+        Hasta `limite` claves cuyo texto contiene todas las palabras de la
+        consulta, la última como prefijo ('cien añ' → 'Cien años de soledad').
+        Primero las que completan la última palabra con la palabra más corta;
+        a igualdad, por orden alfabético del texto. Se detiene en cuanto
+        reúne `limite` claves, sin recorrer todas las palabras del prefijo.
+        """
+        consulta = palabras(normalizar(consulta))
+        if not consulta:
+            return []
+        *completas, prefijo = consulta
+        filtro = self._con_todas(completas)
+        if filtro is not None and not filtro:
+            return []
+        resultados = []
+        vistos = set()
+        textos = self.textos
+        for palabra in self.con_prefijo(prefijo):
+            claves = self.listas[palabra]
+            if filtro is not None:
+                claves = claves & filtro
+            nuevas = [c for c in claves if c not in vistos]
+            faltan = limite - len(resultados)
+            mejores = heapq.nsmallest(faltan, nuevas, key=textos.__getitem__)
+            resultados += mejores
+            vistos.update(mejores)
+            if len(resultados) >= limite:
+                break
+        return resultados
+
+    def buscar_aproximado(self, consulta, max_errores=None, limite=20):
+        """
+        Claves cuyo texto tiene, para cada palabra de la consulta, alguna
+        palabra a distancia ≤ max_errores (por defecto, errores_tolerados()
+        de cada palabra). Devuelve hasta `limite` pares (clave, errores),
+        de menos a más errores y después por orden alfabético del texto.
+        """
+        consulta = palabras(normalizar(consulta))
+        if not consulta:
+            return []
+        listas = self.listas
+        # Por cada palabra de la consulta, sus parecidas (palabra → distancia)
+        # y cuántas claves suman; se empieza por la palabra más selectiva
+        parecidas = []
+        for palabra in consulta:
+            maximo = errores_tolerados(palabra) if max_errores is None else max_errores
+            similares = self.aproximadas(palabra, maximo)
+            if not similares:
+                return []
+            parecidas.append((sum(len(listas[p]) for p in similares), similares))
+        parecidas.sort(key=lambda par: par[0])
+
+        errores = None          # clave → suma de la menor distancia por palabra
+        for total, similares in parecidas:
+            por_distancia = sorted(similares.items(), key=lambda par: par[1])
+            if errores is not None and len(errores) * len(similares) < total:
+                # Pocos candidatos: se comprueba cada uno en vez de recorrer las listas
+                siguientes = {}
+                for clave, suma in errores.items():
+                    for similar, distancia in por_distancia:
+                        if clave in listas[similar]:
+                            siguientes[clave] = suma + distancia
+                            break
+                errores = siguientes
+            else:
+                mejor = {}
+                for similar, distancia in reversed(por_distancia):
+                    for clave in listas[similar]:
+                        mejor[clave] = distancia        # la menor distancia queda al final
+                if errores is None:
+                    errores = mejor
+                else:
+                    errores = {c: d + mejor[c] for c, d in errores.items() if c in mejor}
+            if not errores:
+                return []
+        textos = self.textos
+        mejores = heapq.nsmallest(limite, errores.items(),
+                                  key=lambda par: (par[1], textos[par[0]]))
+        return mejores
+
+
+def _contiene(texto, frase):
+    """True si la tupla de palabras `texto` tiene las de `frase` seguidas."""
+    largo = len(frase)
+    primera = frase[0]
+    for i in range(len(texto) - largo + 1):
+        if texto[i] == primera and texto[i:i + largo] == frase:
+            return True
+    return False
+
+
+def _largo(texto):
+    """Palabras de un texto indexado, sin contar los separadores de campo."""
+    return len(texto) - texto.count(_SEPARADOR)
+
+
+class IndiceBM25:
+    """
+    Clase IndiceBM25
+    Índice invertido para buscar por relevancia en varios campos de texto
+    por clave (título, autor, categoría...):
+
+      - textos (dict):  clave → tupla de palabras normalizadas de todos los
+                        campos, con _SEPARADOR entre uno y otro
+      - listas (dict):  palabra → conjunto de claves que la contienen
+      - _palabras (int): total de palabras indexadas, para el largo medio
+
+    Cada palabra de la consulta suma a los textos que la contienen su
+    puntuación BM25: más si la palabra es rara en el índice (idf), si se
+    repite en el texto y si el texto es corto. Las repeticiones no se
+    guardan: se cuentan al puntuar en la tupla de cada candidato, que es
+    corta. Con el separador, una frase nunca coincide a caballo entre dos
+    campos.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1            # cuánto pesan las repeticiones de una palabra
+        self.b = b              # cuánto penaliza el largo del texto (0 a 1)
+        self.textos = {}
+        self.listas = {}
+        self._palabras = 0
+
+    def __len__(self):
+        return len(self.textos)
+
+    def agregar(self, clave, *campos):
+        if clave in self.textos:
+            self.quitar(clave)
+        texto = []
+        for campo in campos:
+            if texto:
+                texto.append(_SEPARADOR)
+            texto += palabras(normalizar(campo))
+        texto = tuple(texto)
+        self.textos[clave] = texto
+        self._palabras += _largo(texto)
+        listas = self.listas
+        for palabra in set(texto):
+            if palabra == _SEPARADOR:
+                continue
+            lista = listas.get(palabra)
+            if lista is None:
+                listas[palabra] = {clave}
+            else:
+                lista.add(clave)
+
+    def quitar(self, clave):
+        texto = self.textos.pop(clave, None)
+        if texto is None:
+            return
+        self._palabras -= _largo(texto)
+        for palabra in set(texto):
+            if palabra == _SEPARADOR:
+                continue
+            lista = self.listas[palabra]
+            lista.discard(clave)
+            if not lista:
+                del self.listas[palabra]
+
+    def _con_frase(self, frase):
+        """Claves cuyo texto contiene la frase (tupla de palabras)."""
+        candidatos = None
+        for lista in sorted((self.listas.get(p, ()) for p in set(frase)), key=len):
+            candidatos = set(lista) if candidatos is None else candidatos & lista
+            if not candidatos:
+                return set()
+        if len(frase) == 1:
+            return candidatos
+        textos = self.textos
+        return {c for c in candidatos if _contiene(textos[c], frase)}
+
+    def buscar(self, consulta, limite=20):
+        """
+        Hasta `limite` pares (clave, puntuación) de los textos con alguna
+        palabra de la consulta, de mayor a menor puntuación (a igualdad,
+        por clave). Lo que va entre comillas es una frase: entonces solo
+        valen los textos que tienen esas palabras seguidas, en ese orden.
+        Sin distinguir mayúsculas ni tildes ('Márquez' = 'marquez').
+        """
+        terminos = set(palabras(normalizar(consulta)))
+        if not terminos or not self._palabras:
+            # Sin palabras indexadas (o solo textos sin ellas) nada puede coincidir
+            return []
+        obligatorios = None
+        for frase in _FRASE.findall(consulta):
+            frase = tuple(palabras(normalizar(frase)))
+            if not frase:
+                continue
+            con_frase = self._con_frase(frase)
+            obligatorios = con_frase if obligatorios is None else obligatorios & con_frase
+            if not obligatorios:
+                return []
+
+        total = len(self.textos)
+        k1, b = self.k1, self.b
+        # Parte de la normalización por largo que no depende del texto
+        fijo, por_palabra = k1 * (1 - b), k1 * b * total / self._palabras
+        listas, textos = self.listas, self.textos
+        terminos_con_lista = []
+        for termino in terminos:
+            lista = listas.get(termino)
+            if lista is None:
+                continue
+            if obligatorios is not None:
+                lista = lista & obligatorios if len(lista) < len(obligatorios) \
+                    else obligatorios & lista
+            idf = math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+            terminos_con_lista.append((idf, termino, lista))
+        # De la palabra más rara a la más común. Una palabra suma menos de
+        # idf * (k1 + 1) a cada texto, así que cuando lo que pueden sumar las
+        # que faltan (cota) no alcanza al último de los `limite` mejores, un
+        # texto que aún no tiene puntos ya no puede entrar y las palabras
+        # comunes solo se miran en los candidatos (poda MaxScore)
+        terminos_con_lista.sort(key=lambda t: -t[0])
+        cota = sum(idf for idf, _, _ in terminos_con_lista) * (k1 + 1)
+        puntos = {}
+        for idf, termino, lista in terminos_con_lista:
+            if (len(puntos) >= limite and len(puntos) < len(lista)
+                    and cota < heapq.nlargest(limite, puntos.values())[-1]):
+                lista = [c for c in puntos if c in lista]
+            for clave in lista:
+                texto = textos[clave]
+                repeticiones = texto.count(termino)
+                parcial = idf * repeticiones * (k1 + 1) / (
+                    repeticiones + fijo + por_palabra * _largo(texto))
+                puntos[clave] = puntos.get(clave, 0.0) + parcial
+            cota -= idf * (k1 + 1)
+        return heapq.nsmallest(limite, puntos.items(), key=lambda par: (-par[1], par[0]))
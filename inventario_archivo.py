@@ -6,8 +6,19 @@ Sistema avanzado de gestión de inventarios con base de datos SQLite.
 Utiliza colecciones (dict, set, list, tuple) y persistencia en SQLite.
 """
 
+import heapq
 import json
+import math
 import os
+import sqlite3
+from collections.abc import Mapping, Set
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii as _cadena_json
+
+from escritura_atomica import EscritorEnSegundoPlano, escribir_atomico
+from indice_ordenado import ORDENES, IndiceOrdenado
+from indice_texto import IndiceTrigramas, normalizar
+from snapshot_binario import InstantaneaBinaria, preparar_instantanea
 
 
 # ═══════════════════════════════════════════════
@@ -16,6 +27,8 @@ import os
 
 class Producto:
 
+    __slots__ = ("id", "nombre", "cantidad", "precio")
+
     def __init__(self, id: int, nombre: str, cantidad: int, precio: float):
         self.id = id
         self.nombre = nombre
@@ -30,6 +43,15 @@ class Producto:
             "precio": self.precio
         }
 
+    def a_json(self):
+        """El mismo objeto que to_dict() ya codificado en JSON, en una línea."""
+        if (type(self.id) is int and type(self.nombre) is str and type(self.cantidad) is int
+                and type(self.precio) in (int, float) and math.isfinite(self.precio)):
+            # Caso habitual, sin pasar por el codificador genérico
+            return (f'{{"id": {self.id}, "nombre": {_cadena_json(self.nombre)}, '
+                    f'"cantidad": {self.cantidad}, "precio": {self.precio!r}}}')
+        return json.dumps(self.to_dict())
+
     @staticmethod
     def from_dict(data):
         return Producto(
@@ -40,77 +62,813 @@ class Producto:
         )
 
 
+TAMANO_PAGINA = 20          # productos por página al listar
+
+
 # ═══════════════════════════════════════════════
-# Clase Inventario
+# Almacenes (persistencia)
 # ═══════════════════════════════════════════════
 
-class Inventario:
+def _fila(producto):
+    return producto.id, producto.nombre, producto.cantidad, producto.precio
 
-    ARCHIVO = "inventario.json"
 
-    def __init__(self):
+def _json_por_lineas(productos):
+    """Lista JSON con un producto por línea; json.load la lee igual que antes."""
+    yield "["
+    separador = "\n    "
+    for p in productos:
+        yield separador + p.a_json()
+        separador = ",\n    "
+    yield "\n]\n"
+
+
+class AlmacenJSON:
+    """
+    Guarda el catálogo completo en memoria y lo vuelca entero a un archivo
+    JSON después de cada cambio. Las búsquedas por nombre usan un índice de
+    trigramas creado en la primera búsqueda y mantenido en cada alta y baja.
+
+    Dentro de transaccion() los cambios solo se aplican en memoria, anotando
+    cómo deshacerlos, y el archivo se escribe una sola vez al final.
+
+    El archivo se reemplaza de forma atómica (escribir_atomico). Con
+    en_segundo_plano=True las escrituras las hace un hilo que junta las
+    peticiones seguidas en una sola; en ese modo un error de escritura ya no
+    deshace el cambio en memoria, solo se informa (ver EscritorEnSegundoPlano).
+    """
+
+    def __init__(self, archivo="inventario.json", en_segundo_plano=False):
+        self.archivo = archivo
         self.productos = {}      # diccionario → búsqueda rápida por ID
         self.ids = set()         # conjunto → control de IDs únicos
+        self._indice_nombres = None
+        self._indice_orden = None
+        self._deshacer = None    # lista de acciones inversas durante una transacción
+        self._escritor = EscritorEnSegundoPlano(self._escribir) if en_segundo_plano else None
         self._cargar()
 
-    # ─────────────────────────────
-    # Gestión de archivo
-    # ─────────────────────────────
-
     def _guardar(self):
-        datos = [p.to_dict() for p in self.productos.values()]
-        with open(self.ARCHIVO, "w", encoding="utf-8") as f:
-            json.dump(datos, f, indent=4)
+        if self._escritor is not None:
+            self._escritor.programar()
+        else:
+            self._escribir()
+
+    def _escribir(self):
+        # list() copia las referencias de una vez, así el hilo escritor no
+        # recorre el diccionario mientras otro hilo lo modifica
+        productos = list(self.productos.values())
+        escribir_atomico(self.archivo, _json_por_lineas(productos))
 
     def _cargar(self):
-        if os.path.exists(self.ARCHIVO):
-            with open(self.ARCHIVO, "r", encoding="utf-8") as f:
+        if os.path.exists(self.archivo):
+            with open(self.archivo, "r", encoding="utf-8") as f:
                 datos = json.load(f)
                 for item in datos:
                     p = Producto.from_dict(item)
                     self.productos[p.id] = p
                     self.ids.add(p.id)
 
+    def __contains__(self, id):
+        return id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def obtener(self, id):
+        return self.productos.get(id)
+
+    # Cambios en memoria (sin escribir el archivo)
+
+    def _poner(self, producto):
+        self.productos[producto.id] = producto
+        self.ids.add(producto.id)
+        if self._indice_nombres is not None:
+            self._indice_nombres.agregar(producto.id, producto.nombre)
+        if self._indice_orden is not None:
+            self._indice_orden.agregar(_fila(producto))
+        if self._deshacer is not None:
+            self._deshacer.append(lambda: self._sacar(producto.id))
+
+    def _sacar(self, id):
+        producto = self.productos.pop(id)
+        self.ids.remove(id)
+        if self._indice_nombres is not None:
+            self._indice_nombres.quitar(id)
+        if self._indice_orden is not None:
+            self._indice_orden.quitar(_fila(producto))
+        if self._deshacer is not None:
+            self._deshacer.append(lambda: self._poner(producto))
+
+    def _fijar(self, id, cantidad, precio):
+        p = self.productos[id]
+        if self._deshacer is not None:
+            anterior = (p.cantidad, p.precio)
+            self._deshacer.append(lambda: self._fijar(id, *anterior))
+        antes = _fila(p)
+        p.cantidad = cantidad
+        p.precio = precio
+        if self._indice_orden is not None:
+            self._indice_orden.cambiar(antes, _fila(p))
+
+    def _confirmar(self):
+        """Escribe el archivo, salvo dentro de una transacción (se hará al final)."""
+        if self._deshacer is None:
+            self._guardar()
+
+    # Operaciones
+
+    def insertar(self, producto):
+        self._poner(producto)
+        self._confirmar()
+
+    def insertar_muchos(self, productos):
+        for p in productos:
+            self._poner(p)
+        self._confirmar()
+
+    def eliminar(self, id):
+        self._sacar(id)
+        self._confirmar()
+
+    def actualizar(self, id, cantidad, precio):
+        self._fijar(id, cantidad, precio)
+        self._confirmar()
+
+    def actualizar_muchos(self, filas):
+        for id, cantidad, precio in filas:
+            self._fijar(id, cantidad, precio)
+        self._confirmar()
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa varios cambios con una única escritura del archivo al salir.
+        Si algo falla (incluida esa escritura) se deshacen todos en memoria.
+        Una transacción anidada forma parte de la exterior.
+        """
+        if self._deshacer is not None:
+            yield
+            return
+        self._deshacer = deshacer = []
+        try:
+            yield
+            self._deshacer = None
+            self._guardar()
+        except BaseException:
+            self._deshacer = None
+            for accion in reversed(deshacer):
+                accion()
+            raise
+        finally:
+            self._deshacer = None
+
+    def buscar_por_nombre(self, nombre):
+        if self._indice_nombres is None:
+            self._indice_nombres = IndiceTrigramas()
+            for p in self.productos.values():
+                self._indice_nombres.agregar(p.id, p.nombre)
+        return (self.productos[id] for id in sorted(self._indice_nombres.buscar(nombre)))
+
+    def listar(self, offset=0, limite=TAMANO_PAGINA, orden="id", descendente=False,
+               despues=None):
+        if self._indice_orden is None:
+            self._indice_orden = IndiceOrdenado(lambda: map(_fila, self.productos.values()))
+        ids = self._indice_orden.ids(orden, offset, limite, descendente,
+                                     None if despues is None else _fila(despues))
+        return (self.productos[id] for id in ids)
+
+    def todos(self):
+        return self.listar(0, None)
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.cerrar()
+
+
+class AlmacenSQLite:
+    """
+    Guarda el catálogo en la tabla productos de una base SQLite.
+    Cada cambio es una sola sentencia INSERT/UPDATE/DELETE (en modo WAL) y las
+    consultas leen del cursor según se recorren, sin cargar la tabla entera.
+    Las sentencias son constantes, así que sqlite3 reutiliza su versión
+    preparada en cada llamada.
+
+    Los nombres se indexan en una tabla FTS5 de trigramas (productos_nombres)
+    que unos disparadores mantienen al día con cualquier escritura sobre
+    productos, venga de donde venga. Si la versión de SQLite no permite
+    quitar tildes en el índice, o no trae FTS5, se recorre la tabla.
+    """
+
+    _CREAR = """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            precio REAL NOT NULL DEFAULT 0.0
+        )"""
+    _EXISTE = "SELECT 1 FROM productos WHERE id = ?"
+    _CONTAR = "SELECT COUNT(*) FROM productos"
+    _OBTENER = "SELECT id, nombre, cantidad, precio FROM productos WHERE id = ?"
+    _INSERTAR = "INSERT INTO productos (id, nombre, cantidad, precio) VALUES (?, ?, ?, ?)"
+    _ELIMINAR = "DELETE FROM productos WHERE id = ?"
+    _ACTUALIZAR = "UPDATE productos SET cantidad = ?, precio = ? WHERE id = ?"
+    _BUSCAR = ("SELECT id, nombre, cantidad, precio FROM productos "
+               "WHERE instr(normalizar(nombre), ?) > 0 ORDER BY id")
+    _BUSCAR_INDICE = ("SELECT id, nombre, cantidad, precio FROM productos WHERE id IN "
+                      "(SELECT rowid FROM productos_nombres WHERE productos_nombres MATCH ?) "
+                      "ORDER BY id")
+    _CREAR_INDICE = (
+        "CREATE VIRTUAL TABLE productos_nombres USING fts5(nombre, content='productos', "
+        "content_rowid='id', tokenize='trigram remove_diacritics 1')",
+        """CREATE TRIGGER IF NOT EXISTS productos_nombres_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_nombres(rowid, nombre) VALUES (new.id, new.nombre);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS productos_nombres_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_nombres(productos_nombres, rowid, nombre)
+            VALUES ('delete', old.id, old.nombre);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS productos_nombres_au AFTER UPDATE OF nombre ON productos BEGIN
+            INSERT INTO productos_nombres(productos_nombres, rowid, nombre)
+            VALUES ('delete', old.id, old.nombre);
+            INSERT INTO productos_nombres(rowid, nombre) VALUES (new.id, new.nombre);
+        END""",
+        "INSERT INTO productos_nombres(productos_nombres) VALUES ('rebuild')",
+    )
+    _TODOS = "SELECT id, nombre, cantidad, precio FROM productos ORDER BY id"
+    _CREAR_ORDEN = (
+        "CREATE INDEX IF NOT EXISTS productos_por_nombre ON productos (nombre COLLATE NOCASE, id)",
+        "CREATE INDEX IF NOT EXISTS productos_por_cantidad ON productos (cantidad, id)",
+        "CREATE INDEX IF NOT EXISTS productos_por_precio ON productos (precio, id)",
+    )
+    _QUITAR_ORDEN = tuple(f"DROP INDEX IF EXISTS productos_por_{columna}"
+                          for columna in ("nombre", "cantidad", "precio"))
+    # (orden, descendente, con cursor) → consulta que recorre el índice
+    # correspondiente; con cursor empieza tras la fila (clave, id) indicada
+    _LISTAR = {
+        (orden, descendente, cursor):
+            "SELECT id, nombre, cantidad, precio FROM productos "
+            + (f"WHERE ({', '.join(columnas)}) {'<' if descendente else '>'} "
+               f"({', '.join('?' for _ in columnas)}) " if cursor else "")
+            + "ORDER BY " + ", ".join(c + (" DESC" if descendente else "") for c in columnas)
+            + " LIMIT ? OFFSET ?"
+        for orden, columnas in (("id", ("id",)), ("nombre", ("nombre COLLATE NOCASE", "id")),
+                                ("cantidad", ("cantidad", "id")), ("precio", ("precio", "id")))
+        for descendente in (False, True)
+        for cursor in (False, True)
+    }
+
+    def __init__(self, archivo="inventario.db", espera=5.0):
+        self.archivo = archivo
+        # isolation_level=None: cada sentencia se confirma por sí sola.
+        # espera: segundos que se aguarda si otro proceso tiene la base bloqueada
+        self.conexion = sqlite3.connect(archivo, isolation_level=None, timeout=espera)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute(self._CREAR)
+        for sql in self._CREAR_ORDEN:
+            self.conexion.execute(sql)
+        # lower() de SQLite solo entiende ASCII; se usa la normalización de Python
+        self.conexion.create_function("normalizar", 1, normalizar, deterministic=True)
+        self._con_indice = self._preparar_indice()
+
+    def _preparar_indice(self):
+        """Crea el índice de trigramas si falta. Devuelve False si no es posible."""
+        existe = self.conexion.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'productos_nombres'").fetchone()
+        if existe:
+            return True
+        try:
+            self.conexion.execute("BEGIN")
+            for sql in self._CREAR_INDICE:
+                self.conexion.execute(sql)
+            self.conexion.execute("COMMIT")
+            return True
+        except sqlite3.OperationalError:
+            # SQLite sin FTS5 o anterior a 3.45 (sin remove_diacritics)
+            self.conexion.execute("ROLLBACK")
+            return False
+
+    def _productos(self, sql, parametros=()):
+        cursor = self.conexion.execute(sql, parametros)
+        return (Producto(*fila) for fila in cursor)
+
+    def __contains__(self, id):
+        return self.conexion.execute(self._EXISTE, (id,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conexion.execute(self._CONTAR).fetchone()[0]
+
+    def obtener(self, id):
+        fila = self.conexion.execute(self._OBTENER, (id,)).fetchone()
+        return None if fila is None else Producto(*fila)
+
+    def insertar(self, producto):
+        self.conexion.execute(self._INSERTAR, (producto.id, producto.nombre,
+                                               producto.cantidad, producto.precio))
+
+    def insertar_muchos(self, productos):
+        self.conexion.executemany(self._INSERTAR, ((p.id, p.nombre, p.cantidad, p.precio)
+                                                   for p in productos))
+
+    def eliminar(self, id):
+        self.conexion.execute(self._ELIMINAR, (id,))
+
+    def reemplazar_todo(self, filas):
+        """
+        Reemplaza el catálogo por las filas (id, nombre, cantidad, precio) en
+        una sola transacción. Los índices de orden se quitan durante la carga
+        y se crean de nuevo al final: ordenar una vez es mucho más rápido que
+        insertar fila a fila en tres índices en orden aleatorio.
+        """
+        with self.transaccion():
+            for sql in self._QUITAR_ORDEN:
+                self.conexion.execute(sql)
+            self.conexion.execute("DELETE FROM productos")
+            self.conexion.executemany(self._INSERTAR, filas)
+            for sql in self._CREAR_ORDEN:
+                self.conexion.execute(sql)
+
+    def actualizar(self, id, cantidad, precio):
+        self.conexion.execute(self._ACTUALIZAR, (cantidad, precio, id))
+
+    def actualizar_muchos(self, filas):
+        self.conexion.executemany(self._ACTUALIZAR, ((c, p, id) for id, c, p in filas))
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa varios cambios en una transacción SQLite (todo o nada)."""
+        if self.conexion.in_transaction:
+            yield
+            return
+        self.conexion.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+    def buscar_por_nombre(self, nombre):
+        nombre = normalizar(nombre)
+        if self._con_indice and len(nombre) >= 3:
+            # Frase entre comillas: el índice de trigramas la busca como subcadena
+            return self._productos(self._BUSCAR_INDICE, ('"' + nombre.replace('"', '""') + '"',))
+        return self._productos(self._BUSCAR, (nombre,))
+
+    def listar(self, offset=0, limite=TAMANO_PAGINA, orden="id", descendente=False,
+               despues=None):
+        """
+        Página de productos leída en orden del índice. Con `despues` la
+        consulta salta directamente a esa fila del índice; un OFFSET grande,
+        en cambio, recorre todas las filas que salta. El orden por nombre es
+        el de SQLite (NOCASE: sin distinguir mayúsculas ASCII).
+        """
+        sql = self._LISTAR.get((orden, bool(descendente), despues is not None))
+        if sql is None:
+            raise ValueError(f"Orden desconocido: '{orden}' (use {', '.join(ORDENES)})")
+        parametros = (-1 if limite is None else limite, offset)
+        if despues is not None:
+            cursor = (despues.id,) if orden == "id" else (getattr(despues, orden), despues.id)
+            parametros = cursor + parametros
+        return self._productos(sql, parametros)
+
+    def todos(self):
+        return self._productos(self._TODOS)
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+class AlmacenBinario:
+    """
+    Guarda el catálogo en una instantánea binaria por columnas
+    (snapshot_binario) que se abre con mmap: abrirla no depende del número de
+    productos y cada consulta por ID es una búsqueda binaria en el archivo.
+
+    La instantánea no se modifica en cada cambio: los cambios quedan en
+    memoria (cambios: id → Producto, o None si se eliminó) y se anotan en un
+    diario JSON por líneas (inventario.bin.log) que se reproduce al abrir.
+    compactar() escribe una instantánea nueva con todo y vacía el diario; se
+    hace sola cuando el diario pasa de umbral_compactacion bytes.
+    """
+
+    UMBRAL_COMPACTACION = 4 * 1024 * 1024
+
+    def __init__(self, archivo="inventario.bin", umbral_compactacion=UMBRAL_COMPACTACION):
+        self.archivo = archivo
+        self.archivo_diario = archivo + ".log"
+        self.umbral_compactacion = umbral_compactacion
+        self.base = InstantaneaBinaria(archivo) if os.path.exists(archivo) else None
+        self.cambios = {}
+        self._total = len(self.base) if self.base is not None else 0
+        self._indice_nombres = None
+        self._indice_orden = None
+        self._deshacer = None    # lista de acciones inversas durante una transacción
+        self._pendientes = []    # registros del diario aún sin escribir
+        self._reproducir_diario()
+
+    def _reproducir_diario(self):
+        if not os.path.exists(self.archivo_diario):
+            return
+        with open(self.archivo_diario, "r", encoding="utf-8") as f:
+            for i, linea in enumerate(f, start=1):
+                if not linea.endswith("\n"):
+                    # Corte a mitad de escritura: ese último cambio no llegó a confirmarse
+                    print(f"[ADVERTENCIA] Registro {i} del diario incompleto, se descarta.")
+                    break
+                try:
+                    registro = json.loads(linea)
+                    if registro[0] == "P":
+                        self._cambiar(registro[1], Producto(*registro[1:]))
+                    else:
+                        self._cambiar(registro[1], None)
+                except (ValueError, IndexError, TypeError) as e:
+                    print(f"[ADVERTENCIA] Registro {i} del diario ignorado: {e}")
+
+    def __contains__(self, id):
+        return self.obtener(id) is not None
+
+    def __len__(self):
+        return self._total
+
+    def obtener(self, id):
+        if id in self.cambios:
+            return self.cambios[id]
+        if self.base is None:
+            return None
+        fila = self.base.fila_de(id)
+        return None if fila is None else Producto(*self.base.campos(fila))
+
+    # Cambios en memoria (sin escribir el diario)
+
+    def _cambiar(self, id, producto):
+        """Deja el producto `id` como `producto` (None = eliminado)."""
+        anterior = self.obtener(id)
+        self._total += (producto is not None) - (anterior is not None)
+        self.cambios[id] = producto
+        if self._indice_nombres is not None:
+            if producto is None:
+                self._indice_nombres.quitar(id)
+            else:
+                self._indice_nombres.agregar(id, producto.nombre)
+        if self._indice_orden is not None:
+            if anterior is None:
+                self._indice_orden.agregar(_fila(producto))
+            elif producto is None:
+                self._indice_orden.quitar(_fila(anterior))
+            else:
+                self._indice_orden.cambiar(_fila(anterior), _fila(producto))
+        if self._deshacer is not None:
+            self._deshacer.append(lambda: self._cambiar(id, anterior))
+
+    def _anotar(self, registro):
+        self._pendientes.append(json.dumps(registro) + "\n")
+        if self._deshacer is None:
+            self._escribir_diario()
+
+    def _escribir_diario(self):
+        registros, self._pendientes = self._pendientes, []
+        if not registros:
+            return
+        with open(self.archivo_diario, "a", encoding="utf-8") as f:
+            f.write("".join(registros))
+            tamano = f.tell()
+        if tamano >= self.umbral_compactacion:
+            try:
+                self.compactar()
+            except OSError as e:
+                # Los cambios ya están a salvo en el diario: no se deshacen,
+                # y se volverá a compactar en la próxima escritura
+                print(f"[ERROR] No se pudo compactar '{self.archivo}': {e}")
+
+    # Operaciones
+
+    def insertar(self, producto):
+        self._cambiar(producto.id, producto)
+        self._anotar(["P", producto.id, producto.nombre, producto.cantidad, producto.precio])
+
+    def insertar_muchos(self, productos):
+        with self.transaccion():
+            for p in productos:
+                self.insertar(p)
+
+    def eliminar(self, id):
+        self._cambiar(id, None)
+        self._anotar(["E", id])
+
+    def actualizar(self, id, cantidad, precio):
+        # Producto nuevo en lugar de modificarlo: el anterior sirve para deshacer
+        self.insertar(Producto(id, self.obtener(id).nombre, cantidad, precio))
+
+    def actualizar_muchos(self, filas):
+        with self.transaccion():
+            for id, cantidad, precio in filas:
+                self.actualizar(id, cantidad, precio)
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa varios cambios en una sola escritura del diario al salir.
+        Si algo falla (incluida esa escritura) se deshacen todos en memoria.
+        Una transacción anidada forma parte de la exterior.
+        """
+        if self._deshacer is not None:
+            yield
+            return
+        self._deshacer = deshacer = []
+        try:
+            yield
+            self._deshacer = None
+            self._escribir_diario()
+        except BaseException:
+            self._deshacer = None
+            self._pendientes = []
+            for accion in reversed(deshacer):
+                accion()
+            raise
+        finally:
+            self._deshacer = None
+
+    def compactar(self):
+        """Escribe una instantánea nueva con todos los productos y vacía el diario."""
+        trozos = preparar_instantanea(map(_fila, self.todos()))
+        # En Windows no se puede reemplazar un archivo mapeado en memoria:
+        # se cierra la instantánea actual antes de escribir la nueva
+        if self.base is not None:
+            self.base.cerrar()
+            self.base = None
+        try:
+            escribir_atomico(self.archivo, trozos, binario=True)
+        finally:
+            # La nueva, o la anterior (intacta) si la escritura falló
+            if os.path.exists(self.archivo):
+                self.base = InstantaneaBinaria(self.archivo)
+        self.cambios = {}
+        if os.path.exists(self.archivo_diario):
+            os.remove(self.archivo_diario)
+
+    def buscar_por_nombre(self, nombre):
+        if self._indice_nombres is None:
+            self._indice_nombres = IndiceTrigramas()
+            for p in self.todos():
+                self._indice_nombres.agregar(p.id, p.nombre)
+        return (self.obtener(id) for id in sorted(self._indice_nombres.buscar(nombre)))
+
+    def listar(self, offset=0, limite=TAMANO_PAGINA, orden="id", descendente=False,
+               despues=None):
+        if self._indice_orden is None:
+            self._indice_orden = IndiceOrdenado(lambda: map(_fila, self.todos()))
+        ids = self._indice_orden.ids(orden, offset, limite, descendente,
+                                     None if despues is None else _fila(despues))
+        return (self.obtener(id) for id in ids)
+
+    def todos(self):
+        cambios = self.cambios
+        nuevos = sorted((p for p in cambios.values() if p is not None), key=lambda p: p.id)
+        if self.base is None:
+            return iter(nuevos)
+        base = self.base
+        sin_cambios = (Producto(*base.campos(fila)) for fila in base.orden
+                       if base.ids[fila] not in cambios)
+        return heapq.merge(sin_cambios, nuevos, key=lambda p: p.id)
+
+    def cerrar(self):
+        if self.base is not None:
+            self.base.cerrar()
+            self.base = None
+
+
+# ═══════════════════════════════════════════════
+# Vistas de solo lectura sobre un almacén
+# ═══════════════════════════════════════════════
+
+class _VistaProductos(Mapping):
+    """ID → Producto leído del almacén en cada consulta (Inventario.productos)."""
+
+    __slots__ = ("_almacen",)
+
+    def __init__(self, almacen):
+        self._almacen = almacen
+
+    def __getitem__(self, id):
+        producto = self._almacen.obtener(id)
+        if producto is None:
+            raise KeyError(id)
+        return producto
+
+    def __contains__(self, id):
+        return id in self._almacen
+
+    def __iter__(self):
+        return (p.id for p in self._almacen.todos())
+
+    def __len__(self):
+        return len(self._almacen)
+
+
+class _VistaIds(Set):
+    """IDs del almacén, consultados en cada operación (Inventario.ids)."""
+
+    __slots__ = ("_almacen",)
+
+    def __init__(self, almacen):
+        self._almacen = almacen
+
+    @classmethod
+    def _from_iterable(cls, ids):
+        # Resultado de operaciones de conjuntos (a & b, a | b...): un set normal
+        return set(ids)
+
+    def __contains__(self, id):
+        return id in self._almacen
+
+    def __iter__(self):
+        return (p.id for p in self._almacen.todos())
+
+    def __len__(self):
+        return len(self._almacen)
+
+
+# ═══════════════════════════════════════════════
+# Clase Inventario
+# ═══════════════════════════════════════════════
+
+class Inventario:
+    """
+    Reglas del inventario sobre un almacén intercambiable: AlmacenJSON
+    (por defecto, inventario.json), AlmacenSQLite (inventario.db) o
+    AlmacenBinario (inventario.bin).
+
+    agregar_observador(funcion) registra una función a la que se llama tras
+    cada cambio confirmado con (operacion, antes, despues): operacion es
+    "agregar", "eliminar" o "actualizar" y antes/despues son tuplas
+    (id, nombre, cantidad, precio), o None. Dentro de lote() los avisos se
+    guardan y se dan al confirmar el lote; si el lote falla, no se dan.
+    """
+
+    ARCHIVO = "inventario.json"
+
+    def __init__(self, almacen=None):
+        self.almacen = almacen if almacen is not None else AlmacenJSON(self.ARCHIVO)
+        self._observadores = []
+        self._avisos = None      # avisos retenidos mientras dura un lote
+
+    def cerrar(self):
+        self.almacen.cerrar()
+
+    @property
+    def productos(self):
+        """
+        Vista de solo lectura ID → Producto: `inv.productos[id]` e `id in
+        inv.productos` consultan un solo producto en el almacén; recorrerla
+        va en orden de ID.
+        """
+        return _VistaProductos(self.almacen)
+
+    @property
+    def ids(self):
+        """Vista de solo lectura del conjunto de IDs (`id in inv.ids` consulta uno solo)."""
+        return _VistaIds(self.almacen)
+
+    # ─────────────────────────────
+    # Observadores
+    # ─────────────────────────────
+
+    def agregar_observador(self, funcion):
+        """Registra funcion(operacion, antes, despues) para cada cambio confirmado."""
+        self._observadores.append(funcion)
+
+    def quitar_observador(self, funcion):
+        self._observadores.remove(funcion)
+
+    def _foto(self, id):
+        """Tupla (id, nombre, cantidad, precio) actual del producto."""
+        p = self.almacen.obtener(id)
+        return p.id, p.nombre, p.cantidad, p.precio
+
+    def _notificar(self, operacion, antes, despues):
+        if self._avisos is not None:
+            self._avisos.append((operacion, antes, despues))
+            return
+        for funcion in self._observadores:
+            funcion(operacion, antes, despues)
+
     # ─────────────────────────────
     # Métodos CRUD
     # ─────────────────────────────
 
     def agregar(self, producto):
-        if producto.id in self.ids:
+        if producto.id in self.almacen:
             return False, "El ID ya existe."
 
-        self.productos[producto.id] = producto
-        self.ids.add(producto.id)
-        self._guardar()
+        self.almacen.insertar(producto)
+        if self._observadores:
+            self._notificar("agregar", None, (producto.id, producto.nombre,
+                                              producto.cantidad, producto.precio))
         return True, "Producto agregado correctamente."
 
     def eliminar(self, id):
-        if id not in self.ids:
+        if id not in self.almacen:
             return False, "Producto no encontrado."
 
-        del self.productos[id]
-        self.ids.remove(id)
-        self._guardar()
+        antes = self._foto(id) if self._observadores else None
+        self.almacen.eliminar(id)
+        if self._observadores:
+            self._notificar("eliminar", antes, None)
         return True, "Producto eliminado."
 
     def actualizar(self, id, cantidad, precio):
-        if id not in self.ids:
+        if id not in self.almacen:
             return False, "Producto no encontrado."
 
-        self.productos[id].cantidad = cantidad
-        self.productos[id].precio = precio
-        self._guardar()
+        antes = self._foto(id) if self._observadores else None
+        self.almacen.actualizar(id, cantidad, precio)
+        if self._observadores:
+            self._notificar("actualizar", antes, (id, antes[1], cantidad, precio))
         return True, "Producto actualizado."
 
+    # ─────────────────────────────
+    # Operaciones por lotes
+    # ─────────────────────────────
+
+    @contextmanager
+    def lote(self):
+        """
+        Contexto para agrupar operaciones con una sola escritura al final:
+
+            with inventario.lote():
+                inventario.agregar(p1)
+                inventario.actualizar(2, 10, 1.5)
+
+        Si ocurre una excepción dentro, no se aplica ninguno de los cambios.
+        """
+        if self._avisos is not None:
+            # Lote anidado: forma parte del exterior
+            with self.almacen.transaccion():
+                yield
+            return
+        self._avisos = avisos = []
+        try:
+            with self.almacen.transaccion():
+                yield
+        finally:
+            self._avisos = None
+        for aviso in avisos:
+            self._notificar(*aviso)
+
+    def agregar_muchos(self, productos):
+        """Agrega todos los productos o ninguno (si algún ID está repetido)."""
+        productos = list(productos)
+        nuevos = set()
+        for p in productos:
+            if p.id in nuevos or p.id in self.almacen:
+                return False, f"El ID {p.id} ya existe o está repetido. No se agregó ningún producto."
+            nuevos.add(p.id)
+
+        with self.lote():
+            self.almacen.insertar_muchos(productos)
+            if self._observadores:
+                for p in productos:
+                    self._notificar("agregar", None, (p.id, p.nombre, p.cantidad, p.precio))
+        return True, f"{len(productos)} producto(s) agregado(s) correctamente."
+
+    def actualizar_muchos(self, filas):
+        """
+        Actualiza varios productos a partir de tuplas (id, cantidad, precio).
+        Si algún ID no existe no se actualiza ninguno.
+        """
+        filas = list(filas)
+        for id, _, _ in filas:
+            if id not in self.almacen:
+                return False, f"Producto {id} no encontrado. No se actualizó ningún producto."
+
+        with self.lote():
+            if self._observadores:
+                # Estado de cada producto antes de su cambio (un ID puede repetirse)
+                actuales = {}
+                for id, cantidad, precio in filas:
+                    anterior = actuales[id] if id in actuales else self._foto(id)
+                    actuales[id] = (id, anterior[1], cantidad, precio)
+                    self._notificar("actualizar", anterior, actuales[id])
+            self.almacen.actualizar_muchos(filas)
+        return True, f"{len(filas)} producto(s) actualizado(s)."
+
     def buscar_por_nombre(self, nombre):
-        nombre = nombre.lower()
-        return [
-            p for p in self.productos.values()
-            if nombre in p.nombre.lower()
-        ]
+        return list(self.almacen.buscar_por_nombre(nombre))
+
+    def listar(self, offset=0, limite=TAMANO_PAGINA, orden="id", descendente=False,
+               despues=None):
+        """
+        Página de productos ordenados por `orden` (id, nombre, cantidad o
+        precio): hasta `limite` productos (todos si es None) desde `offset`.
+        Para recorrer página a página, pasar en `despues` el último producto
+        de la página anterior (cursor) en lugar de un offset creciente.
+        """
+        return list(self.almacen.listar(offset, limite, orden, descendente, despues))
 
     def mostrar_todos(self):
-        return sorted(self.productos.values(), key=lambda p: p.id)
+        return list(self.almacen.todos())
 
 
 # ═══════════════════════════════════════════════
@@ -172,9 +930,23 @@ class Menu:
                     print(f"{p.id} | {p.nombre} | {p.cantidad} | ${p.precio}")
 
             elif opcion == "5":
-                productos = self.inventario.mostrar_todos()
-                for p in productos:
-                    print(f"{p.id} | {p.nombre} | {p.cantidad} | ${p.precio}")
+                orden = input(f"Ordenar por ({'/'.join(ORDENES)}) [id]: ").strip().lower() or "id"
+                if orden not in ORDENES:
+                    print("Orden no válido.")
+                    continue
+                total = len(self.inventario.almacen)
+                offset = 0
+                ultimo = None
+                while offset < total:
+                    pagina = self.inventario.listar(0, TAMANO_PAGINA, orden, despues=ultimo)
+                    for p in pagina:
+                        print(f"{p.id} | {p.nombre} | {p.cantidad} | ${p.precio}")
+                    offset += len(pagina)
+                    if not pagina or offset >= total:
+                        break
+                    ultimo = pagina[-1]
+                    if input(f"-- {offset} de {total}. Enter para seguir, 'q' para salir: ") == "q":
+                        break
 
             elif opcion == "6":
                 print("Saliendo del sistema...")
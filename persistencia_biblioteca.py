@@ -0,0 +1,280 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Persistencia de la Biblioteca Digital en una base SQLite con las tablas
+libros, usuarios, prestamos e historial. Cada operación de la biblioteca se
+guarda como una fila (más su evento del historial) en su propia transacción,
+y el catálogo se puede cargar desde un CSV de una sola vez.
+
+Formato del CSV (con encabezado):
+
+    isbn,titulo,autor,categoria
+    ISBN-001,Cien años de soledad,Gabriel García Márquez,Ficción
+"""
+
+import csv
+import sqlite3
+from contextlib import contextmanager
+
+ARCHIVO_BIBLIOTECA = "biblioteca.db"
+COLUMNAS_CSV = ("isbn", "titulo", "autor", "categoria")
+# Plazo que se da a los préstamos guardados antes de que existiera la columna vence_en
+PLAZO_ANTERIOR = 14 * 24 * 3600
+
+
+def _avisar(ubicacion, mensaje):
+    print(f"[ADVERTENCIA] {ubicacion} ignorada: {mensaje}")
+
+
+def leer_csv(ruta, rechazar=_avisar):
+    """
+    Genera (isbn, titulo, autor, categoria) de cada fila del CSV, sin
+    espacios sobrantes. Las filas incompletas se descartan con
+    rechazar(ubicación, mensaje).
+    """
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        lector = csv.reader(f)
+        encabezado = next(lector, None)
+        if encabezado is None:
+            return
+        encabezado = [c.strip().lower() for c in encabezado]
+        try:
+            posiciones = [encabezado.index(c) for c in COLUMNAS_CSV]
+        except ValueError:
+            raise ValueError(f"El CSV debe tener las columnas {', '.join(COLUMNAS_CSV)}.") from None
+        largo = max(posiciones) + 1
+        for i, fila in enumerate(lector, start=2):
+            if len(fila) < largo:
+                if fila:
+                    rechazar(f"Línea {i}", f"faltan columnas: {fila!r}")
+                continue
+            valores = tuple(fila[p].strip() for p in posiciones)
+            if not all(valores):
+                rechazar(f"Línea {i}", f"hay campos vacíos: {fila!r}")
+                continue
+            yield valores
+
+
+class AlmacenBiblioteca:
+    """
+    Clase AlmacenBiblioteca
+    Guarda la biblioteca en SQLite (modo WAL):
+
+      - libros (isbn, titulo, autor, categoria)
+      - usuarios (id_usuario, nombre)
+      - prestamos (isbn, id_usuario, prestado_en, vence_en): un libro está
+        disponible si no tiene fila aquí, así que prestar o devolver toca una
+        sola fila
+      - historial (seq, tipo, marca_tiempo, detalle, isbn, id_usuario)
+
+    guardar(evento, fila) aplica el cambio del tipo del evento (_CAMBIOS) y
+    añade el evento al historial en una misma transacción. Las sentencias son
+    constantes, así que sqlite3 reutiliza su versión preparada.
+    """
+
+    _CREAR = (
+        """CREATE TABLE IF NOT EXISTS libros (
+            isbn TEXT PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            autor TEXT NOT NULL,
+            categoria TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS usuarios (
+            id_usuario TEXT PRIMARY KEY,
+            nombre TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS prestamos (
+            isbn TEXT PRIMARY KEY REFERENCES libros (isbn),
+            id_usuario TEXT NOT NULL REFERENCES usuarios (id_usuario),
+            prestado_en REAL NOT NULL,
+            vence_en REAL NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS historial (
+            seq INTEGER PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            marca_tiempo REAL NOT NULL,
+            detalle TEXT NOT NULL,
+            isbn TEXT,
+            id_usuario TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS prestamos_por_usuario ON prestamos (id_usuario, prestado_en)",
+        "CREATE INDEX IF NOT EXISTS historial_por_tiempo ON historial (marca_tiempo)",
+        "CREATE INDEX IF NOT EXISTS historial_por_usuario ON historial (id_usuario, seq)",
+        "CREATE INDEX IF NOT EXISTS historial_por_isbn ON historial (isbn, seq)",
+    )
+    # Índices del catálogo: se quitan durante una carga masiva y se crean al final
+    _CREAR_INDICES_LIBROS = (
+        "CREATE INDEX IF NOT EXISTS libros_por_categoria ON libros (categoria)",
+        "CREATE INDEX IF NOT EXISTS libros_por_autor ON libros (autor)",
+    )
+    _QUITAR_INDICES_LIBROS = ("DROP INDEX IF EXISTS libros_por_categoria",
+                              "DROP INDEX IF EXISTS libros_por_autor")
+
+    # Tipo de evento → sentencia que guarda el cambio
+    _CAMBIOS = {
+        "libro_agregado": "INSERT INTO libros (isbn, titulo, autor, categoria) VALUES (?, ?, ?, ?)",
+        "libro_eliminado": "DELETE FROM libros WHERE isbn = ?",
+        "usuario_registrado": "INSERT INTO usuarios (id_usuario, nombre) VALUES (?, ?)",
+        "usuario_baja": "DELETE FROM usuarios WHERE id_usuario = ?",
+        "prestamo": ("INSERT INTO prestamos (isbn, id_usuario, prestado_en, vence_en) "
+                     "VALUES (?, ?, ?, ?)"),
+        "devolucion": "DELETE FROM prestamos WHERE isbn = ?",
+        "prestamos_lote": ("INSERT INTO prestamos (isbn, id_usuario, prestado_en, vence_en) "
+                           "VALUES (?, ?, ?, ?)"),
+        "devoluciones_lote": "DELETE FROM prestamos WHERE isbn = ?",
+    }
+    _INSERTAR_LIBRO_NUEVO = ("INSERT OR IGNORE INTO libros (isbn, titulo, autor, categoria) "
+                             "VALUES (?, ?, ?, ?)")
+    _INSERTAR_EVENTO = ("INSERT INTO historial (seq, tipo, marca_tiempo, detalle, isbn, id_usuario) "
+                        "VALUES (?, ?, ?, ?, ?, ?)")
+
+    _CONTAR_LIBROS = "SELECT COUNT(*) FROM libros"
+    _OBTENER_LIBRO = ("SELECT l.titulo, l.autor, l.categoria, p.isbn IS NULL "
+                      "FROM libros l LEFT JOIN prestamos p ON p.isbn = l.isbn WHERE l.isbn = ?")
+    _LIBROS = ("SELECT l.isbn, l.titulo, l.autor, l.categoria, p.isbn IS NULL "
+               "FROM libros l LEFT JOIN prestamos p ON p.isbn = l.isbn ORDER BY l.rowid")
+    _USUARIOS = "SELECT id_usuario, nombre FROM usuarios ORDER BY rowid"
+    _PRESTAMOS = ("SELECT p.isbn, p.id_usuario, p.prestado_en, p.vence_en, "
+                  "l.titulo, l.autor, l.categoria "
+                  "FROM prestamos p JOIN libros l ON l.isbn = p.isbn "
+                  "ORDER BY p.prestado_en, p.rowid")
+    _ULTIMOS_EVENTOS = ("SELECT seq, tipo, marca_tiempo, detalle, isbn, id_usuario "
+                        "FROM historial ORDER BY seq DESC LIMIT ?")
+
+    def __init__(self, archivo=ARCHIVO_BIBLIOTECA, espera=5.0):
+        self.archivo = archivo
+        # isolation_level=None: las transacciones se abren con BEGIN explícito.
+        # espera: segundos que se aguarda si otro proceso tiene la base bloqueada.
+        # Una Biblioteca concurrente la usa desde varios hilos, siempre bajo su
+        # cerrojo de registro
+        self.conexion = sqlite3.connect(archivo, isolation_level=None, timeout=espera,
+                                        check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("PRAGMA foreign_keys=ON")
+        with self.transaccion():
+            for sql in self._CREAR + self._CREAR_INDICES_LIBROS:
+                self.conexion.execute(sql)
+            self._migrar()
+
+    def _migrar(self):
+        """Pone al día las bases creadas por versiones anteriores."""
+        columnas = {fila[1] for fila in self.conexion.execute("PRAGMA table_info(prestamos)")}
+        if "vence_en" not in columnas:
+            self.conexion.execute("ALTER TABLE prestamos ADD COLUMN vence_en REAL")
+            self.conexion.execute("UPDATE prestamos SET vence_en = prestado_en + ?",
+                                  (PLAZO_ANTERIOR,))
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa varios cambios en una transacción SQLite (todo o nada)."""
+        if self.conexion.in_transaction:
+            yield
+            return
+        self.conexion.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+    # ─────────────────────────────
+    # Escritura
+    # ─────────────────────────────
+
+    def guardar(self, evento, fila=None):
+        """
+        Guarda el cambio de un evento de historial_biblioteca: la fila (los
+        parámetros de _CAMBIOS[evento.tipo]) y el propio evento. Los tipos
+        sin sentencia en _CAMBIOS solo añaden el evento.
+        """
+        with self.transaccion():
+            if fila is not None:
+                self.conexion.execute(self._CAMBIOS[evento.tipo], fila)
+            self._insertar_evento(evento)
+
+    def guardar_lote(self, evento, filas):
+        """Como guardar(), con varias filas del mismo cambio y un solo evento."""
+        with self.transaccion():
+            self.conexion.executemany(self._CAMBIOS[evento.tipo], filas)
+            self._insertar_evento(evento)
+
+    def _insertar_evento(self, evento):
+        self.conexion.execute(self._INSERTAR_EVENTO, (
+            evento.seq, evento.tipo, evento.marca_tiempo, evento.detalle,
+            evento.isbn, evento.id_usuario))
+
+    def cargar_libros(self, filas):
+        """
+        Añade al catálogo las filas (isbn, titulo, autor, categoria) en una
+        sola transacción; las de un ISBN que ya existe se ignoran. Los índices
+        de libros se quitan durante la carga y se crean de nuevo al final:
+        ordenar una vez es mucho más rápido que insertar fila a fila en ellos.
+        Devuelve cuántos libros se añadieron.
+        """
+        with self.transaccion():
+            antes = self.conexion.total_changes
+            for sql in self._QUITAR_INDICES_LIBROS:
+                self.conexion.execute(sql)
+            self.conexion.executemany(self._INSERTAR_LIBRO_NUEVO, filas)
+            agregados = self.conexion.total_changes - antes
+            for sql in self._CREAR_INDICES_LIBROS:
+                self.conexion.execute(sql)
+        return agregados
+
+    # ─────────────────────────────
+    # Lectura
+    # ─────────────────────────────
+
+    def contar_libros(self):
+        return self.conexion.execute(self._CONTAR_LIBROS).fetchone()[0]
+
+    def obtener_libro(self, isbn):
+        """(titulo, autor, categoria, disponible) del libro, o None si no existe."""
+        fila = self.conexion.execute(self._OBTENER_LIBRO, (isbn,)).fetchone()
+        return None if fila is None else fila[:3] + (bool(fila[3]),)
+
+    def libros(self):
+        """Genera (isbn, titulo, autor, categoria, disponible) en orden de alta."""
+        for isbn, titulo, autor, categoria, disponible in self.conexion.execute(self._LIBROS):
+            yield isbn, titulo, autor, categoria, bool(disponible)
+
+    def usuarios(self):
+        """Genera (id_usuario, nombre) en orden de registro."""
+        return self.conexion.execute(self._USUARIOS)
+
+    def prestamos(self):
+        """
+        Genera (isbn, id_usuario, prestado_en, vence_en, titulo, autor,
+        categoria) en orden de préstamo.
+        """
+        return self.conexion.execute(self._PRESTAMOS)
+
+    def ultimos_eventos(self, n):
+        """Filas (seq, tipo, marca_tiempo, detalle, isbn, id_usuario) de los n últimos eventos, en orden."""
+        filas = self.conexion.execute(self._ULTIMOS_EVENTOS, (n,)).fetchall()
+        filas.reverse()
+        return filas
+
+    def eventos(self, desde=None, hasta=None, id_usuario=None, isbn=None):
+        """
+        Filas de historial (seq, tipo, marca_tiempo, detalle, isbn,
+        id_usuario) con marca de tiempo en [desde, hasta] y, si se dan, del
+        usuario y del ISBN pedidos, en orden de seq. Incluye los eventos que
+        ya salieron del búfer de HistorialBiblioteca.
+        """
+        condiciones, parametros = [], []
+        for condicion, valor in (("marca_tiempo >= ?", desde), ("marca_tiempo <= ?", hasta),
+                                 ("id_usuario = ?", id_usuario), ("isbn = ?", isbn)):
+            if valor is not None:
+                condiciones.append(condicion)
+                parametros.append(valor)
+        sql = "SELECT seq, tipo, marca_tiempo, detalle, isbn, id_usuario FROM historial"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        return self.conexion.execute(sql + " ORDER BY seq", parametros)
+
+    def cerrar(self):
+        self.conexion.close()
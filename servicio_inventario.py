@@ -0,0 +1,252 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Servicio de inventario para varios terminales (procesos) que trabajan a la
+vez sobre el mismo inventario.db. Cada producto lleva un número de versión y
+las escrituras solo se aplican si la versión no cambió desde que se leyó
+(concurrencia optimista), así que ningún terminal pisa el cambio de otro.
+Una tabla de cambios permite que cada terminal recargue solo los productos
+que otros modificaron.
+"""
+
+import random
+import sqlite3
+import time
+
+from inventario_archivo import AlmacenSQLite, Producto
+
+REINTENTOS = 50         # intentos de modificar() antes de rendirse
+
+
+class ServicioInventario:
+    """
+    Clase ServicioInventario
+    Inventario compartido sobre SQLite (AlmacenSQLite en modo WAL).
+
+      - productos.version:  se incrementa con cada cambio del producto, lo
+                            haga este servicio o cualquier otro programa
+                            (disparador productos_version)
+      - cambios:            (seq, id) de cada alta, baja o modificación,
+                            escrita por disparadores
+
+    Cada servicio guarda una copia local de los productos con su versión;
+    refrescar() consulta la tabla cambios desde el último seq visto y vuelve
+    a leer solo esos productos.
+
+    actualizar() y eliminar() comprueban la versión que vio este terminal:
+    si otro la cambió, no escriben y devuelven False (el producto queda
+    recargado para revisarlo). modificar() relee y reintenta por sí solo, para
+    cambios que se pueden recalcular, como sumar al stock.
+    """
+
+    _PREPARAR = (
+        "CREATE TABLE IF NOT EXISTS cambios (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "id INTEGER NOT NULL)",
+        """CREATE TRIGGER IF NOT EXISTS productos_version
+            AFTER UPDATE OF nombre, cantidad, precio ON productos
+            WHEN new.version = old.version BEGIN
+            UPDATE productos SET version = old.version + 1 WHERE id = new.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS cambios_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO cambios (id) VALUES (new.id);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS cambios_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO cambios (id) VALUES (old.id);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS cambios_au
+            AFTER UPDATE OF nombre, cantidad, precio ON productos BEGIN
+            INSERT INTO cambios (id) VALUES (new.id);
+        END""",
+    )
+    _AGREGAR_VERSION = "ALTER TABLE productos ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+    _OBTENER = "SELECT id, nombre, cantidad, precio, version FROM productos WHERE id = ?"
+    _TODOS = "SELECT id, nombre, cantidad, precio, version FROM productos"
+    _ULTIMO_CAMBIO = "SELECT seq FROM sqlite_sequence WHERE name = 'cambios'"
+    _PRIMER_CAMBIO = "SELECT MIN(seq) FROM cambios"
+    _CAMBIOS = "SELECT DISTINCT id FROM cambios WHERE seq > ?"
+    _ACTUALIZAR = ("UPDATE productos SET cantidad = ?, precio = ?, version = version + 1 "
+                   "WHERE id = ? AND version = ?")
+    _ELIMINAR = "DELETE FROM productos WHERE id = ? AND version = ?"
+    _PODAR = "DELETE FROM cambios WHERE seq <= ?"
+
+    def __init__(self, archivo="inventario.db", espera=30.0):
+        self.almacen = AlmacenSQLite(archivo, espera=espera)
+        self.conexion = self.almacen.conexion
+        self.conflictos = 0      # escrituras rechazadas por versión desde que se abrió
+        self._preparar()
+        self._locales = {}       # id → (Producto, versión)
+        self._ultimo_cambio = 0
+        self._cargar_todo()
+
+    def _preparar(self):
+        # BEGIN IMMEDIATE: si varios terminales arrancan a la vez, solo uno migra
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            columnas = [fila[1] for fila in self.conexion.execute("PRAGMA table_info(productos)")]
+            if "version" not in columnas:
+                self.conexion.execute(self._AGREGAR_VERSION)
+            for sql in self._PREPARAR:
+                self.conexion.execute(sql)
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+    def cerrar(self):
+        self.almacen.cerrar()
+
+    # ─────────────────────────────
+    # Copia local y detección de cambios
+    # ─────────────────────────────
+
+    def _guardar_local(self, fila):
+        self._locales[fila[0]] = (Producto(*fila[:4]), fila[4])
+
+    def _releer(self, id):
+        fila = self.conexion.execute(self._OBTENER, (id,)).fetchone()
+        if fila is None:
+            self._locales.pop(id, None)
+        else:
+            self._guardar_local(fila)
+        return fila
+
+    def _cargar_todo(self):
+        # Una transacción de lectura: los productos y el último seq son coherentes
+        self.conexion.execute("BEGIN")
+        try:
+            ultimo = self.conexion.execute(self._ULTIMO_CAMBIO).fetchone()
+            self._ultimo_cambio = ultimo[0] if ultimo else 0
+            self._locales = {}
+            for fila in self.conexion.execute(self._TODOS):
+                self._guardar_local(fila)
+        finally:
+            self.conexion.execute("COMMIT")
+
+    def refrescar(self):
+        """
+        Trae los productos que cambiaron desde la última vez y devuelve cuántos.
+        Si los cambios pendientes ya se podaron de la tabla, recarga todo.
+        """
+        self.conexion.execute("BEGIN")
+        try:
+            primero = self.conexion.execute(self._PRIMER_CAMBIO).fetchone()[0]
+            ultimo = self.conexion.execute(self._ULTIMO_CAMBIO).fetchone()
+            ultimo = ultimo[0] if ultimo else 0
+            # Podados: falta el registro siguiente al último visto, o la tabla
+            # está vacía aunque hubo cambios después de él
+            if (primero > self._ultimo_cambio + 1 if primero is not None
+                    else ultimo > self._ultimo_cambio):
+                podados = True
+            else:
+                podados = False
+                ids = [fila[0] for fila in
+                       self.conexion.execute(self._CAMBIOS, (self._ultimo_cambio,))]
+                for id in ids:
+                    self._releer(id)
+                self._ultimo_cambio = ultimo
+        finally:
+            self.conexion.execute("COMMIT")
+        if podados:
+            self._cargar_todo()
+            return len(self._locales)
+        return len(ids)
+
+    def podar_cambios(self, conservar=10_000):
+        """
+        Borra de la tabla cambios todo salvo los últimos `conservar` registros
+        (al menos uno: el último indica hasta dónde llegó la tabla).
+        """
+        if conservar < 1:
+            raise ValueError("Hay que conservar al menos un cambio.")
+        ultimo = self.conexion.execute(self._ULTIMO_CAMBIO).fetchone()
+        if ultimo:
+            self.conexion.execute(self._PODAR, (ultimo[0] - conservar,))
+
+    # ─────────────────────────────
+    # Consultas (copia local)
+    # ─────────────────────────────
+
+    def __len__(self):
+        return len(self._locales)
+
+    def __contains__(self, id):
+        return id in self._locales
+
+    def obtener(self, id):
+        local = self._locales.get(id)
+        return None if local is None else local[0]
+
+    def version(self, id):
+        local = self._locales.get(id)
+        return None if local is None else local[1]
+
+    def buscar_por_nombre(self, nombre):
+        return list(self.almacen.buscar_por_nombre(nombre))
+
+    def mostrar_todos(self):
+        return [p for p, _ in sorted(self._locales.values(), key=lambda local: local[0].id)]
+
+    # ─────────────────────────────
+    # Escrituras con control de versión
+    # ─────────────────────────────
+
+    def agregar(self, producto):
+        try:
+            self.almacen.insertar(producto)
+        except sqlite3.IntegrityError:
+            self._releer(producto.id)
+            return False, "El ID ya existe."
+        self._locales[producto.id] = (producto, 0)
+        return True, "Producto agregado correctamente."
+
+    def _conflicto(self, id):
+        self.conflictos += 1
+        if self._releer(id) is None:
+            return False, "Producto no encontrado (otro terminal lo eliminó)."
+        return False, "Otro terminal modificó el producto; se recargó, revise y vuelva a intentar."
+
+    def eliminar(self, id, version=None):
+        """Elimina el producto si sigue en `version` (por defecto, la que vio este terminal)."""
+        if version is None:
+            if id not in self._locales:
+                return False, "Producto no encontrado."
+            version = self._locales[id][1]
+        if self.conexion.execute(self._ELIMINAR, (id, version)).rowcount == 0:
+            return self._conflicto(id)
+        self._locales.pop(id, None)
+        return True, "Producto eliminado."
+
+    def actualizar(self, id, cantidad, precio, version=None):
+        """Actualiza el producto si sigue en `version` (por defecto, la que vio este terminal)."""
+        if version is None:
+            if id not in self._locales:
+                return False, "Producto no encontrado."
+            version = self._locales[id][1]
+        if self.conexion.execute(self._ACTUALIZAR, (cantidad, precio, id, version)).rowcount == 0:
+            return self._conflicto(id)
+        nombre = self._locales[id][0].nombre if id in self._locales else self._releer(id)[1]
+        self._locales[id] = (Producto(id, nombre, cantidad, precio), version + 1)
+        return True, "Producto actualizado."
+
+    def modificar(self, id, funcion, reintentos=REINTENTOS):
+        """
+        Aplica funcion(cantidad, precio) → (cantidad, precio) sobre el valor
+        actual de la base. Si otro terminal escribe entre la lectura y la
+        escritura, vuelve a leer y a aplicar la función.
+        """
+        for intento in range(reintentos):
+            fila = self._releer(id)
+            if fila is None:
+                return False, "Producto no encontrado."
+            cantidad, precio = funcion(fila[2], fila[3])
+            ok, mensaje = self.actualizar(id, cantidad, precio, version=fila[4])
+            if ok:
+                return ok, mensaje
+            # Espera breve y aleatoria para no chocar otra vez con el mismo terminal
+            time.sleep(random.uniform(0, 0.001) * (intento + 1))
+        return False, "No se pudo actualizar: demasiados cambios simultáneos."
+
+    def ajustar_stock(self, id, diferencia):
+        """Suma `diferencia` (positiva o negativa) a la cantidad del producto."""
+        return self.modificar(id, lambda cantidad, precio: (cantidad + diferencia, precio))
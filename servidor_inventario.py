@@ -0,0 +1,347 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Servidor asyncio que atiende a varios clientes sobre un mismo
+inventario_archivo.Inventario, por TCP o por socket Unix, con un protocolo de
+una línea JSON por petición y otra por respuesta:
+
+    → {"op": "agregar", "producto": {"id": 1, "nombre": "Lápiz", "cantidad": 5, "precio": 0.5}}
+    → {"op": "eliminar", "id": 1}
+    → {"op": "actualizar", "id": 1, "cantidad": 10, "precio": 0.6}
+    → {"op": "buscar_por_nombre", "nombre": "lap"}
+    → {"op": "mostrar_todos"}
+    ← {"ok": true, "mensaje": "...", "datos": [...]}     (datos solo en consultas)
+
+Un cliente puede enviar varias peticiones sin esperar las respuestas; estas
+llegan en el mismo orden. Las peticiones que se juntan mientras se atiende un
+grupo se ejecutan en el siguiente dentro de un único inventario.lote(), así
+que el almacén escribe una vez por grupo y no una vez por petición.
+
+Uso:
+    python servidor_inventario.py servir --almacen sqlite --archivo inventario.db
+    python servidor_inventario.py carga --conexiones 8 --peticiones 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inventario_archivo import (AlmacenBinario, AlmacenJSON, AlmacenSQLite, Inventario,
+                                Producto)
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+MAX_LOTE = 256              # peticiones como máximo en un mismo lote
+LIMITE_LINEA = 16 * 1024 * 1024
+
+ALMACENES = {"json": AlmacenJSON, "sqlite": AlmacenSQLite, "bin": AlmacenBinario}
+
+
+def _producto(datos):
+    """
+    Producto de una petición "agregar", con los tipos de Producto.desde_linea
+    (int, str, int, float) y un nombre que cabe en una línea de inventario.txt.
+    """
+    nombre = datos["nombre"]
+    if not isinstance(nombre, str):
+        raise TypeError(f"El nombre debe ser texto, no {type(nombre).__name__}")
+    if "," in nombre or "\n" in nombre:
+        raise ValueError(f"Nombre con coma o salto de línea: {nombre!r}")
+    return Producto(int(datos["id"]), nombre, int(datos["cantidad"]), float(datos["precio"]))
+
+
+class _PeticionFallida(Exception):
+    """Una petición de un lote lanzó una excepción; el lote se repite sin ella."""
+
+
+def _respuesta(ok, mensaje, datos=None):
+    respuesta = {"ok": ok, "mensaje": mensaje}
+    if datos is not None:
+        respuesta["datos"] = datos
+    return (json.dumps(respuesta) + "\n").encode("utf-8")
+
+
+class ServidorInventario:
+    """
+    Clase ServidorInventario
+    Cada conexión lee peticiones sin esperar respuestas (pipelining) y las deja
+    en una cola común; un único trabajador las toma por grupos y las ejecuta
+    en un hilo propio, dentro de un lote del inventario. El inventario se crea
+    (con crear_inventario) y se usa solo desde ese hilo, de una petición en
+    una: no necesita cerrojos y una conexión SQLite no cambia de hilo.
+
+    Las respuestas de las escrituras se envían después de confirmar el lote:
+    un "ok" significa que el cambio ya está guardado.
+    """
+
+    def __init__(self, crear_inventario, max_lote=MAX_LOTE):
+        self.crear_inventario = crear_inventario
+        self.max_lote = max_lote
+        self.inventario = None
+        self.grupos = 0             # lotes ejecutados (estadística)
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventario")
+        self._cola = None
+        self._trabajador = None
+
+    # ─────────────────────────────
+    # Peticiones
+    # ─────────────────────────────
+
+    def _preparar(self, peticion):
+        """Convierte una petición en una función sin argumentos que la ejecuta."""
+        inv = self.inventario
+        op = peticion["op"]
+        if op == "agregar":
+            producto = _producto(peticion["producto"])
+            return lambda: _respuesta(*inv.agregar(producto))
+        if op == "eliminar":
+            id = int(peticion["id"])
+            return lambda: _respuesta(*inv.eliminar(id))
+        if op == "actualizar":
+            id, cantidad, precio = (int(peticion["id"]), int(peticion["cantidad"]),
+                                    float(peticion["precio"]))
+            return lambda: _respuesta(*inv.actualizar(id, cantidad, precio))
+        if op == "buscar_por_nombre":
+            nombre = str(peticion["nombre"])
+            return lambda: _respuesta(True, "", [p.to_dict() for p in inv.buscar_por_nombre(nombre)])
+        if op == "mostrar_todos":
+            return lambda: _respuesta(True, "", [p.to_dict() for p in inv.mostrar_todos()])
+        raise ValueError(f"Operación desconocida: '{op}'")
+
+    def _ejecutar(self, funciones):
+        """
+        Ejecuta un grupo de peticiones en un lote (en el hilo del trabajador).
+        Si una petición falla, el lote se deshace entero y se repite sin ella:
+        así no se confirma un cambio que esa petición dejó a medias.
+        """
+        fallidas = {}               # posición en el grupo → respuesta de error
+        while True:
+            respuestas = []
+            try:
+                with self.inventario.lote():
+                    for i, funcion in enumerate(funciones):
+                        if i in fallidas:
+                            respuestas.append(fallidas[i])
+                            continue
+                        try:
+                            respuestas.append(funcion())
+                        except Exception as e:
+                            fallidas[i] = _respuesta(False, f"Error: {e}")
+                            raise _PeticionFallida from e
+            except _PeticionFallida:
+                continue
+            except Exception as e:
+                # No se pudo confirmar el lote: ninguno de sus cambios quedó aplicado
+                return [_respuesta(False, f"No se pudo guardar: {e}")] * len(funciones)
+            self.grupos += 1
+            return respuestas
+
+    async def _trabajar(self):
+        while True:
+            grupo = [await self._cola.get()]
+            while len(grupo) < self.max_lote and not self._cola.empty():
+                grupo.append(self._cola.get_nowait())
+            respuestas = await asyncio.get_running_loop().run_in_executor(
+                self._hilo, self._ejecutar, [f for f, _ in grupo])
+            for (_, futuro), respuesta in zip(grupo, respuestas):
+                if not futuro.done():
+                    futuro.set_result(respuesta)
+
+    # ─────────────────────────────
+    # Conexiones
+    # ─────────────────────────────
+
+    async def _responder(self, pendientes, escritor):
+        """Envía las respuestas de una conexión en el orden de las peticiones."""
+        while True:
+            futuro = await pendientes.get()
+            if futuro is None:
+                return
+            escritor.write(await futuro)
+            if pendientes.empty():
+                await escritor.drain()
+
+    async def _atender(self, lector, escritor):
+        bucle = asyncio.get_running_loop()
+        pendientes = asyncio.Queue()
+        envio = asyncio.create_task(self._responder(pendientes, escritor))
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                futuro = bucle.create_future()
+                pendientes.put_nowait(futuro)
+                try:
+                    funcion = self._preparar(json.loads(linea))
+                except (ValueError, KeyError, TypeError) as e:
+                    futuro.set_result(_respuesta(False, f"Petición no válida: {e}"))
+                    continue
+                self._cola.put_nowait((funcion, futuro))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass                    # cliente desconectado o línea demasiado larga
+        finally:
+            pendientes.put_nowait(None)
+            try:
+                await envio
+            except ConnectionError:
+                pass
+            escritor.close()
+
+    async def iniciar(self, host=HOST, puerto=PUERTO, ruta_unix=None):
+        """Crea el inventario, empieza a escuchar y devuelve el asyncio.Server."""
+        bucle = asyncio.get_running_loop()
+        self.inventario = await bucle.run_in_executor(self._hilo, self.crear_inventario)
+        self._cola = asyncio.Queue()
+        self._trabajador = asyncio.create_task(self._trabajar())
+        if ruta_unix is not None:
+            if os.path.exists(ruta_unix):
+                os.remove(ruta_unix)
+            return await asyncio.start_unix_server(self._atender, ruta_unix, limit=LIMITE_LINEA)
+        return await asyncio.start_server(self._atender, host, puerto, limit=LIMITE_LINEA)
+
+    async def cerrar(self):
+        """Detiene el trabajador y cierra el inventario (desde su hilo)."""
+        if self._trabajador is not None:
+            self._trabajador.cancel()
+        if self.inventario is not None:
+            await asyncio.get_running_loop().run_in_executor(self._hilo, self.inventario.cerrar)
+        self._hilo.shutdown()
+
+
+# ═══════════════════════════════════════════════
+# Generador de carga
+# ═══════════════════════════════════════════════
+
+async def _conectar(host, puerto, ruta_unix):
+    if ruta_unix is not None:
+        return await asyncio.open_unix_connection(ruta_unix, limit=LIMITE_LINEA)
+    return await asyncio.open_connection(host, puerto, limit=LIMITE_LINEA)
+
+
+async def _cliente(host, puerto, ruta_unix, peticiones, profundidad, latencias):
+    """Envía las peticiones con hasta `profundidad` sin respuesta a la vez."""
+    lector, escritor = await _conectar(host, puerto, ruta_unix)
+    hueco = asyncio.Semaphore(profundidad)
+    enviadas = []               # instante de envío de cada petición, en orden
+
+    async def recibir():
+        for i in range(len(peticiones)):
+            await lector.readline()
+            latencias.append(time.perf_counter() - enviadas[i])
+            hueco.release()
+
+    recepcion = asyncio.create_task(recibir())
+    for peticion in peticiones:
+        await hueco.acquire()
+        enviadas.append(time.perf_counter())
+        escritor.write(peticion)
+        await escritor.drain()
+    await recepcion
+    escritor.close()
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+async def generar_carga(host=HOST, puerto=PUERTO, ruta_unix=None, conexiones=8,
+                        peticiones=20_000, profundidad=16, lecturas=0.2, productos=1_000):
+    """
+    Crea `productos` productos (si no existen) y lanza `peticiones`
+    peticiones repartidas entre `conexiones` clientes: una fracción
+    `lecturas` de búsquedas por nombre y el resto actualizaciones.
+    Devuelve un diccionario con ops/s y latencias p50/p95/p99 en ms.
+    """
+    altas = [(json.dumps({"op": "agregar", "producto": {
+        "id": i, "nombre": f"Producto {i}", "cantidad": 0, "precio": 1.0}}) + "\n").encode()
+        for i in range(1, productos + 1)]
+    await _cliente(host, puerto, ruta_unix, altas, profundidad, [])
+
+    def peticion():
+        if random.random() < lecturas:
+            datos = {"op": "buscar_por_nombre", "nombre": f"Producto {random.randint(1, productos)}"}
+        else:
+            datos = {"op": "actualizar", "id": random.randint(1, productos),
+                     "cantidad": random.randint(0, 100), "precio": 1.5}
+        return (json.dumps(datos) + "\n").encode()
+
+    por_conexion = peticiones // conexiones
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _cliente(host, puerto, ruta_unix, [peticion() for _ in range(por_conexion)],
+                 profundidad, latencias)
+        for _ in range(conexiones)))
+    segundos = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "peticiones": len(latencias),
+        "ops_s": len(latencias) / segundos,
+        "p50_ms": _percentil(latencias, 50) * 1e3,
+        "p95_ms": _percentil(latencias, 95) * 1e3,
+        "p99_ms": _percentil(latencias, 99) * 1e3,
+    }
+
+
+# ═══════════════════════════════════════════════
+# Main
+# ═══════════════════════════════════════════════
+
+async def _servir(args):
+    servidor = ServidorInventario(lambda: Inventario(ALMACENES[args.almacen](args.archivo)),
+                                  args.max_lote)
+    try:
+        servicio = await servidor.iniciar(args.host, args.puerto, args.unix)
+        print(f"[INFO] Inventario '{args.archivo}' atendiendo en "
+              f"{args.unix or f'{args.host}:{args.puerto}'}")
+        async with servicio:
+            await servicio.serve_forever()
+    finally:
+        await servidor.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="orden", required=True)
+    for nombre in ("servir", "carga"):
+        p = sub.add_parser(nombre)
+        p.add_argument("--host", default=HOST)
+        p.add_argument("--puerto", type=int, default=PUERTO)
+        p.add_argument("--unix", default=None, help="ruta de un socket Unix en lugar de TCP")
+        if nombre == "servir":
+            p.add_argument("--almacen", choices=ALMACENES, default="json")
+            p.add_argument("--archivo", default=Inventario.ARCHIVO)
+            p.add_argument("--max-lote", type=int, default=MAX_LOTE)
+        else:
+            p.add_argument("--conexiones", type=int, default=8)
+            p.add_argument("--peticiones", type=int, default=20_000)
+            p.add_argument("--profundidad", type=int, default=16,
+                           help="peticiones sin respuesta por conexión")
+            p.add_argument("--lecturas", type=float, default=0.2)
+            p.add_argument("--productos", type=int, default=1_000)
+    args = parser.parse_args()
+
+    if args.orden == "servir":
+        try:
+            asyncio.run(_servir(args))
+        except KeyboardInterrupt:
+            print("\n[INFO] Servidor detenido.")
+        return
+
+    resultado = asyncio.run(generar_carga(args.host, args.puerto, args.unix, args.conexiones,
+                                          args.peticiones, args.profundidad, args.lecturas,
+                                          args.productos))
+    print(f"{resultado['peticiones']} peticiones  {resultado['ops_s']:.0f} ops/s  "
+          f"p50 {resultado['p50_ms']:.2f} ms  p95 {resultado['p95_ms']:.2f} ms  "
+          f"p99 {resultado['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Autor: Jordy Molina
+Asignatura: POO
+Descripción:
+Instantánea binaria del inventario, guardada por columnas para abrirla con
+mmap sin analizar el archivo: abrir cuesta lo mismo con mil productos que
+con cinco millones, y cada consulta lee solo las posiciones que necesita.
+
+Formato (versión 1, little-endian, todo alineado a 8 bytes):
+
+    cabecera        magia b"INVB", versión (u16), reservado (u16),
+                    filas n (u64), bytes de nombres (u64), reservado (u64)
+    ids             n × i64     en el orden original de los productos
+    cantidades      n × i64
+    precios         n × f64
+    orden           n × i64     filas ordenadas por ID
+    ids_ordenados   n × i64     ids[orden[i]], para la búsqueda binaria
+    fines           (n+1) × i64 el nombre de la fila i ocupa nombres[fines[i]:fines[i+1]]
+    nombres         bytes UTF-8 de todos los nombres seguidos
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from escritura_atomica import escribir_atomico
+
+MAGIA = b"INVB"
+VERSION = 1
+_CABECERA = struct.Struct("<4sHHQQQ")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _en_disco(columna):
+    """Bytes de una columna en el orden del formato (little-endian)."""
+    if _LITTLE_ENDIAN:
+        return memoryview(columna).cast("B")
+    copia = array(columna.typecode, columna)
+    copia.byteswap()
+    return copia.tobytes()
+
+
+def escribir_instantanea(ruta, filas):
+    """
+    Escribe (de forma atómica) una instantánea con las filas dadas, un
+    iterable de (id, nombre, cantidad, precio). Lanza ValueError si hay IDs
+    repetidos.
+    """
+    escribir_atomico(ruta, preparar_instantanea(filas), binario=True)
+
+
+def preparar_instantanea(filas):
+    """
+    Contenido de la instantánea de escribir_instantanea(), como lista de
+    trozos de bytes, sin escribir nada. Sirve para leer las filas de una
+    instantánea abierta y cerrarla antes de reemplazar su archivo.
+    """
+    ids = array("q")
+    cantidades = array("q")
+    precios = array("d")
+    fines = array("q", [0])
+    nombres = bytearray()
+    for id, nombre, cantidad, precio in filas:
+        ids.append(id)
+        cantidades.append(cantidad)
+        precios.append(precio)
+        nombres += nombre.encode("utf-8")
+        fines.append(len(nombres))
+
+    orden = array("q", sorted(range(len(ids)), key=ids.__getitem__))
+    ids_ordenados = array("q", (ids[f] for f in orden))
+    for i in range(1, len(ids_ordenados)):
+        if ids_ordenados[i] == ids_ordenados[i - 1]:
+            raise ValueError(f"ID repetido en la instantánea: {ids_ordenados[i]}")
+
+    cabecera = _CABECERA.pack(MAGIA, VERSION, 0, len(ids), len(nombres), 0)
+    return [cabecera] + [_en_disco(c) for c in (ids, cantidades, precios, orden,
+                                                ids_ordenados, fines)] + [nombres]
+
+
+class InstantaneaBinaria:
+    """
+    Clase InstantaneaBinaria
+    Vista de solo lectura sobre una instantánea escrita con
+    escribir_instantanea(). Las columnas son memoryview sobre el archivo
+    mapeado (o copias, en una máquina big-endian), así que el sistema
+    operativo solo carga las páginas que se consultan.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            tamano = os.fstat(f.fileno()).st_size
+            if tamano < _CABECERA.size:
+                raise ValueError(f"'{ruta}' no es una instantánea de inventario.")
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magia, version, _, n, largo_nombres, _ = _CABECERA.unpack_from(self._mapa)
+        if magia != MAGIA:
+            self._mapa.close()
+            raise ValueError(f"'{ruta}' no es una instantánea de inventario.")
+        if version != VERSION:
+            self._mapa.close()
+            raise ValueError(f"Versión de instantánea no soportada: {version}")
+        if tamano != _CABECERA.size + 8 * (6 * n + 1) + largo_nombres:
+            self._mapa.close()
+            raise ValueError(f"La instantánea '{ruta}' está incompleta o dañada.")
+
+        self._vistas = [memoryview(self._mapa)]
+        posicion = _CABECERA.size
+        columnas = []
+        for tipo, cuantos in (("q", n), ("q", n), ("d", n), ("q", n), ("q", n), ("q", n + 1)):
+            columnas.append(self._columna(posicion, tipo, cuantos))
+            posicion += 8 * cuantos
+        (self.ids, self.cantidades, self.precios,
+         self.orden, self.ids_ordenados, self._fines) = columnas
+        self._nombres = self._vistas[0][posicion:posicion + largo_nombres]
+        self._vistas.append(self._nombres)
+
+    def _columna(self, posicion, tipo, cuantos):
+        trozo = self._vistas[0][posicion:posicion + 8 * cuantos]
+        if not _LITTLE_ENDIAN:
+            columna = array(tipo, trozo.tobytes())
+            columna.byteswap()
+            trozo.release()
+            return columna
+        columna = trozo.cast(tipo)
+        self._vistas += [trozo, columna]
+        return columna
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return self.fila_de(id) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def fila_de(self, id):
+        """Fila del producto con ese ID (búsqueda binaria), o None si no existe."""
+        i = bisect_left(self.ids_ordenados, id)
+        if i < len(self.ids_ordenados) and self.ids_ordenados[i] == id:
+            return self.orden[i]
+        return None
+
+    def nombre(self, fila):
+        return str(self._nombres[self._fines[fila]:self._fines[fila + 1]], "utf-8")
+
+    def campos(self, fila):
+        """Devuelve (id, nombre, cantidad, precio) de una fila."""
+        return self.ids[fila], self.nombre(fila), self.cantidades[fila], self.precios[fila]
+
+    def recorrer(self):
+        """Genera (id, nombre, cantidad, precio) en el orden original."""
+        return (self.campos(fila) for fila in range(len(self.ids)))
+
+    def recorrer_por_id(self):
+        """Genera (id, nombre, cantidad, precio) ordenados por ID."""
+        return (self.campos(fila) for fila in self.orden)
+
+    def cerrar(self):
+        # mmap no se puede cerrar mientras alguna memoryview lo referencie
+        for vista in reversed(self._vistas):
+            vista.release()
+        self._vistas = []
+        self._mapa.close()